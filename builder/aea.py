@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+Reader for signed (AEA1) shortcuts that runs anywhere, no macOS needed
+
+`shortcuts sign` wraps the workflow plist in an Apple Encrypted Archive
+using the signed-but-unencrypted profile. The container is:
+
+    "AEA1", profile (3 bytes), scrypt strength (1 byte)
+    auth data size (uint32) + auth data    bplist with SigningCertificateChain
+    signature (128 bytes)                  ECDSA-P256, DER, zero padded
+    random key, random salt, root header MAC (32 bytes each)
+    root header (48 bytes)                 sizes, compression, checksum
+    per cluster:
+        next cluster MAC (32 bytes) after the segment headers
+        segment headers                    raw size, compressed size, checksum
+        segment MACs (32 bytes each)
+        segment data                       LZFSE compressed
+
+The segments decompress (pure-Python LZFSE below) to an Apple Archive whose
+one file entry is the workflow plist. read_signed() checks every segment
+checksum on the way and returns the certificate chain and the workflow.
+wrap() builds the same layout (unsigned, uncompressed) around a workflow.
+
+The signature itself is not verified: that needs the Apple root certificate
+and an ECDSA implementation. This reader answers "was it signed, and is
+the payload a valid shortcut", which is what the build checks.
+
+Usage:
+    python builder/aea.py shortcuts/Pencil-Me-In-signed.shortcut
+    python builder/aea.py shortcuts/ --json --jobs 8
+    python builder/aea.py signed.shortcut --extract unsigned.shortcut
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import plistlib
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from validator import find_shortcuts, validate_shortcut_structure
+
+MAGIC = b"AEA1"
+SIGNATURE_SIZE = 128
+MAC_SIZE = 32
+ROOT_HEADER_SIZE = 48
+
+PROFILES = {
+    0: "hkdf_sha256_hmac__none__ecdsa_p256",
+    1: "hkdf_sha256_aesctr_hmac__symmetric__none",
+    2: "hkdf_sha256_aesctr_hmac__symmetric__ecdsa_p256",
+    3: "hkdf_sha256_aesctr_hmac__ecdhe_p256__none",
+    4: "hkdf_sha256_aesctr_hmac__ecdhe_p256__ecdsa_p256",
+    5: "hkdf_sha256_aesctr_hmac__scrypt__none",
+}
+CHECKSUM_SIZES = {0: 0, 1: 8, 2: 32}  # none, murmur64, sha256
+
+
+class AEAError(ValueError):
+    """The file is not a readable AEA1 container"""
+
+
+class RootHeader(NamedTuple):
+    raw_size: int  # size of the decompressed payload
+    container_size: int
+    segment_size: int
+    segments_per_cluster: int
+    compression: str  # "-" none, "e" LZFSE, ...
+    checksum: int  # key of CHECKSUM_SIZES
+
+
+class Segment(NamedTuple):
+    raw_size: int
+    size: int  # compressed size; equal to raw_size when stored
+    checksum: bytes
+    offset: int  # of the segment data in the file
+
+
+class SignedShortcut(NamedTuple):
+    profile: int
+    auth_data: dict  # includes SigningCertificateChain
+    signature: bytes
+    root: RootHeader
+    segments: list[Segment]
+    payload: bytes  # decompressed Apple Archive
+    workflow: dict
+
+    @property
+    def certificates(self) -> list[bytes]:
+        """DER certificates, leaf first"""
+        return list(self.auth_data.get("SigningCertificateChain", []))
+
+
+# =============================================================================
+# LZFSE
+# =============================================================================
+
+_END_OF_STREAM = b"bvx$"
+_UNCOMPRESSED = b"bvx-"
+_COMPRESSED_V1 = b"bvx1"
+_COMPRESSED_V2 = b"bvx2"
+_COMPRESSED_LZVN = b"bvxn"
+
+_L_STATES, _M_STATES, _D_STATES, _LITERAL_STATES = 64, 64, 256, 1024
+
+# Extra bits and base value of each L, M and D symbol
+_L_BITS = [0] * 16 + [2, 3, 5, 8]
+_L_BASE = list(range(16)) + [16, 20, 28, 60]
+_M_BITS = [0] * 16 + [3, 5, 8, 11]
+_M_BASE = list(range(16)) + [16, 24, 56, 312]
+_D_BITS = [0] * 4 + [n // 4 for n in range(4, 64)]
+_D_BASE = [0]
+for _bits in _D_BITS[:-1]:
+    _D_BASE.append(_D_BASE[-1] + (1 << _bits))
+del _bits
+
+# Variable-length frequency codes in v2 block headers, by their low 5 bits
+_FREQ_NBITS = [2, 3, 2, 5, 2, 3, 2, 8, 2, 3, 2, 5, 2, 3, 2, 14] * 2
+_FREQ_VALUE = [0, 2, 1, 4, 0, 3, 1, -1, 0, 2, 1, 5, 0, 3, 1, -1]
+_FREQ_VALUE += [0, 2, 1, 6, 0, 3, 1, -1, 0, 2, 1, 7, 0, 3, 1, -1]
+
+
+class _BitStream:
+    """FSE bits, read backwards from the end of a byte range"""
+
+    def __init__(self, data: bytes, initial_bits: int):
+        if not -7 <= initial_bits <= 0:
+            raise AEAError(f"LZFSE: bad initial bit count {initial_bits}")
+        self.value = int.from_bytes(data, "little")
+        self.pos = 8 * len(data) + initial_bits
+        if self.value >> self.pos:
+            raise AEAError("LZFSE: padding bits are not zero")
+
+    def pull(self, n: int) -> int:
+        self.pos -= n
+        if self.pos < 0:
+            raise AEAError("LZFSE: bit stream overrun")
+        return (self.value >> self.pos) & ((1 << n) - 1)
+
+
+def _fse_entries(nstates: int, freqs: list[int]) -> list[tuple[int, int, int]]:
+    """(symbol, bits to pull, state delta) for each FSE state"""
+    if sum(freqs) > nstates:
+        raise AEAError("LZFSE: symbol frequencies exceed the state count")
+    table = []
+    for symbol, f in enumerate(freqs):
+        if not f:
+            continue
+        k = nstates.bit_length() - f.bit_length()
+        j0 = ((2 * nstates) >> k) - f
+        for j in range(f):
+            if j < j0:
+                table.append((symbol, k, ((f + j) << k) - nstates))
+            else:
+                table.append((symbol, k - 1, (j - j0) << (k - 1)))
+    return table
+
+
+def _value_table(nstates, freqs, bits, base) -> list[tuple[int, int, int, int]]:
+    """(total bits, value bits, state delta, value base) for each state"""
+    return [
+        (k + bits[symbol], bits[symbol], delta, base[symbol])
+        for symbol, k, delta in _fse_entries(nstates, freqs)
+    ]
+
+
+def _frequencies(header: bytes, end: int) -> list[int]:
+    """Decode the v2 header's packed L, M, D and literal frequency tables"""
+    count = 20 + 20 + 64 + 256
+    if end == 32:
+        return [0] * count
+    accum = int.from_bytes(header[32:end], "little")
+    available = 8 * (end - 32)
+    freqs = []
+    for _ in range(count):
+        nbits = _FREQ_NBITS[accum & 31]
+        if nbits == 8:
+            value = 8 + ((accum >> 4) & 0xF)
+        elif nbits == 14:
+            value = 24 + ((accum >> 4) & 0x3FF)
+        else:
+            value = _FREQ_VALUE[accum & 31]
+        if nbits > available:
+            raise AEAError("LZFSE: truncated frequency table")
+        freqs.append(value)
+        accum >>= nbits
+        available -= nbits
+    if available >= 8:
+        raise AEAError("LZFSE: frequency table size mismatch")
+    return freqs
+
+
+def _decode_v2(data: bytes, pos: int, out: bytearray) -> int:
+    """Decode one bvx2 block at `pos` into `out`; returns the next position"""
+    if len(data) < pos + 32:
+        raise AEAError("LZFSE: truncated block header")
+    raw_size, v0, v1, v2 = struct.unpack_from("<I3Q", data, pos + 4)
+
+    def field(value, offset, nbits):
+        return (value >> offset) & ((1 << nbits) - 1)
+
+    n_literals = field(v0, 0, 20)
+    literal_payload = field(v0, 20, 20)
+    n_matches = field(v0, 40, 20)
+    literal_bits = field(v0, 60, 3) - 7
+    literal_states = [field(v1, n, 10) for n in (0, 10, 20, 30)]
+    lmd_payload = field(v1, 40, 20)
+    lmd_bits = field(v1, 60, 3) - 7
+    header_size = field(v2, 0, 32)
+    l_state, m_state, d_state = field(v2, 32, 10), field(v2, 42, 10), field(v2, 52, 10)
+
+    freqs = _frequencies(data[pos : pos + header_size], header_size)
+    l_table = _value_table(_L_STATES, freqs[0:20], _L_BITS, _L_BASE)
+    m_table = _value_table(_M_STATES, freqs[20:40], _M_BITS, _M_BASE)
+    d_table = _value_table(_D_STATES, freqs[40:104], _D_BITS, _D_BASE)
+    literal_table = _fse_entries(_LITERAL_STATES, freqs[104:360])
+
+    start = pos + header_size
+    end = start + literal_payload + lmd_payload
+    if end > len(data):
+        raise AEAError("LZFSE: truncated block payload")
+
+    # Literals: four interleaved FSE states
+    bits = _BitStream(data[start : start + literal_payload], literal_bits)
+    literals = bytearray()
+    try:
+        for _ in range(0, n_literals, 4):
+            for n in range(4):
+                symbol, k, delta = literal_table[literal_states[n]]
+                literal_states[n] = delta + bits.pull(k)
+                literals.append(symbol)
+    except IndexError:
+        raise AEAError("LZFSE: bad literal state") from None
+
+    # (literal length, match length, distance) triples
+    bits = _BitStream(data[start + literal_payload : end], lmd_bits)
+    block_start = len(out)
+    lit = 0
+    distance = 0
+    try:
+        for _ in range(n_matches):
+            values = []
+            for table, state in (
+                (l_table, l_state),
+                (m_table, m_state),
+                (d_table, d_state),
+            ):
+                total, vbits, delta, base = table[state]
+                pulled = bits.pull(total)
+                values.append(
+                    (delta + (pulled >> vbits), base + (pulled & ((1 << vbits) - 1)))
+                )
+            (l_state, length), (m_state, match), (d_state, new_distance) = values
+            distance = new_distance or distance
+            out += literals[lit : lit + length]
+            lit += length
+            _copy_match(out, distance, match)
+    except IndexError:
+        raise AEAError("LZFSE: bad L, M or D state") from None
+    if len(out) - block_start != raw_size:
+        raise AEAError("LZFSE: block size mismatch")
+    return end
+
+
+def _copy_match(out: bytearray, distance: int, length: int):
+    if not length:
+        return
+    if not 0 < distance <= len(out):
+        raise AEAError(f"LZFSE: match distance {distance} out of range")
+    start = len(out) - distance
+    if distance >= length:
+        out += out[start : start + length]
+    else:
+        # Overlapping copy repeats the last `distance` bytes
+        chunk = out[start:]
+        out += (chunk * (length // distance + 1))[:length]
+
+
+def _decode_lzvn(data: bytes, pos: int, out: bytearray) -> int:
+    """Decode one bvxn (LZVN) block at `pos` into `out`"""
+    raw_size, payload_size = struct.unpack_from("<II", data, pos + 4)
+    src = pos + 12
+    end = src + payload_size
+    if end > len(data):
+        raise AEAError("LZVN: truncated block payload")
+    target = len(out) + raw_size
+    distance = 0
+    while len(out) < target:
+        if src >= end:
+            raise AEAError("LZVN: truncated stream")
+        op = data[src]
+        length = match = 0
+        if op == 0x06:  # end of stream
+            break
+        if op in (0x0E, 0x16):  # nop
+            src += 1
+            continue
+        if op & 0xF0 == 0xE0:  # literals only
+            if op == 0xE0:
+                length, src = 16 + data[src + 1], src + 2
+            else:
+                length, src = op & 0x0F, src + 1
+        elif op & 0xF0 == 0xF0:  # match with the previous distance
+            if op == 0xF0:
+                match, src = 16 + data[src + 1], src + 2
+            else:
+                match, src = op & 0x0F, src + 1
+        elif op & 0xE0 == 0xA0:  # 101LLMMM DDDDDDMM DDDDDDDD
+            word = data[src + 1] | data[src + 2] << 8
+            length = (op >> 3) & 3
+            match = ((op & 7) << 2 | word & 3) + 3
+            distance = word >> 2
+            src += 3
+        elif op & 0xF0 in (0x70, 0xD0) or op in (0x1E, 0x26, 0x2E, 0x36, 0x3E):
+            raise AEAError(f"LZVN: undefined opcode {op:#04x}")
+        else:  # LLMMMDDD: 111 large distance, 110 previous, else small
+            length = op >> 6
+            match = ((op >> 3) & 7) + 3
+            if op & 7 == 7:
+                distance = data[src + 1] | data[src + 2] << 8
+                src += 3
+            elif op & 7 == 6:
+                src += 1
+            else:
+                distance = (op & 7) << 8 | data[src + 1]
+                src += 2
+        out += data[src : src + length]
+        src += length
+        _copy_match(out, distance, match)
+    if len(out) != target:
+        raise AEAError("LZVN: block size mismatch")
+    return end
+
+
+def lzfse_decompress(data: bytes) -> bytes:
+    """Decompress an LZFSE stream (bvx2, bvxn and bvx- blocks)"""
+    out = bytearray()
+    pos = 0
+    while True:
+        magic = data[pos : pos + 4]
+        if magic == _END_OF_STREAM:
+            return bytes(out)
+        if magic == _UNCOMPRESSED:
+            (size,) = struct.unpack_from("<I", data, pos + 4)
+            out += data[pos + 8 : pos + 8 + size]
+            pos += 8 + size
+        elif magic == _COMPRESSED_V2:
+            pos = _decode_v2(data, pos, out)
+        elif magic == _COMPRESSED_LZVN:
+            pos = _decode_lzvn(data, pos, out)
+        elif magic == _COMPRESSED_V1:
+            raise AEAError("LZFSE: bvx1 blocks are not supported")
+        else:
+            raise AEAError(f"LZFSE: unknown block {magic!r} at offset {pos}")
+
+
+# =============================================================================
+# Apple Archive
+# =============================================================================
+
+# Field value sizes by type character; blob sizes ("A", "B", "C") give the
+# size of the length field, and the blob itself follows the record header
+_FIELD_SIZES = {
+    "*": 0,
+    "1": 1,
+    "2": 2,
+    "4": 4,
+    "8": 8,
+    "S": 8,
+    "T": 12,
+    "F": 4,
+    "G": 20,
+    "H": 32,
+    "I": 48,
+    "J": 64,
+}
+_BLOB_SIZES = {"A": 2, "B": 4, "C": 8}
+
+
+def archive_entries(payload: bytes) -> dict[str, bytes]:
+    """{path: data} for the file entries of an Apple Archive (AA01)"""
+    entries = {}
+    pos = 0
+    while pos < len(payload):
+        if payload[pos : pos + 4] != b"AA01":
+            raise AEAError(f"Archive: no AA01 record at offset {pos}")
+        (size,) = struct.unpack_from("<H", payload, pos + 4)
+        header = payload[pos + 6 : pos + size]
+        pos += size
+        fields = {}
+        blobs = 0
+        i = 0
+        while i < len(header):
+            key, kind = header[i : i + 3].decode("ascii"), chr(header[i + 3])
+            i += 4
+            if kind == "P":
+                (length,) = struct.unpack_from("<H", header, i)
+                fields[key] = header[i + 2 : i + 2 + length].decode()
+                i += 2 + length
+            elif kind in _BLOB_SIZES:
+                n = _BLOB_SIZES[kind]
+                length = int.from_bytes(header[i : i + n], "little")
+                fields[key] = payload[pos + blobs : pos + blobs + length]
+                blobs += length
+                i += n
+            elif kind in _FIELD_SIZES:
+                fields[key] = header[i : i + _FIELD_SIZES[kind]]
+                i += _FIELD_SIZES[kind]
+            else:
+                raise AEAError(f"Archive: unknown field type {kind!r} in {key}")
+        pos += blobs
+        if fields.get("TYP") == b"F":
+            entries[fields.get("PAT", "")] = fields.get("DAT", b"")
+    return entries
+
+
+# =============================================================================
+# Container
+# =============================================================================
+
+
+def _read_root(data: bytes, auth_end: int) -> tuple[RootHeader, int]:
+    start = auth_end + SIGNATURE_SIZE + 3 * MAC_SIZE
+    if len(data) < start + ROOT_HEADER_SIZE:
+        raise AEAError("Truncated before the root header")
+    fields = struct.unpack_from("<QQII", data, start)
+    compression, checksum = chr(data[start + 24]), data[start + 25]
+    if checksum not in CHECKSUM_SIZES:
+        raise AEAError(f"Unknown checksum type {checksum}")
+    return RootHeader(*fields, compression, checksum), start + ROOT_HEADER_SIZE
+
+
+def _read_segments(data: bytes, root: RootHeader, pos: int) -> list[Segment]:
+    """Segment headers of every cluster, with their data offsets"""
+    header_size = 8 + CHECKSUM_SIZES[root.checksum]
+    segments = []
+    remaining = root.raw_size
+    pos += MAC_SIZE  # first cluster header MAC
+    while remaining > 0:
+        headers = pos
+        pos += root.segments_per_cluster * header_size + MAC_SIZE
+        pos += root.segments_per_cluster * MAC_SIZE
+        if pos > len(data):
+            raise AEAError("Truncated cluster header")
+        for n in range(root.segments_per_cluster):
+            at = headers + n * header_size
+            raw_size, size = struct.unpack_from("<II", data, at)
+            if not raw_size:
+                break
+            checksum = data[at + 8 : at + header_size]
+            segments.append(Segment(raw_size, size, checksum, pos))
+            pos += size
+            remaining -= raw_size
+        if pos > len(data):
+            raise AEAError("Truncated segment data")
+    return segments
+
+
+def _segment_payload(data: bytes, root: RootHeader, segment: Segment) -> bytes:
+    raw = data[segment.offset : segment.offset + segment.size]
+    if segment.size != segment.raw_size:
+        if root.compression != "e":
+            raise AEAError(f"Unsupported compression {root.compression!r}")
+        raw = lzfse_decompress(raw)
+    if len(raw) != segment.raw_size:
+        raise AEAError("Segment size mismatch")
+    if root.checksum == 2 and hashlib.sha256(raw).digest() != segment.checksum:
+        raise AEAError(f"Segment checksum mismatch at offset {segment.offset}")
+    return raw
+
+
+def read_signed(source: str | bytes) -> SignedShortcut:
+    """Parse a signed shortcut (a path or its bytes) down to the workflow"""
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = f.read()
+    data = source
+    if data[:4] != MAGIC:
+        raise AEAError("Not an AEA1 file")
+    if len(data) < 12:
+        raise AEAError("Truncated AEA1 header")
+    profile = int.from_bytes(data[4:7], "little")
+    if profile != 0:
+        name = PROFILES.get(profile, f"profile {profile}")
+        raise AEAError(f"Encrypted container ({name}) can't be read without keys")
+    (auth_size,) = struct.unpack_from("<I", data, 8)
+    auth_end = 12 + auth_size
+    try:
+        auth_data = plistlib.loads(data[12:auth_end])
+    except (plistlib.InvalidFileException, ValueError) as e:
+        raise AEAError(f"Unreadable auth data: {e}") from None
+    signature = data[auth_end : auth_end + SIGNATURE_SIZE].rstrip(b"\0")
+
+    root, pos = _read_root(data, auth_end)
+    segments = _read_segments(data, root, pos)
+    payload = b"".join(_segment_payload(data, root, s) for s in segments)
+    if len(payload) != root.raw_size:
+        raise AEAError("Payload size differs from the root header")
+
+    plists = [
+        entry
+        for path, entry in archive_entries(payload).items()
+        if path.endswith(".wflow") or entry.startswith(b"bplist")
+    ]
+    if not plists:
+        raise AEAError("No workflow in the archive")
+    try:
+        workflow = plistlib.loads(plists[0])
+    except (plistlib.InvalidFileException, ValueError) as e:
+        raise AEAError(f"Unreadable workflow: {e}") from None
+    return SignedShortcut(
+        profile, auth_data, signature, root, segments, payload, workflow
+    )
+
+
+def _archive_record(fields: bytes, blob: bytes = b"") -> bytes:
+    return b"AA01" + struct.pack("<H", 6 + len(fields)) + fields + blob
+
+
+def wrap(workflow: bytes, auth_data: dict, segment_size: int = 1 << 20) -> bytes:
+    """
+    An AEA1 container around a workflow plist, laid out like `shortcuts sign`
+    output but with a zero signature and uncompressed segments. For tools and
+    tests that need a signed-shaped file where the real signer isn't available.
+    """
+    name = b"Shortcut.wflow"
+    payload = _archive_record(b"TYP1DPATP\0\0") + _archive_record(
+        b"TYP1FPATP"
+        + struct.pack("<H", len(name))
+        + name
+        + b"DATB"
+        + struct.pack("<I", len(workflow)),
+        workflow,
+    )
+    chunks = [
+        payload[n : n + segment_size] for n in range(0, len(payload), segment_size)
+    ]
+    per_cluster = 256
+    auth = plistlib.dumps(auth_data, fmt=plistlib.FMT_BINARY)
+    out = [MAGIC, b"\0" * 4, struct.pack("<I", len(auth)), auth]
+    out.append(b"\0" * (SIGNATURE_SIZE + 3 * MAC_SIZE))
+    root = struct.pack("<QQII", len(payload), 0, segment_size, per_cluster) + b"-\x02"
+    out += [root.ljust(ROOT_HEADER_SIZE, b"\0"), b"\0" * MAC_SIZE]
+    for n in range(0, max(len(chunks), 1), per_cluster):
+        cluster = chunks[n : n + per_cluster]
+        headers = b"".join(
+            struct.pack("<II", len(c), len(c)) + hashlib.sha256(c).digest()
+            for c in cluster
+        )
+        out.append(headers.ljust(per_cluster * (8 + 32), b"\0"))
+        out.append(b"\0" * (MAC_SIZE + per_cluster * MAC_SIZE))
+        out += cluster
+    data = b"".join(out)
+    # The container size field covers the whole file
+    offset = 12 + len(auth) + SIGNATURE_SIZE + 3 * MAC_SIZE + 8
+    return data[:offset] + struct.pack("<Q", len(data)) + data[offset + 8 :]
+
+
+def common_names(certificate: bytes) -> list[str]:
+    """Common names in a DER certificate: the issuer's, then the subject's"""
+    names = []
+    marker = b"\x06\x03\x55\x04\x03"  # OID 2.5.4.3
+    pos = certificate.find(marker)
+    while pos >= 0:
+        start = pos + len(marker) + 2
+        names.append(certificate[start : start + certificate[start - 1]].decode())
+        pos = certificate.find(marker, start)
+    return names
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+
+def inspect_file(path: str) -> dict:
+    """Read and validate one signed shortcut. Returns a JSON-ready report."""
+    report = {"path": path, "valid": False, "errors": []}
+    try:
+        signed = read_signed(path)
+    except (OSError, AEAError) as e:
+        report["errors"].append(str(e))
+        return report
+
+    chain = [common_names(cert) for cert in signed.certificates]
+    errors = []
+    if not chain:
+        errors.append("No SigningCertificateChain in the auth data")
+    for n in range(len(chain) - 1):
+        if chain[n][:1] != chain[n + 1][-1:]:
+            errors.append(f"Certificate {n} is not issued by certificate {n + 1}")
+    if signed.signature[:1] != b"\x30":
+        errors.append("Signature is not a DER ECDSA signature")
+    if isinstance(signed.workflow, dict):
+        errors += validate_shortcut_structure(signed.workflow)
+    else:
+        errors.append("Not a shortcut: top level is not a dictionary")
+
+    report.update(
+        valid=not errors,
+        errors=errors,
+        signer=chain[0][-1] if chain and chain[0] else None,
+        chain=[names[-1] if names else None for names in chain],
+        actions=len(signed.workflow.get("WFWorkflowActions", []))
+        if isinstance(signed.workflow, dict)
+        else 0,
+    )
+    return report
+
+
+def inspect_files(paths: list[str], jobs: int = None) -> list[dict]:
+    """inspect_file() across `jobs` processes, in input order"""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) < 2:
+        return list(map(inspect_file, paths))
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(inspect_file, paths, chunksize=chunksize))
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect signed (AEA1) shortcuts")
+    parser.add_argument(
+        "paths", nargs="+", help="signed .shortcut files or directories"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="Worker processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print a JSON report to stdout"
+    )
+    parser.add_argument(
+        "--extract", metavar="PATH", help="Write the unsigned workflow plist here"
+    )
+    args = parser.parse_args(argv)
+
+    if args.extract:
+        if len(args.paths) != 1:
+            parser.error("--extract takes exactly one signed shortcut")
+        workflow = read_signed(args.paths[0]).workflow
+        with open(args.extract, "wb") as f:
+            plistlib.dump(workflow, f, fmt=plistlib.FMT_BINARY)
+        return 0
+
+    paths = [
+        path
+        for path in find_shortcuts(args.paths)
+        if os.path.isfile(path) and _is_signed(path)
+    ]
+    reports = inspect_files(paths, args.jobs)
+    invalid = [report for report in reports if not report["valid"]]
+
+    if args.json:
+        summary = {"checked": len(reports), "invalid": len(invalid)}
+        json.dump(dict(summary, results=reports), sys.stdout, indent=2)
+        print()
+    else:
+        for report in reports:
+            if report["valid"]:
+                print(
+                    f"✓ {report['path']}: {report['actions']} actions, "
+                    f"signed by {report['signer']}"
+                )
+            else:
+                print(f"✗ {report['path']}")
+                for error in report["errors"]:
+                    print(f"  - {error}")
+        print(f"{len(reports) - len(invalid)} of {len(reports)} signed shortcuts valid")
+    return 1 if invalid else 0
+
+
+def _is_signed(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(4) == MAGIC
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Config baking: a household's config compiled into the shortcut
+
+Shortcuts normally load pencil-me-in-config.json from iCloud on every run,
+parse it, and pull out the values they need one action at a time. For a
+household whose config rarely changes, a baked build reads the config at
+build time and sets those variables from literal text, list and dictionary
+actions instead.
+
+The SHA-256 of the config file is baked in as well. The shortcut still
+opens the file and hashes it (cheaper than parsing it), uses the baked
+values while the hash matches, and falls back to the runtime load when the
+config was changed since, e.g. by running the setup shortcut again.
+
+Usage:
+    pencil-build execute --bake-config path/to/pencil-me-in-config.json
+"""
+
+import hashlib
+import json
+from typing import NamedTuple
+
+from shortcut_builder import (
+    Action,
+    generate_hash,
+    get_variable,
+    if_equals,
+    literal,
+    set_variable,
+)
+
+
+class BakedConfig(NamedTuple):
+    config: dict
+    sha256: str  # of the file's bytes, as Generate Hash computes it at run time
+    path: str = None
+
+
+def bake_config(data: bytes, path: str = None) -> BakedConfig:
+    """BakedConfig for the bytes of a config file"""
+    config = json.loads(data)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path or 'config'}: expected a JSON object")
+    return BakedConfig(config, hashlib.sha256(data).hexdigest(), path)
+
+
+def load_baked_config(path: str) -> BakedConfig:
+    with open(path, "rb") as f:
+        return bake_config(f.read(), path)
+
+
+def if_config_unchanged(
+    file_variable: str, baked: BakedConfig
+) -> tuple[list[Action], str]:
+    """
+    Hash the config file in `file_variable` and start an If on it matching the
+    baked hash. Returns (actions, group_id); close it with otherwise()/end_if().
+    """
+    get_file, _ = get_variable(file_variable)
+    hash_action, _ = generate_hash("SHA256")
+    check, group_id = if_equals("config_hash", baked.sha256)
+    return [get_file, hash_action, set_variable("config_hash"), check], group_id
+
+
+def baked_variables(baked: BakedConfig, keys: tuple[str, ...]) -> list[Action]:
+    """Literal actions setting a variable for each config key that is set"""
+    actions = []
+    for key in keys:
+        if baked.config.get(key) is None:
+            continue  # like a runtime lookup of a missing key: no value
+        value, _ = literal(baked.config[key])
+        actions.append(value)
+        actions.append(set_variable(key))
+    return actions
@@ -0,0 +1,57 @@
+"""
+Source batching: several event sources per model call
+
+The weekly digest asks ChatGPT to fetch each source in its own call, and
+every call pays a full round trip. With the sources known at build time (a
+baked config, see bake.py) they can be packed into a few batches instead,
+each fetched with one call whose answer is a JSON object keyed by source.
+
+Batches are packed in config order under a token budget. A source's share of
+a call is estimated from its JSON (about CHARS_PER_TOKEN characters per
+token) plus RESPONSE_TOKENS for the events it answers with; a source over
+the budget on its own gets a batch to itself.
+
+Usage:
+    for batch in pack_sources(config["sources"], budget=16000):
+        keyed = [dict(s, key=source_key(s, n)) for n, s in enumerate(batch, 1)]
+"""
+
+import json
+
+CHARS_PER_TOKEN = 4
+RESPONSE_TOKENS = 1500  # a source's events, as the JSON array the model returns
+DEFAULT_BUDGET = 16000  # preferences.batch_tokens default: 8-15 sources in ~2 calls
+
+
+def source_key(source: dict, number: int) -> str:
+    """
+    The key of a source's events in a batch answer: its number in the batch
+    and its name, without the "." that Get Dictionary Value would read as a
+    key path. The number keeps same-named sources apart.
+    """
+    name = source.get("name", source.get("url", "")).replace(".", "")
+    return f"{number} {name}"
+
+
+def estimate_tokens(source: dict) -> int:
+    """Tokens a source adds to a batched call, prompt and answer"""
+    text = json.dumps(source, ensure_ascii=False)
+    return -(-len(text) // CHARS_PER_TOKEN) + RESPONSE_TOKENS
+
+
+def pack_sources(sources: list[dict], budget: int) -> list[list[dict]]:
+    """Enabled sources in batches of at most `budget` estimated tokens"""
+    if budget <= 0:
+        raise ValueError(f"budget must be positive, not {budget}")
+    batches = []
+    used = budget  # start a new batch on the first source
+    for source in sources:
+        if not source.get("enabled", True):
+            continue
+        tokens = estimate_tokens(source)
+        if used + tokens > budget:
+            batches.append([])
+            used = 0
+        batches[-1].append(source)
+        used += tokens
+    return batches
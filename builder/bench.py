@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the builder, serializer and validator hot paths
+
+Cases time the real build functions and a no-op `pencil-build` process, plus
+save_shortcut(), validate_shortcut_structure() and each token string builder
+on synthetic shortcuts of 1k, 10k and 100k actions. Each case runs for a few rounds of
+enough loops to take ~50 ms, and the fastest round is kept (the least
+disturbed by whatever else the machine is doing). The build cases also
+record their memory: the peak allocated during one call, and what its result
+still holds. build_execute_shortcut_ir and _plist retain the same unoptimized
+shortcut as IR nodes and as the plist dicts builders returned before them.
+
+Results are saved as JSON baselines. --compare reruns the same cases and
+flags every one that got slower than the baseline by more than --threshold.
+
+Usage:
+    python builder/bench.py                          # run and print
+    python builder/bench.py --save                   # write benchmarks/baseline.json
+    python builder/bench.py --compare benchmarks/baseline.json --threshold 0.2
+    python builder/bench.py -k validate --sizes 1000
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, NamedTuple
+
+from shortcut_builder import (
+    Action,
+    ask_apple_ai_with_variable,
+    ask_apple_ai_with_variables,
+    ask_chatgpt_with_input,
+    ask_chatgpt_with_variable,
+    create_shortcut,
+    end_if,
+    get_dictionary_value,
+    if_has_value,
+    otherwise,
+    repeat_each_end,
+    repeat_each_start,
+    save_shortcut,
+    set_variable,
+    show_result_with_variable,
+    template_token_string,
+    text,
+    text_with_variable,
+    to_plist,
+    token_string,
+    uuid_scope,
+)
+from validator import validate_shortcut_structure
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT_DIR, "benchmarks", "baseline.json")
+
+SIZES = (1_000, 10_000, 100_000)
+DEFAULT_THRESHOLD = 0.25  # 25% slower than the baseline is a regression
+ROUNDS = 5
+ROUND_SECONDS = 0.05
+
+
+class Result(NamedTuple):
+    seconds: float  # per call, fastest round
+    median: float  # per call, median round
+    loops: int  # calls per round
+    rounds: int
+    peak: int = None  # bytes allocated at most during one call (MEMORY_CASES)
+    retained: int = None  # bytes the call's result holds (MEMORY_CASES)
+
+
+class Regression(NamedTuple):
+    name: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+
+# =============================================================================
+# Synthetic Shortcuts
+# =============================================================================
+
+
+def synthetic_actions(count: int) -> list[Action]:
+    """
+    About `count` actions (rounded down to tens) in the mix the real shortcuts
+    use: text and token strings, variables, dictionary lookups, and nested If
+    and Repeat blocks
+    """
+    actions = []
+    with uuid_scope(f"bench-{count}"):
+        for n in range(count // 10):
+            loop, loop_id = repeat_each_start("items")
+            check, check_id = if_has_value("Repeat Item")
+            source, source_uuid = text(f"Item {n}", output_name="item")
+            actions += [
+                loop,
+                source,
+                get_dictionary_value("title", source_uuid)[0],
+                set_variable(f"value{n % 16}"),
+                check,
+                text_with_variable(f"Event {n}: ", "Repeat Item", ".")[0],
+                otherwise(check_id),
+                show_result_with_variable("Nothing for ", f"value{n % 16}"),
+                end_if(check_id),
+                repeat_each_end(loop_id),
+            ]
+    return actions
+
+
+def synthetic_shortcut(count: int) -> dict:
+    return to_plist(create_shortcut(f"Bench {count}", synthetic_actions(count)))
+
+
+# =============================================================================
+# Cases
+# =============================================================================
+
+# Token string builders: (name, call for action number n)
+TOKEN_BUILDERS = {
+    "token_string": lambda n: token_string(f"Hello {n}, ", "name", "!"),
+    "template_token_string": lambda n: template_token_string(
+        f"Find {{count}} events near {{city}} (#{n}): {{{{json}}}}", ["count", "city"]
+    ),
+    "text_with_variable": lambda n: text_with_variable(f"Item {n}: ", "x"),
+    "show_result_with_variable": lambda n: show_result_with_variable(
+        f"Found {n}: ", "data"
+    ),
+    "ask_chatgpt_with_variable": lambda n: ask_chatgpt_with_variable(
+        f"Find events in {n} ", "location", ". Return JSON."
+    ),
+    "ask_chatgpt_with_input": lambda n: ask_chatgpt_with_input(
+        f"Summarize item {n}", "input"
+    ),
+    "ask_apple_ai_with_variable": lambda n: ask_apple_ai_with_variable(
+        f"Rate event {n}: ", "event"
+    ),
+    "ask_apple_ai_with_variables": lambda n: ask_apple_ai_with_variables(
+        f"Plan {n} for {{family}} around {{calendar}}", ["family", "calendar"]
+    ),
+}
+
+
+def _build_case(module: str, function: str) -> Callable[[], Callable]:
+    def setup():
+        import importlib
+
+        return getattr(importlib.import_module(module), function)
+
+    return setup
+
+
+def _unoptimized_execute_case(lower: bool) -> Callable[[], Callable]:
+    def setup():
+        from build_execute import build_execute_shortcut
+
+        if lower:
+            return lambda: to_plist(build_execute_shortcut(optimize=False))
+        return lambda: build_execute_shortcut(optimize=False)
+
+    return setup
+
+
+def _family_case() -> Callable[[], Callable]:
+    def setup():
+        from build_main import build_main_shortcut
+
+        with open(os.path.join(ROOT_DIR, "config", "sample-config.json")) as f:
+            config = json.load(f)
+        return lambda: build_main_shortcut(config)
+
+    return setup
+
+
+def _cold_start_case() -> Callable[[], Callable]:
+    def setup():
+        import pencil_build
+
+        tmp = tempfile.TemporaryDirectory(prefix="bench-")
+        args = ["--out-dir", tmp.name, "--cache-dir", os.path.join(tmp.name, "cache")]
+        for target in pencil_build.TARGETS.values():
+            if target.default:
+                pencil_build.build_target(target, *args[1::2])
+
+        def call():  # a whole no-op `pencil-build` process; tmp lives as long
+            cmd = [sys.executable, pencil_build.__file__, *args]
+            subprocess.run(cmd, cwd=tmp.name, capture_output=True, check=True)
+
+        return call
+
+    return setup
+
+
+def _serialize_case(size: int) -> Callable[[], Callable]:
+    def setup():
+        shortcut = synthetic_shortcut(size)
+        tmp = tempfile.TemporaryDirectory(prefix="bench-")
+
+        def call():  # tmp is removed once the call is dropped
+            save_shortcut(shortcut, os.path.join(tmp.name, "bench.shortcut"))
+
+        return call
+
+    return setup
+
+
+def _validate_case(size: int) -> Callable[[], Callable]:
+    def setup():
+        shortcut = synthetic_shortcut(size)
+        return lambda: validate_shortcut_structure(shortcut)
+
+    return setup
+
+
+def _token_case(build: Callable, size: int) -> Callable[[], Callable]:
+    def setup():
+        # Distinct text per action, so the template caches don't hide the cost
+        def run():
+            with uuid_scope("bench"):
+                return to_plist([build(n) for n in range(size)])
+
+        return run
+
+    return setup
+
+
+def cases(sizes: tuple[int, ...] = SIZES) -> dict[str, Callable[[], Callable]]:
+    """{name: setup}; setup() does the untimed work and returns the timed call"""
+    found = {
+        "build_execute_shortcut": _build_case(
+            "build_execute", "build_execute_shortcut"
+        ),
+        "build_execute_shortcut_ir": _unoptimized_execute_case(lower=False),
+        "build_execute_shortcut_plist": _unoptimized_execute_case(lower=True),
+        "build_main_shortcut": _build_case("build_main", "build_main_shortcut"),
+        "build_setup_shortcut": _build_case("build_setup", "build_setup_shortcut"),
+        "build_family_shortcut": _family_case(),
+        "pencil_build_cold_start": _cold_start_case(),
+    }
+    for size in sizes:
+        found[f"save_shortcut[{size}]"] = _serialize_case(size)
+        found[f"validate_shortcut_structure[{size}]"] = _validate_case(size)
+        for name, build in TOKEN_BUILDERS.items():
+            found[f"{name}[{size}]"] = _token_case(build, size)
+    return found
+
+
+# =============================================================================
+# Running and Comparing
+# =============================================================================
+
+MEMORY_CASES = {
+    "build_execute_shortcut",
+    "build_execute_shortcut_ir",
+    "build_execute_shortcut_plist",
+    "build_main_shortcut",
+    "build_setup_shortcut",
+    "build_family_shortcut",
+}
+
+
+def measure(call: Callable, rounds: int = ROUNDS) -> Result:
+    """Time `call`: loops per round grow until a round takes ROUND_SECONDS"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= ROUND_SECONDS or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed * 4 >= ROUND_SECONDS else 10
+    times = [elapsed / loops]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            call()
+        times.append((time.perf_counter() - start) / loops)
+    return Result(min(times), statistics.median(times), loops, rounds)
+
+
+def measure_memory(call: Callable) -> tuple[int, int]:
+    """Peak bytes allocated during one call, and bytes its result still holds"""
+    tracemalloc.start()
+    try:
+        result = call()  # noqa: F841 (held while its size is traced)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, retained
+
+
+def run(
+    selected: dict[str, Callable[[], Callable]], rounds: int = ROUNDS, progress=None
+) -> dict[str, Result]:
+    """Run each case's setup, then time it. Returns {name: Result}."""
+    results = {}
+    for name, setup in selected.items():
+        call = setup()
+        results[name] = measure(call, rounds)
+        if name in MEMORY_CASES:
+            peak, retained = measure_memory(call)
+            results[name] = results[name]._replace(peak=peak, retained=retained)
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def to_json(results: dict[str, Result]) -> dict:
+    return {
+        "version": 1,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {name: result._asdict() for name, result in results.items()},
+    }
+
+
+def compare(
+    baseline: dict, results: dict[str, Result], threshold: float = DEFAULT_THRESHOLD
+) -> list[Regression]:
+    """Cases slower than the baseline by more than `threshold` (0.25 = 25%)"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before and result.seconds > before["seconds"] * (1 + threshold):
+            regressions.append(Regression(name, before["seconds"], result.seconds))
+    return regressions
+
+
+def _sizes(names) -> tuple[int, ...]:
+    """Synthetic sizes in case names like save_shortcut[1000]"""
+    return tuple(
+        sorted({int(name[name.index("[") + 1 : -1]) for name in names if "[" in name})
+    )
+
+
+def _format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the builder hot paths")
+    parser.add_argument("-k", dest="pattern", help="Only cases containing this text")
+    parser.add_argument(
+        "--sizes",
+        type=lambda s: tuple(int(n) for n in s.split(",")),
+        default=None,
+        help="Synthetic shortcut sizes (default: 1000,10000,100000, or the "
+        "baseline's with --compare)",
+    )
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument(
+        "--save",
+        nargs="?",
+        const=BASELINE,
+        metavar="PATH",
+        help=f"Write results as a baseline (default: {os.path.relpath(BASELINE)})",
+    )
+    parser.add_argument("--compare", metavar="PATH", help="Baseline to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown before a case counts as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = None
+    sizes = args.sizes or SIZES
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        sizes = args.sizes or _sizes(baseline["results"])
+    selected = cases(sizes)
+    if baseline is not None:
+        selected = {k: v for k, v in selected.items() if k in baseline["results"]}
+    if args.pattern:
+        selected = {k: v for k, v in selected.items() if args.pattern in k}
+
+    def progress(name: str, result: Result):
+        line = f"  {name:<45} {_format_seconds(result.seconds):>10}"
+        if result.peak is not None:
+            held, peak = result.retained / 1024, result.peak / 1024
+            line += f"  {held:.1f} KiB held, peak {peak:.1f} KiB"
+        before = baseline and baseline["results"].get(name)
+        if before:
+            line += f"  ({result.seconds / before['seconds']:.2f}x baseline)"
+        print(line, flush=True)
+
+    results = run(selected, args.rounds, progress)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(to_json(results), f, indent=2)
+            f.write("\n")
+        print(f"✓ Saved {len(results)} results to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+        for r in regressions:
+            print(
+                f"✗ {r.name}: {_format_seconds(r.baseline)} -> "
+                f"{_format_seconds(r.current)} ({r.ratio:.2f}x)"
+            )
+        print(
+            f"{len(regressions)} of {len(results)} cases regressed "
+            f"more than {args.threshold:.0%}"
+        )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
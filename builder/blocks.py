@@ -0,0 +1,532 @@
+"""
+Block templates: prebuilt action blocks, cloned with fresh UUIDs
+
+Shortcuts and their per-family variants repeat the same blocks: load a JSON
+file, parse it, pull keys out of a dictionary, the per-event menu. A block
+template runs its build function once, with placeholder arguments, and keeps
+the lowered actions with every UUID (GroupingIdentifiers included) and every
+argument replaced by a hole. Instantiating it is an O(size) clone that only
+fills the holes:
+
+- UUIDs come from new_uuid(), in the order the build function allocated
+  them, so an instance inside uuid_scope() is byte-identical to calling the
+  build function directly
+- arguments are strings (variable names, keys, paths, text) and may appear
+  anywhere in a string, including token strings (attachment ranges shift).
+  They are filled in after lowering, so a "variable.key" argument is not
+  read as a dictionary key: build the reference inside the block instead
+- each instance gets its own action and parameter dicts; deeper subtrees
+  without holes are shared between instances, so treat them as read-only
+
+With optimize=True the block is run through optimizer.py once, at compile
+time. Only use it for blocks whose optimization can't depend on the argument
+values, e.g. a whole shortcut parameterized by prompt text.
+
+Usage:
+    from blocks import block
+
+    @block
+    def extract_key(key: str, source: str, variable: str):
+        get, value_uuid = get_dictionary_value_from_variable(key, source)
+        return [get, set_variable_from_action(variable, value_uuid, "Dictionary Value")]
+
+    actions += extract_key("title", "Repeat Item", "event_title")
+"""
+
+import inspect
+import re
+from typing import Any, Callable
+
+from shortcut_builder import (
+    _utf16_len,
+    add_calendar_event_from_variables,
+    add_reminder_from_variable,
+    add_to_variable,
+    calendar_is,
+    choose_from_list,
+    count,
+    dictionary,
+    end_if,
+    find_calendar_events,
+    get_dictionary_from_input,
+    get_dictionary_value_from_variable,
+    get_file,
+    get_variable,
+    if_has_value,
+    menu_end,
+    menu_item,
+    menu_start,
+    menu_start_with_variable_prompt,
+    new_uuid,
+    otherwise,
+    repeat_each_end,
+    repeat_each_start,
+    set_dictionary_value,
+    set_uuid_allocator,
+    set_variable,
+    set_variable_from_action,
+    share_variable,
+    starts_within,
+    text,
+    to_plist,
+    token_string,
+    variable_ref,
+)
+
+# Holes are keys between U+E000 and U+E001 (private use, which no builder
+# emits): a=name for an argument, u=3 for the fourth UUID allocated. No "."
+# or ":", which would split a hole used as a variable name (see Aggrandizements)
+_HOLE = re.compile("\ue000([^\ue000\ue001]*)\ue001")
+_RANGE_KEY = re.compile(r"\{(\d+), (\d+)\}")
+
+# Action list -> action dicts -> parameter dicts are copied for each instance
+FRESH_DEPTH = 3
+
+
+def _hole(key: str) -> str:
+    return f"\ue000{key}\ue001"
+
+
+# =============================================================================
+# Patches
+# =============================================================================
+#
+# A compiled block is a tree of patches over constant values: fill() rebuilds
+# a patch from the hole values, and constants are reused as they are.
+
+
+class _Patch:
+    __slots__ = ()
+
+    def fill(self, values: dict[str, str]) -> Any:
+        raise NotImplementedError
+
+
+def _fill(value, values: dict[str, str]):
+    return value.fill(values) if isinstance(value, _Patch) else value
+
+
+class _Hole(_Patch):
+    """A whole string that is a UUID or an argument"""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def fill(self, values):
+        return values[self.key]
+
+
+class _Text(_Patch):
+    """A string with holes inside: alternating literal and hole keys"""
+
+    __slots__ = ("parts",)
+
+    def __init__(self, parts: tuple[str, ...]):
+        self.parts = parts
+
+    def fill(self, values):
+        parts = list(self.parts)
+        parts[1::2] = [values[key] for key in parts[1::2]]
+        return "".join(parts)
+
+
+class _TokenText(_Patch):
+    """
+    A token string's {"string", "attachmentsByRange"} with holes in the text:
+    attachments after a hole move by the UTF-16 length it gains
+    """
+
+    __slots__ = ("text", "holes", "attachments", "rest")
+
+    def __init__(self, text: _Text, attachments: list, rest: tuple):
+        self.text = text
+        self.holes = text.parts[1::2]  # in string order
+        # (offset, length, holes before it, value)
+        self.attachments = tuple(attachments)
+        self.rest = rest  # other keys, as (key, value) pairs
+
+    def fill(self, values):
+        shifts = [0]
+        for key in self.holes:
+            shifts.append(shifts[-1] + _utf16_len(values[key]) - len(_hole(key)))
+        value = {
+            "attachmentsByRange": {
+                f"{{{offset + shifts[before]}, {length}}}": _fill(item, values)
+                for offset, length, before, item in self.attachments
+            },
+            "string": self.text.fill(values),
+        }
+        for key, item in self.rest:
+            value[key] = _fill(item, values)
+        return value
+
+
+class _Dict(_Patch):
+    __slots__ = ("items",)
+
+    def __init__(self, items: tuple[tuple[Any, Any], ...]):
+        self.items = items
+
+    def fill(self, values):
+        return {_fill(k, values): _fill(v, values) for k, v in self.items}
+
+
+class _List(_Patch):
+    __slots__ = ("items",)
+
+    def __init__(self, items: tuple):
+        self.items = items
+
+    def fill(self, values):
+        return [_fill(item, values) for item in self.items]
+
+
+def _compile_string(value: str):
+    parts = _HOLE.split(value)
+    if len(parts) == 1:
+        return value
+    if len(parts) == 3 and not parts[0] and not parts[2]:
+        return _Hole(parts[1])
+    return _Text(tuple(parts))
+
+
+def _compile_token_text(value: dict, fresh: int):
+    text = _compile_string(value["string"])
+    if isinstance(text, _Hole):
+        text = _Text(("", text.key, ""))
+    starts = []  # offset of each hole in the compiled string
+    offset = 0
+    for i, part in enumerate(text.parts):
+        if i % 2:
+            starts.append(offset)
+            offset += len(_hole(part))
+        else:
+            offset += _utf16_len(part)
+    attachments = []
+    for range_key, item in value["attachmentsByRange"].items():
+        start, length = map(int, _RANGE_KEY.fullmatch(range_key).groups())
+        before = sum(hole_start < start for hole_start in starts)
+        attachments.append((start, length, before, _compile(item, fresh - 1)))
+    rest = tuple(
+        (k, _compile(v, fresh - 1))
+        for k, v in value.items()
+        if k not in ("string", "attachmentsByRange")
+    )
+    return _TokenText(text, attachments, rest)
+
+
+def _compile(value, fresh: int = 0):
+    """A patch for `value`, or `value` itself if it has no holes to fill"""
+    kind = type(value)
+    if kind is str:
+        return _compile_string(value)
+    if kind is dict:
+        string = value.get("string")
+        if (
+            type(string) is str
+            and "attachmentsByRange" in value
+            and _HOLE.search(string)
+        ):
+            return _compile_token_text(value, fresh)
+        items = tuple((_compile(k), _compile(v, fresh - 1)) for k, v in value.items())
+        if fresh > 0 or any(isinstance(x, _Patch) for item in items for x in item):
+            return _Dict(items)
+        return value
+    if kind is list or kind is tuple:
+        items = tuple(_compile(item, fresh - 1) for item in value)
+        if kind is tuple:  # a build function's (actions, uuid, ...) result
+            return items
+        if fresh > 0 or any(isinstance(item, _Patch) for item in items):
+            return _List(items)
+        return value
+    return value
+
+
+def _holes(value, found: set):
+    """Collect the hole keys used anywhere in a compiled value"""
+    if isinstance(value, _Hole):
+        found.add(value.key)
+    elif isinstance(value, _Text):
+        found.update(value.parts[1::2])
+    elif isinstance(value, _TokenText):
+        found.update(value.holes)
+        for *_, item in value.attachments:
+            _holes(item, found)
+        for _, item in value.rest:
+            _holes(item, found)
+    elif isinstance(value, _Dict):
+        for item in value.items:
+            _holes(item[0], found)
+            _holes(item[1], found)
+    elif isinstance(value, (_List, tuple)):
+        for item in value.items if isinstance(value, _List) else value:
+            _holes(item, found)
+    return found
+
+
+# =============================================================================
+# Block Templates
+# =============================================================================
+
+
+class BlockTemplate:
+    """
+    A build function compiled into a clonable block. Call it like the build
+    function: it returns the same shape (a list of lowered actions, or a tuple
+    starting with one), with fresh UUIDs.
+    """
+
+    __slots__ = ("build", "signature", "optimize", "report", "_compiled", "_uuids")
+
+    def __init__(self, build: Callable[..., Any], optimize: bool = False):
+        self.build = build
+        self.signature = inspect.signature(build)
+        self.optimize = optimize
+        self.report = None  # the OptimizationReport, with optimize=True
+        self._compiled = None
+        self._uuids = 0
+
+    def __repr__(self):
+        return f"BlockTemplate({self.build.__qualname__})"
+
+    def compile(self):
+        """Run the build function with placeholder arguments (done on first use)"""
+        if self._compiled is not None:
+            return
+        allocated = []
+
+        def allocate() -> str:
+            allocated.append(_hole(f"u={len(allocated)}"))
+            return allocated[-1]
+
+        names = list(self.signature.parameters)
+        previous = set_uuid_allocator(allocate)
+        try:
+            result = self.build(**{name: _hole(f"a={name}") for name in names})
+        finally:
+            set_uuid_allocator(previous)
+
+        actions = result[0] if isinstance(result, tuple) else result
+        actions = to_plist(list(actions))
+        if self.optimize:
+            from optimizer import optimize_shortcut
+
+            shortcut, self.report = optimize_shortcut({"WFWorkflowActions": actions})
+            actions = shortcut["WFWorkflowActions"]
+        if isinstance(result, tuple):
+            compiled = (_compile(actions, FRESH_DEPTH), *map(_compile, result[1:]))
+        else:
+            compiled = _compile(actions, FRESH_DEPTH)
+
+        used = _holes(compiled, set())
+        unused = [name for name in names if f"a={name}" not in used]
+        if unused and not self.optimize:
+            raise ValueError(
+                f"{self.build.__qualname__}: arguments {unused} don't appear in "
+                "the actions (block arguments must be used as strings, as is)"
+            )
+        self._uuids = len(allocated)
+        self._compiled = compiled
+        count("blocks_compiled")
+
+    def __call__(self, *args, **kwargs):
+        if self._compiled is None:
+            self.compile()
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        values = {f"u={i}": new_uuid() for i in range(self._uuids)}
+        for name, value in bound.arguments.items():
+            if type(value) is not str:
+                raise TypeError(
+                    f"{self.build.__qualname__}: {name} must be a str, "
+                    f"not {type(value).__name__}"
+                )
+            values[f"a={name}"] = value
+        compiled = self._compiled
+        if type(compiled) is tuple:
+            return tuple(_fill(item, values) for item in compiled)
+        return compiled.fill(values)
+
+
+def block(build: Callable = None, *, optimize: bool = False):
+    """Decorator: turn a build function into a BlockTemplate"""
+    if build is None:
+        return lambda build: BlockTemplate(build, optimize)
+    return BlockTemplate(build, optimize)
+
+
+# =============================================================================
+# Common Blocks
+# =============================================================================
+
+
+@block
+def load_json_file(path: str, variable: str):
+    """Get a file from iCloud (failing if missing) into a variable"""
+    get, file_uuid = get_file(path, error_if_not_found=True)
+    return [get, set_variable_from_action(variable, file_uuid, "File")]
+
+
+@block
+def parse_json(source: str, variable: str):
+    """Parse a text variable as a JSON dictionary into another variable"""
+    get, _ = get_variable(source)
+    parse, dict_uuid = get_dictionary_from_input()
+    return [get, parse, set_variable_from_action(variable, dict_uuid, "Dictionary")]
+
+
+@block
+def extract_key(key: str, source: str, variable: str):
+    """Get a dictionary variable's value for a key into a variable"""
+    get, value_uuid = get_dictionary_value_from_variable(key, source)
+    return [get, set_variable_from_action(variable, value_uuid, "Dictionary Value")]
+
+
+EVENT_ACTIONS = ["📅 Add to Calendar", "⏰ Remind Me", "💬 Share", "⏭️ Skip"]
+
+
+@block
+def event_menu(event: str):
+    """
+    The per-event menu: add to calendar, remind, share or skip. The event's
+    fields are read from its dictionary variable (see Aggrandizements in
+    shortcut_builder), so no Get Dictionary Value actions run per event.
+    """
+    items = EVENT_ACTIONS
+    menu, menu_id = menu_start_with_variable_prompt(items, f"{event}.title")
+    return [
+        menu,
+        menu_item(items[0], menu_id),
+        add_calendar_event_from_variables(
+            title_var=f"{event}.title",
+            start_date_var=f"{event}.date",
+            location_var=f"{event}.location",
+            notes_var=f"{event}.description",
+        ),
+        menu_item(items[1], menu_id),
+        add_reminder_from_variable(
+            title_var=f"{event}.title", notes_var=f"{event}.url"
+        ),
+        menu_item(items[2], menu_id),
+        share_variable(f"{event}.title"),
+        menu_item(items[3], menu_id),
+        menu_end(menu_id),
+    ]
+
+
+@block
+def batch_review(events: str):
+    """
+    Review every event in one multi-select list instead of a menu each, then
+    pick one of the event menu's actions for all the chosen events. Choose
+    from List shows a dictionary's keys and outputs the chosen values, so the
+    events are indexed first, by number and summary: events with the same
+    title and date stay apart.
+    """
+    items = EVENT_ACTIONS
+    empty, _ = dictionary({})
+    index, index_id = repeat_each_start(events)
+    key = token_string(
+        "", "Repeat Index", ". ", "Repeat Item.title", " · ", "Repeat Item.date"
+    )
+    choose, chosen_uuid = choose_from_list(
+        "Which events?", select_multiple=True, input_var="events_by_summary"
+    )
+    menu, menu_id = menu_start(items, prompt="What should happen to them?")
+    to_calendar, to_calendar_id = repeat_each_start("chosen_events")
+    to_reminders, to_reminders_id = repeat_each_start("chosen_events")
+    to_share, to_share_id = repeat_each_start("chosen_events")
+    summary, _ = text(token_string("", "Repeat Item.title", " · ", "Repeat Item.date"))
+    return [
+        empty,
+        set_variable("events_by_summary"),
+        index,
+        set_dictionary_value(
+            key, variable_ref("Repeat Item"), dictionary_var="events_by_summary"
+        ),
+        set_variable("events_by_summary"),
+        repeat_each_end(index_id),
+        choose,
+        set_variable_from_action("chosen_events", chosen_uuid, "Chosen Item"),
+        menu,
+        menu_item(items[0], menu_id),
+        to_calendar,
+        add_calendar_event_from_variables(
+            title_var="Repeat Item.title",
+            start_date_var="Repeat Item.date",
+            location_var="Repeat Item.location",
+            notes_var="Repeat Item.description",
+        ),
+        repeat_each_end(to_calendar_id),
+        menu_item(items[1], menu_id),
+        to_reminders,
+        add_reminder_from_variable(
+            title_var="Repeat Item.title", notes_var="Repeat Item.url"
+        ),
+        repeat_each_end(to_reminders_id),
+        menu_item(items[2], menu_id),
+        to_share,
+        summary,
+        repeat_each_end(to_share_id),
+        set_variable("chosen_summaries"),
+        share_variable("chosen_summaries"),
+        menu_item(items[3], menu_id),
+        menu_end(menu_id),
+    ]
+
+
+# =============================================================================
+# Calendar
+# =============================================================================
+
+
+def busy_times(
+    calendars: str, variable: str, within: int, unit: str = "days", limit: int = 50
+) -> list:
+    """
+    Busy times for a prompt: the events in each calendar of the `calendars`
+    list that start in the next `within` units, as "start – end: title" lines
+    in `variable`. Find Calendar Events filters on the device, so the prompt
+    only gets the window's events and three of their fields. Without a
+    `calendars` list (Setup doesn't write one) every calendar is searched.
+
+    Not a block: the window is a number, and blocks only take strings.
+    """
+    has_calendars, has_calendars_id = if_has_value(calendars)
+    per_calendar, per_calendar_id = repeat_each_start(calendars)
+    find, _ = find_calendar_events(
+        [calendar_is(calendar_var="Repeat Item"), starts_within(within, unit)],
+        sort_by="Start Date",
+        limit=limit,
+    )
+    find_all, _ = find_calendar_events(
+        [starts_within(within, unit)], sort_by="Start Date", limit=limit
+    )
+    found, found_id = repeat_each_start("found_events")
+    line, _ = text(
+        token_string(
+            "",
+            "Repeat Item:Start Date",
+            " – ",
+            "Repeat Item:End Date",
+            ": ",
+            "Repeat Item:Title",
+        )
+    )
+    return [
+        has_calendars,
+        per_calendar,
+        find,
+        add_to_variable("found_events"),
+        repeat_each_end(per_calendar_id),
+        otherwise(has_calendars_id),
+        find_all,
+        add_to_variable("found_events"),
+        end_if(has_calendars_id),
+        found,
+        line,
+        repeat_each_end(found_id),
+        set_variable(variable),
+    ]
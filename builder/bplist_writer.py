@@ -0,0 +1,278 @@
+"""
+Streaming binary plist (bplist00) writer
+
+plistlib flattens the whole object graph before writing a byte. This writer
+emits each object as soon as it is reached (children before their container),
+so a shortcut's actions can be consumed one at a time - from a list, a
+generator, or Action IR nodes that are lowered one action at a time.
+
+Equal strings, numbers and whole subtrees are written once and shared by
+reference, the same way Shortcuts' own exports share repeated parameters.
+Memory is bounded by the dedupe table size plus 8 bytes per written object
+for the offset table, which the format requires at the end of the file.
+"""
+
+import struct
+import sys
+from array import array
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Iterable
+
+_EPOCH = datetime(2001, 1, 1, tzinfo=timezone.utc)
+_FLUSH_SIZE = 1 << 16
+
+# Dedupe entries kept before the oldest are forgotten
+DEDUPE_LIMIT = 1 << 16
+
+
+def _int_bytes(value: int) -> bytes:
+    """Encode an integer object (marker 0x1n)"""
+    if value < 0:
+        return b"\x13" + value.to_bytes(8, "big", signed=True)
+    if value < 1 << 8:
+        return b"\x10" + value.to_bytes(1, "big")
+    if value < 1 << 16:
+        return b"\x11" + value.to_bytes(2, "big")
+    if value < 1 << 32:
+        return b"\x12" + value.to_bytes(4, "big")
+    if value < 1 << 63:
+        return b"\x13" + value.to_bytes(8, "big")
+    if value < 1 << 64:
+        return b"\x14" + value.to_bytes(16, "big")
+    raise OverflowError(value)
+
+
+def _marker(kind: int, count: int) -> bytes:
+    """Object marker with its length, spilling into an int object past 14"""
+    if count < 15:
+        return bytes((kind | count,))
+    return bytes((kind | 0xF,)) + _int_bytes(count)
+
+
+def _size_for(value: int) -> int:
+    for size in (1, 2, 4):
+        if value < 1 << (8 * size):
+            return size
+    return 8
+
+
+# Unsigned array typecodes by byte width
+_TYPECODES = {
+    size: next(code for code in "BHILQ" if array(code).itemsize == size)
+    for size in (1, 2, 4, 8)
+}
+
+
+def _pack_uints(values, size: int) -> bytes:
+    """Pack unsigned ints big-endian, `size` bytes each"""
+    packed = array(_TYPECODES[size], values)
+    if sys.byteorder == "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+class BinaryPlistWriter:
+    """
+    Write a bplist00 file incrementally.
+
+    Usage:
+        writer = BinaryPlistWriter(fp)
+        actions_ref = writer.write_array(iter_actions())
+        top_ref = writer.write_dict({"WFWorkflowActions": actions_ref}, refs=True)
+        writer.finish(top_ref)
+    """
+
+    def __init__(
+        self,
+        fp: BinaryIO,
+        ref_size: int = 4,
+        sort_keys: bool = True,
+        dedupe_limit: int = DEDUPE_LIMIT,
+    ):
+        self._fp = fp
+        self._ref_size = ref_size
+        self._max_ref = (1 << (8 * ref_size)) - 1
+        self._sort_keys = sort_keys
+        self._dedupe_limit = dedupe_limit
+        self._memo = {}  # str, (type, value) or structural key -> ref
+        self._nodes = {}  # id(IR node) -> (node, ref); keeps node alive
+        self._offsets = array("Q")
+        self._buffer = bytearray(b"bplist00")
+        self._position = 0  # bytes already flushed to fp
+
+    # -------------------------------------------------------------------------
+    # Low level
+    # -------------------------------------------------------------------------
+
+    def _emit(self, data: bytes) -> int:
+        ref = len(self._offsets)
+        if ref > self._max_ref:
+            raise OverflowError(
+                f"More than {self._max_ref + 1} objects; use a larger ref_size"
+            )
+        self._offsets.append(self._position + len(self._buffer))
+        self._buffer += data
+        if len(self._buffer) >= _FLUSH_SIZE:
+            self._flush()
+        return ref
+
+    def _flush(self):
+        self._fp.write(self._buffer)
+        self._position += len(self._buffer)
+        self._buffer = bytearray()
+
+    def _remember(self, key, data_fn) -> int:
+        memo = self._memo
+        ref = memo.get(key)
+        if ref is not None:
+            return ref
+        ref = self._emit(data_fn())
+        memo[key] = ref
+        if len(memo) > self._dedupe_limit:
+            del memo[next(iter(memo))]
+        return ref
+
+    def _refs(self, refs) -> bytes:
+        return _pack_uints(refs, self._ref_size)
+
+    # -------------------------------------------------------------------------
+    # Objects
+    # -------------------------------------------------------------------------
+
+    def write(self, value: Any) -> int:
+        """Write value (and everything below it). Returns its object ref."""
+        kind = type(value)
+        if kind is str:
+            # Strings are the bulk of a shortcut; no other type compares equal
+            ref = self._memo.get(value)
+            if ref is not None:
+                return ref
+            return self._remember(value, lambda: self._string(value))
+        if kind is bool:
+            return self._remember((bool, value), lambda: b"\x09" if value else b"\x08")
+        if kind is int:
+            return self._remember((int, value), lambda: _int_bytes(value))
+        if kind is dict:
+            return self.write_dict(value)
+        if kind is list or kind is tuple:
+            return self.write_array(value)
+        if kind is float:
+            return self._remember(
+                (float, value), lambda: struct.pack(">Bd", 0x23, value)
+            )
+        if kind is bytes or kind is bytearray:
+            data = bytes(value)
+            return self._remember(
+                (bytes, data), lambda: _marker(0x40, len(data)) + data
+            )
+        if kind is datetime:
+            return self._remember((datetime, value), lambda: self._date(value))
+        lower = getattr(value, "to_plist", None)
+        if lower is not None:
+            return self._write_node(value, lower)
+        raise TypeError(f"unsupported type: {kind.__name__}")
+
+    def write_array(self, items: Iterable) -> int:
+        """Write an array, consuming `items` lazily. Returns its object ref."""
+        refs = array("Q", (self.write(item) for item in items))
+        return self._remember(
+            ("a", refs.tobytes()), lambda: self._container(0xA0, refs)
+        )
+
+    def write_dict(self, mapping: dict, refs: bool = False) -> int:
+        """
+        Write a dictionary. Returns its object ref.
+
+        Args:
+            refs: Values are object refs already returned by this writer
+        """
+        items = sorted(mapping.items()) if self._sort_keys else mapping.items()
+        key_refs = array("Q")
+        value_refs = array("Q")
+        for key, item in items:
+            if type(key) is not str:
+                raise TypeError("keys must be strings")
+            key_refs.append(self.write(key))
+            value_refs.append(item if refs else self.write(item))
+        key = ("d", key_refs.tobytes(), value_refs.tobytes())
+        return self._remember(
+            key, lambda: self._container(0xD0, key_refs) + self._refs(value_refs)
+        )
+
+    def _write_node(self, node, lower) -> int:
+        # IR nodes are immutable and often shared: write each instance once
+        cached = self._nodes.get(id(node))
+        if cached is not None:
+            return cached[1]
+        ref = self.write(lower())
+        if len(self._nodes) >= self._dedupe_limit:
+            self._nodes.clear()
+        self._nodes[id(node)] = (node, ref)
+        return ref
+
+    def _container(self, kind: int, refs) -> bytes:
+        return _marker(kind, len(refs)) + self._refs(refs)
+
+    @staticmethod
+    def _string(value: str) -> bytes:
+        if value.isascii():
+            return _marker(0x50, len(value)) + value.encode("ascii")
+        data = value.encode("utf-16-be")
+        return _marker(0x60, len(data) // 2) + data
+
+    @staticmethod
+    def _date(value: datetime) -> bytes:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return struct.pack(">Bd", 0x33, (value - _EPOCH).total_seconds())
+
+    # -------------------------------------------------------------------------
+    # Trailer
+    # -------------------------------------------------------------------------
+
+    def finish(self, top_ref: int):
+        """Write the offset table and trailer"""
+        offset_table = self._position + len(self._buffer)
+        offset_size = _size_for(offset_table)
+        offsets = self._offsets
+        for start in range(0, len(offsets), _FLUSH_SIZE):
+            self._buffer += _pack_uints(
+                offsets[start : start + _FLUSH_SIZE], offset_size
+            )
+            self._flush()
+        self._buffer += struct.pack(
+            ">6xBBQQQ", offset_size, self._ref_size, len(offsets), top_ref, offset_table
+        )
+        self._flush()
+
+
+def dump(value: Any, fp: BinaryIO, ref_size: int = 4):
+    """Write any plist value (IR nodes included) to fp"""
+    writer = BinaryPlistWriter(fp, ref_size=ref_size)
+    writer.finish(writer.write(value))
+
+
+def dump_shortcut(shortcut: dict, fp: BinaryIO, ref_size: int = None):
+    """
+    Write a shortcut, streaming WFWorkflowActions one action at a time.
+
+    WFWorkflowActions may be any iterable (e.g. a generator of actions).
+    ref_size defaults to 2 bytes when that fits and fp can be rewound, else 4.
+    """
+    actions = shortcut.get("WFWorkflowActions", [])
+    if ref_size is None and hasattr(actions, "__len__") and fp.seekable():
+        # Small shortcuts fit 2-byte refs; start over with 4 if they don't
+        start = fp.tell()
+        try:
+            return dump_shortcut(shortcut, fp, ref_size=2)
+        except OverflowError:
+            fp.seek(start)
+            fp.truncate()
+    writer = BinaryPlistWriter(fp, ref_size=ref_size or 4)
+    header = {}
+    for key, value in shortcut.items():
+        if key == "WFWorkflowActions":
+            header[key] = writer.write_array(actions)
+        else:
+            header[key] = writer.write(value)
+    writer.finish(writer.write_dict(header, refs=True))
@@ -3,25 +3,34 @@
 Build the "Pencil Me In" (execute/weekly digest) shortcut
 """
 
+import hashlib
+import json
 import sys
 
-sys.path.insert(0, "/Users/athal/code/pencil-me-in/builder")
-
+from bake import BakedConfig, baked_variables, if_config_unchanged
+from batching import DEFAULT_BUDGET, pack_sources, source_key
+from blocks import busy_times
+from cache import cached_call, load_cache, save_cache
 from shortcut_builder import (
     create_shortcut,
-    save_shortcut,
+    uuid_scope,
     comment,
     text,
+    template_token_string,
+    token_string,
     ask,
     set_variable,
+    add_to_variable,
     get_variable,
     show_alert,
-    show_result,
+    show_result_with_variable,
     notification,
     menu_start,
     menu_item,
     menu_end,
     if_has_value,
+    if_has_no_value,
+    if_equals,
     otherwise,
     end_if,
     dictionary,
@@ -35,7 +44,6 @@ from shortcut_builder import (
     get_url_variable,
     ask_chatgpt,
     ask_chatgpt_with_input,
-    get_upcoming_events,
     add_calendar_event,
     add_reminder,
     repeat_each_start,
@@ -46,10 +54,87 @@ from shortcut_builder import (
 )
 
 CONFIG_PATH = "Shortcuts/pencil-me-in-config.json"
+CONFIG_KEYS = ("location", "sources", "kids", "calendars_to_check")
+ADVANCE_TICKET_WEEKS = 12  # preferences.advance_ticket_weeks default
+
+EVENT_FORMAT = """Extract events happening in the next 2 weeks. For each event return:
+- title: Event name
+- date: Date in YYYY-MM-DD format  
+- time: Time in HH:MM format (24h) or "all-day"
+- location: Venue/location
+- description: Brief description
+- needs_tickets: true if advance tickets likely required
+- family_friendly: true if suitable for families
+- source: Name of the source"""
+
+FETCH_PROMPT = f"""Fetch and parse events from this source. {{source}}
+
+{EVENT_FORMAT}
 
+Return ONLY a JSON array, no other text. If you can't fetch the source, return []."""
+
+BATCH_PROMPT = f"""Fetch and parse events from each of these sources:
+{{sources}}
+
+{EVENT_FORMAT}
 
-def build_execute_shortcut():
-    """Build the Pencil Me In weekly digest shortcut"""
+Return ONLY a JSON object, no other text, with one entry per source keyed by
+its "key": {{"events": [...]}} with the source's events, or null if you
+can't fetch the source."""
+
+
+def fetch_batches(batches: list[list[dict]]) -> list:
+    """
+    Fetch each batch of sources with one call (see batching.py), falling back
+    to a call of its own for every source the batch answer is missing. The
+    fallback is cached like the per-source loop's calls, under the same key.
+    Each source's events are added to all_events_raw, as in the loop.
+    """
+    actions = []
+    for batch in batches:
+        keys = [source_key(source, n) for n, source in enumerate(batch, 1)]
+        listed = json.dumps(
+            [dict(source, key=key) for source, key in zip(batch, keys)],
+            ensure_ascii=False,
+            indent=2,
+        )
+        names = ", ".join(keys)
+        actions.append(comment(f"Fetch {len(batch)} sources at once: {names}"))
+        batch_ai, _ = ask_chatgpt(BATCH_PROMPT.replace("{sources}", listed, 1))
+        digest = hashlib.sha256(listed.encode()).hexdigest()[:16]
+        actions += cached_call(
+            (f"batch {digest} ", "cache_week"), "batch_events", [batch_ai]
+        )
+
+        for source, key in zip(batch, keys):
+            answer = f"batch_events.{key}"
+            actions.append(set_variable("source_events", f"{answer}.events"))
+            missing, missing_id = if_has_no_value(answer)
+            actions.append(missing)
+            inline = json.dumps(source, ensure_ascii=False)
+            fetch_ai, _ = ask_chatgpt(
+                FETCH_PROMPT.replace("{source}", f"The source:\n{inline}", 1)
+            )
+            actions += cached_call(
+                (f"{source.get('url', '')} ", "cache_week"), "source_events", [fetch_ai]
+            )
+            actions.append(end_if(missing_id))
+            get_events, _ = get_variable("source_events")
+            actions += [get_events, add_to_variable("all_events_raw")]
+    return actions
+
+
+@uuid_scope("Pencil Me In")
+def build_execute_shortcut(baked: BakedConfig = None, optimize: bool = True):
+    """
+    Build the Pencil Me In weekly digest shortcut
+
+    Args:
+        baked: A household's config to bake in (see bake.py), or None to
+            load it at run time only. Its sources are fetched in batches
+            of preferences.batch_tokens (0 for one call per source).
+        optimize: Run the optimizer, which lowers the actions to plist dicts
+    """
     actions = []
 
     # ==========================================================================
@@ -74,6 +159,13 @@ def build_execute_shortcut():
     has_config, has_config_id = if_has_value("config_file")
     actions.append(has_config)
 
+    # Use the baked values while the file is the one they were baked from
+    if baked is not None:
+        unchanged, unchanged_id = if_config_unchanged("config_file", baked)
+        actions += unchanged
+        actions += baked_variables(baked, CONFIG_KEYS)
+        actions.append(otherwise(unchanged_id))
+
     # Parse config
     get_cfg, _ = get_variable("config_file")
     actions.append(get_cfg)
@@ -82,23 +174,15 @@ def build_execute_shortcut():
     actions.append(set_variable("config"))
 
     # Extract key values
-    get_cfg2, _ = get_variable("config")
-    actions.append(get_cfg2)
-    location_val, _ = get_dictionary_value("location")
-    actions.append(location_val)
-    actions.append(set_variable("location"))
-
-    get_cfg3, _ = get_variable("config")
-    actions.append(get_cfg3)
-    sources_val, _ = get_dictionary_value("sources")
-    actions.append(sources_val)
-    actions.append(set_variable("sources"))
-
-    get_cfg4, _ = get_variable("config")
-    actions.append(get_cfg4)
-    kids_val, _ = get_dictionary_value("kids")
-    actions.append(kids_val)
-    actions.append(set_variable("kids"))
+    for key in CONFIG_KEYS:
+        get_cfg, _ = get_variable("config")
+        actions.append(get_cfg)
+        value, _ = get_dictionary_value(key)
+        actions.append(value)
+        actions.append(set_variable(key))
+
+    if baked is not None:
+        actions.append(end_if(unchanged_id))
 
     actions.append(otherwise(has_config_id))
     actions.append(
@@ -115,20 +199,34 @@ def build_execute_shortcut():
     # ==========================================================================
     actions.append(comment("--- Get Calendar Events for Conflict Checking ---"))
 
-    # Get events for next 2 weeks
-    upcoming, upcoming_uuid = get_upcoming_events(count=100)
-    actions.append(upcoming)
-    actions.append(set_variable("my_calendar_events"))
+    # Only the digest's window (out to the advance ticket events) can conflict
+    weeks = ADVANCE_TICKET_WEEKS
+    if baked is not None:
+        weeks = baked.config.get("preferences", {}).get("advance_ticket_weeks", weeks)
+    actions += busy_times(
+        "calendars_to_check", "my_calendar_events", weeks, "weeks", limit=100
+    )
 
     # ==========================================================================
     # Fetch Event Sources
     # ==========================================================================
     actions.append(comment("--- Fetch Event Sources ---"))
 
-    # Initialize collected events
-    init_events, _ = text("[]")
-    actions.append(init_events)
-    actions.append(set_variable("all_events_raw"))
+    # Answers cached this week (see cache.py)
+    actions += load_cache()
+
+    # Baked sources are packed into a few calls, while the config is unchanged
+    budget = DEFAULT_BUDGET
+    if baked is not None:
+        budget = baked.config.get("preferences", {}).get("batch_tokens", budget)
+    batches = []
+    if baked is not None and budget > 0:
+        batches = pack_sources(baked.config.get("sources") or [], budget)
+    if batches:
+        unchanged, unchanged_id = if_equals("config_hash", baked.sha256)
+        actions.append(unchanged)
+        actions += fetch_batches(batches)
+        actions.append(otherwise(unchanged_id))
 
     # Loop through sources
     loop_sources, loop_sources_id = repeat_each_start("sources")
@@ -137,26 +235,25 @@ def build_execute_shortcut():
     # Get source URL from current item
     actions.append(comment("Fetch this source"))
 
-    # For now, use ChatGPT to handle all source types
-    fetch_prompt = """Fetch and parse events from this source. The source info is in the Repeat Item variable.
-
-Extract events happening in the next 2 weeks. For each event return:
-- title: Event name
-- date: Date in YYYY-MM-DD format  
-- time: Time in HH:MM format (24h) or "all-day"
-- location: Venue/location
-- description: Brief description
-- needs_tickets: true if advance tickets likely required
-- family_friendly: true if suitable for families
-- source: Name of the source
-
-Return ONLY a JSON array, no other text. If you can't fetch the source, return []."""
+    # For now, use ChatGPT to handle all source types; only ask when this
+    # source wasn't fetched this week
+    before, after = FETCH_PROMPT.split("{source}")
+    fetch_ai, _ = ask_chatgpt(
+        token_string(f"{before}The source:\n", "Repeat Item", after)
+    )
+    actions += cached_call(
+        ("", "Repeat Item.url", " ", "cache_week"), "source_events", [fetch_ai]
+    )
 
-    fetch_ai, _ = ask_chatgpt(fetch_prompt)
-    actions.append(fetch_ai)
-    actions.append(set_variable("source_events"))
+    # Collect each source's events (a JSON array) for the digest
+    get_events, _ = get_variable("source_events")
+    actions.append(get_events)
+    actions.append(add_to_variable("all_events_raw"))
 
     actions.append(repeat_each_end(loop_sources_id))
+    if batches:
+        actions.append(end_if(unchanged_id))
+    actions += save_cache()
 
     # ==========================================================================
     # Process with AI - Create Digest
@@ -164,19 +261,21 @@ Return ONLY a JSON array, no other text. If you can't fetch the source, return [
     actions.append(comment("--- AI Processing: Create Personalized Digest ---"))
 
     # Build the mega-prompt for ChatGPT
-    digest_prompt_text, _ = (
-        text("""You are helping a busy parent find family events. Here's the context:
+    # The config values are variables, baked or loaded above
+    digest_prompt_text, _ = text(
+        template_token_string(
+            """You are helping a busy parent find family events. Here's the context:
 
-LOCATION: {{location}}
+LOCATION: {location}
 
 MY CALENDAR (busy times to avoid):
-{{my_calendar_events}}
+{my_calendar_events}
 
 KIDS INFO:
-{{kids}}
+{kids}
 
 AVAILABLE EVENTS FROM LOCAL SOURCES:
-{{all_events_raw}}
+{all_events_raw}
 
 Please create a weekly digest with these sections:
 
@@ -199,7 +298,9 @@ Any notable family movie releases, sports events, or TV premieres this week on m
 ## 💡 Top Pick
 Your #1 recommendation for our family this week and why.
 
-Be concise. Use emojis. Make it scannable.""")
+Be concise. Use emojis. Make it scannable.""",
+            ["location", "kids", "my_calendar_events", "all_events_raw"],
+        )
     )
     actions.append(digest_prompt_text)
     actions.append(set_variable("digest_prompt"))
@@ -221,7 +322,9 @@ Be concise. Use emojis. Make it scannable.""")
 
     get_digest, _ = get_variable("digest")
     actions.append(get_digest)
-    actions.append(show_result("# 📅 Pencil Me In - Weekly Digest\n\n{{digest}}"))
+    actions.append(
+        show_result_with_variable("# 📅 Pencil Me In - Weekly Digest\n\n", "digest")
+    )
 
     # ==========================================================================
     # Action Menu
@@ -267,7 +370,7 @@ If no events to add, return []."""
     # For now, show what would be added
     get_cal_events, _ = get_variable("calendar_events")
     actions.append(get_cal_events)
-    actions.append(show_result("Events to add:\n{{calendar_events}}"))
+    actions.append(show_result_with_variable("Events to add:\n", "calendar_events"))
 
     # --------------------------------------------------------------------------
     # Set Ticket Reminders
@@ -288,7 +391,9 @@ If no tickets needed, return []."""
 
     get_reminders, _ = get_variable("ticket_reminders")
     actions.append(get_reminders)
-    actions.append(show_result("Reminders to create:\n{{ticket_reminders}}"))
+    actions.append(
+        show_result_with_variable("Reminders to create:\n", "ticket_reminders")
+    )
 
     # --------------------------------------------------------------------------
     # Share with Family
@@ -304,14 +409,18 @@ If no tickets needed, return []."""
     get_digest2, _ = get_variable("digest")
     actions.append(get_digest2)
     actions.append(
-        show_result("Copy this digest and paste into Messages:\n\n{{digest}}")
+        show_result_with_variable(
+            "Copy this digest and paste into Messages:\n\n", "digest"
+        )
     )
 
     actions.append(menu_item("Email", share_menu_id))
     get_digest3, _ = get_variable("digest")
     actions.append(get_digest3)
     actions.append(
-        show_result("Copy this digest and paste into an email:\n\n{{digest}}")
+        show_result_with_variable(
+            "Copy this digest and paste into an email:\n\n", "digest"
+        )
     )
 
     actions.append(menu_end(share_menu_id))
@@ -333,14 +442,13 @@ If no tickets needed, return []."""
         actions,
         icon_color=4274264319,  # Orange
         icon_glyph=61555,  # Calendar/list icon
+        optimize=optimize,
     )
 
     return shortcut
 
 
 if __name__ == "__main__":
-    shortcut = build_execute_shortcut()
-    output_path = "/Users/athal/code/pencil-me-in/shortcuts/Pencil-Me-In.shortcut"
-    save_shortcut(shortcut, output_path)
-    print(f"Created: {output_path}")
-    print(f"Actions: {len(shortcut['WFWorkflowActions'])}")
+    from pencil_build import main
+
+    sys.exit(main(["execute", *sys.argv[1:]]))
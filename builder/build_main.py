@@ -4,40 +4,42 @@ Build "Pencil Me In" main shortcut
 
 Flow:
 1. Load config JSON from iCloud
-2. Get busy times from calendar
+2. Get the next two weeks' busy times from the configured calendars
 3. Ask ChatGPT to fetch sources and return events as JSON
-4. Loop through events, letting user choose action for each
+4. Review the events: pick them from one multi-select list (batch), or
+   choose an action for each in its own menu (menu)
 """
 
 import sys
 
-sys.path.insert(0, "/Users/athal/code/pencil-me-in/builder")
-
+from blocks import (
+    BlockTemplate,
+    batch_review,
+    block,
+    busy_times,
+    event_menu,
+    load_json_file,
+    parse_json,
+)
 from shortcut_builder import (
     create_shortcut,
-    save_shortcut,
+    uuid_scope,
     comment,
     set_variable_from_action,
-    get_variable,
     show_alert,
-    get_file,
-    get_dictionary_from_input,
-    get_dictionary_value_from_variable,
-    get_upcoming_events,
     ask_apple_ai_with_variables,
     repeat_each_start,
     repeat_each_end,
-    menu_item,
-    menu_end,
-    text_with_variable,
-    add_calendar_event_from_variables,
-    add_reminder_from_variable,
-    share_variable,
-    menu_start_with_variable_prompt,
 )
 
 CONFIG_PATH = "pencil-me-in-config.json"
 
+# The events asked for are in the next 14 days, so only those can conflict
+BUSY_DAYS = 14
+
+# preferences.review in the config schema; the first is the default
+REVIEW_MODES = ("menu", "batch")
+
 PROMPT = """You are a family event assistant. Find upcoming events and return them as JSON.
 
 ## CONFIG
@@ -84,132 +86,119 @@ Include "needs_tickets": true and "ticket_date" for events requiring advance pur
 Return empty array [] if no events found."""
 
 
-def build_main_shortcut():
+def household_section(config: dict) -> str:
+    """One household's location, kids and sources, spelled out for the prompt"""
+    lines = ["## HOUSEHOLD", f"Location: {config.get('location', '')}"]
+    ages = [str(kid["age"]) for kid in config.get("kids", []) if "age" in kid]
+    if ages:
+        lines.append(f"Kids' ages: {', '.join(ages)}")
+    if config.get("streaming_services"):
+        lines.append(f"Streaming services: {', '.join(config['streaming_services'])}")
+    sources = [s for s in config.get("sources", []) if s.get("enabled", True)]
+    if sources:
+        lines.append("Sources:")
+        lines.extend(f"- {s['name']} ({s['type']}): {s['url']}" for s in sources)
+    return "\n".join(lines)
+
+
+def household_prompt(config: dict) -> str:
+    """PROMPT with one household's section before the config"""
+    return PROMPT.replace("## CONFIG", f"{household_section(config)}\n\n## CONFIG", 1)
+
+
+def main_actions(prompt: str, review: str = "menu") -> list:
+    """The main shortcut's actions, asking the model with `prompt`"""
+    if review not in REVIEW_MODES:
+        raise ValueError(f"review must be one of {REVIEW_MODES}, not {review!r}")
     actions = []
 
     actions.append(comment("=== Pencil Me In ==="))
 
     # 1. Load config
     actions.append(comment("1. Load config"))
-    get_config, config_uuid = get_file(CONFIG_PATH, error_if_not_found=True)
-    actions.append(get_config)
-    actions.append(set_variable_from_action("config", config_uuid, "File"))
+    actions += load_json_file(CONFIG_PATH, "config")
 
     # 2. Get busy times
     actions.append(comment("2. Get busy times"))
-    calendar_events, cal_uuid = get_upcoming_events(count=50)
-    actions.append(calendar_events)
-    actions.append(set_variable_from_action("busy_events", cal_uuid, "Calendar Events"))
+    actions += busy_times("config.calendars_to_check", "busy_events", BUSY_DAYS)
 
     # 3. Ask ChatGPT for events as JSON
     actions.append(comment("3. Ask ChatGPT"))
-    ai_action, ai_uuid = ask_apple_ai_with_variables(PROMPT, ["config", "busy_events"])
+    ai_action, ai_uuid = ask_apple_ai_with_variables(prompt, ["config", "busy_events"])
     actions.append(ai_action)
     actions.append(set_variable_from_action("events_json", ai_uuid, "Text"))
 
     # Parse JSON
     actions.append(comment("4. Parse JSON"))
-    get_json, json_var_uuid = get_variable("events_json")
-    actions.append(get_json)
-    parse_json, dict_uuid = get_dictionary_from_input()
-    actions.append(parse_json)
-    actions.append(set_variable_from_action("events", dict_uuid, "Dictionary"))
+    actions += parse_json("events_json", "events")
 
     # 4. Loop through events
     actions.append(comment("5. Loop through events"))
-    repeat_start, group_id = repeat_each_start("events")
-    actions.append(repeat_start)
-
-    # Get current event details from Repeat Item
-    get_title, title_uuid = get_dictionary_value_from_variable("title", "Repeat Item")
-    actions.append(get_title)
-    actions.append(
-        set_variable_from_action("event_title", title_uuid, "Dictionary Value")
-    )
-
-    get_date, date_uuid = get_dictionary_value_from_variable("date", "Repeat Item")
-    actions.append(get_date)
-    actions.append(
-        set_variable_from_action("event_date", date_uuid, "Dictionary Value")
-    )
-
-    get_time, time_uuid = get_dictionary_value_from_variable("time", "Repeat Item")
-    actions.append(get_time)
-    actions.append(
-        set_variable_from_action("event_time", time_uuid, "Dictionary Value")
-    )
-
-    get_loc, loc_uuid = get_dictionary_value_from_variable("location", "Repeat Item")
-    actions.append(get_loc)
-    actions.append(
-        set_variable_from_action("event_location", loc_uuid, "Dictionary Value")
-    )
+    if review == "batch":
+        # One list to pick from, then one action for the chosen events
+        actions += batch_review("events")
+    else:
+        # Show menu for each event: add to calendar, remind, share or skip
+        repeat_start, group_id = repeat_each_start("events")
+        actions.append(repeat_start)
+        actions += event_menu("Repeat Item")
+        actions.append(repeat_each_end(group_id))
 
-    get_desc, desc_uuid = get_dictionary_value_from_variable(
-        "description", "Repeat Item"
-    )
-    actions.append(get_desc)
-    actions.append(
-        set_variable_from_action("event_description", desc_uuid, "Dictionary Value")
-    )
+    # Done
+    actions.append(show_alert("All Done!", "Finished reviewing events."))
+    return actions
 
-    get_url_action, url_uuid = get_dictionary_value_from_variable("url", "Repeat Item")
-    actions.append(get_url_action)
-    actions.append(set_variable_from_action("event_url", url_uuid, "Dictionary Value"))
 
-    # Build summary text for menu prompt
-    summary, summary_uuid = text_with_variable("", "event_title", "")
-    actions.append(summary)
-    actions.append(set_variable_from_action("event_summary", summary_uuid, "Text"))
+def _household_template(review: str) -> BlockTemplate:
+    def household_actions(household: str) -> list:
+        prompt = PROMPT.replace("## CONFIG", f"{household}\n\n## CONFIG", 1)
+        return main_actions(prompt, review)
 
-    # Show menu for this event
-    menu_action, menu_id = menu_start_with_variable_prompt(
-        ["📅 Add to Calendar", "⏰ Remind Me", "💬 Share", "⏭️ Skip"], "event_summary"
-    )
-    actions.append(menu_action)
-
-    # Option 1: Add to Calendar
-    actions.append(menu_item("📅 Add to Calendar", menu_id))
-    actions.append(
-        add_calendar_event_from_variables(
-            title_var="event_title",
-            start_date_var="event_date",
-            location_var="event_location",
-            notes_var="event_description",
-        )
-    )
+    household_actions.__qualname__ = f"household_actions[{review}]"
+    return block(household_actions, optimize=True)
 
-    # Option 2: Set Reminder
-    actions.append(menu_item("⏰ Remind Me", menu_id))
-    actions.append(
-        add_reminder_from_variable(title_var="event_title", notes_var="event_url")
-    )
 
-    # Option 3: Share
-    actions.append(menu_item("💬 Share", menu_id))
-    actions.append(share_variable("event_summary"))
+# main_actions() for a household prompt, per review mode, compiled and
+# optimized once: per-family builds only clone it
+HOUSEHOLD_ACTIONS = {review: _household_template(review) for review in REVIEW_MODES}
 
-    # Option 4: Skip
-    actions.append(menu_item("⏭️ Skip", menu_id))
-    # Nothing to do
 
-    actions.append(menu_end(menu_id))
-    actions.append(repeat_each_end(group_id))
+def review_mode(config: dict) -> str:
+    """The config's preferences.review, or the default"""
+    return config.get("preferences", {}).get("review", REVIEW_MODES[0])
 
-    # Done
-    actions.append(show_alert("All Done!", "Finished reviewing events."))
 
+def main_shortcut(actions: list, optimize: bool) -> dict:
     return create_shortcut(
         "Pencil Me In",
         actions,
         icon_color=431817727,
         icon_glyph=59771,
+        optimize=optimize,
     )
 
 
+@uuid_scope("Pencil Me In")
+def build_main_shortcut(config: dict = None, review: str = None):
+    """
+    Build the main shortcut. With a household config (see
+    schema/config-schema.json) the prompt is personalized for that family;
+    the full config is still loaded from iCloud at run time.
+
+    Args:
+        review: One of REVIEW_MODES; defaults to the config's preference
+    """
+    if review is None:
+        review = review_mode(config or {})
+    if config is not None:
+        template = HOUSEHOLD_ACTIONS.get(review)
+        if template is None:
+            raise ValueError(f"review must be one of {REVIEW_MODES}, not {review!r}")
+        return main_shortcut(template(household_section(config)), optimize=False)
+    return main_shortcut(main_actions(PROMPT, review), optimize=True)
+
+
 if __name__ == "__main__":
-    shortcut = build_main_shortcut()
-    output_path = "/Users/athal/code/pencil-me-in/shortcuts/Pencil-Me-In.shortcut"
-    save_shortcut(shortcut, output_path)
-    print(f"Created: {output_path}")
-    print(f"Actions: {len(shortcut['WFWorkflowActions'])}")
+    from pencil_build import main
+
+    sys.exit(main(["main", *sys.argv[1:]]))
@@ -12,11 +12,9 @@ Linear flow:
 
 import sys
 
-sys.path.insert(0, "/Users/athal/code/pencil-me-in/builder")
-
 from shortcut_builder import (
     create_shortcut,
-    save_shortcut,
+    uuid_scope,
     comment,
     text,
     text_with_variable,
@@ -35,6 +33,7 @@ from shortcut_builder import (
 CONFIG_PATH = "Shortcuts/pencil-me-in-config.json"
 
 
+@uuid_scope("Pencil Me In Setup")
 def build_setup_shortcut():
     actions = []
 
@@ -188,8 +187,6 @@ List each source with name and website."""
 
 
 if __name__ == "__main__":
-    shortcut = build_setup_shortcut()
-    output_path = "/Users/athal/code/pencil-me-in/shortcuts/Pencil-Me-In-Setup.shortcut"
-    save_shortcut(shortcut, output_path)
-    print(f"Created: {output_path}")
-    print(f"Actions: {len(shortcut['WFWorkflowActions'])}")
+    from pencil_build import main
+
+    sys.exit(main(["setup", *sys.argv[1:]]))
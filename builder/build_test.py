@@ -3,17 +3,16 @@
 
 import sys
 
-sys.path.insert(0, "/Users/athal/code/pencil-me-in/builder")
-
 from shortcut_builder import (
     create_shortcut,
-    save_shortcut,
+    uuid_scope,
     ask_apple_ai,
     set_variable,
     show_result_with_variable,
 )
 
 
+@uuid_scope("AI Test")
 def build_test():
     actions = []
 
@@ -29,6 +28,6 @@ def build_test():
 
 
 if __name__ == "__main__":
-    shortcut = build_test()
-    save_shortcut(shortcut, "/Users/athal/code/pencil-me-in/shortcuts/AI-Test.shortcut")
-    print("Created AI-Test.shortcut")
+    from pencil_build import main
+
+    sys.exit(main(["test", *sys.argv[1:]]))
@@ -2,11 +2,10 @@
 """Test shortcut to find the correct ChatGPT output name"""
 
 import sys
-sys.path.insert(0, "/Users/athal/code/pencil-me-in/builder")
 
 from shortcut_builder import (
     create_shortcut,
-    save_shortcut,
+    uuid_scope,
     comment,
     ask_chatgpt,
     set_variable_from_action,
@@ -14,6 +13,7 @@ from shortcut_builder import (
     show_alert,
 )
 
+@uuid_scope("Test ChatGPT Capture")
 def build_test():
     actions = []
     
@@ -36,7 +36,6 @@ def build_test():
     return create_shortcut("Test ChatGPT Capture", actions)
 
 if __name__ == "__main__":
-    shortcut = build_test()
-    output_path = "/Users/athal/code/pencil-me-in/shortcuts/Test-ChatGPT-Capture.shortcut"
-    save_shortcut(shortcut, output_path)
-    print(f"Created: {output_path}")
+    from pencil_build import main
+
+    sys.exit(main(["capture", *sys.argv[1:]]))
@@ -0,0 +1,138 @@
+"""
+LLM response cache: cache-aside for model calls in the generated shortcut
+
+The weekly digest asks ChatGPT to fetch and parse every source, which takes
+most of its runtime, even when nothing changed since the last run. These
+blocks keep the answers in pencil-me-in-cache.json in iCloud Drive:
+
+    {"week": "2025-W01", "entries": {"<sha256 of the key>": "<answer>"}}
+
+A cached call hashes its key text (e.g. the source URL and the week), looks
+the hash up in the entries and only runs the model call on a miss. Misses
+are written back while there are fewer than MAX_ENTRIES entries.
+
+Entries live for the week they were written in: when the file is from
+another week, the shortcut starts from an empty cache and overwrites it.
+
+Usage:
+    actions += load_cache()
+    ...
+    fetch, _ = ask_chatgpt(prompt)
+    actions += cached_call(("", "Repeat Item.url", " ", "cache_week"),
+                           "source_events", [fetch])
+    ...
+    actions += save_cache()
+"""
+
+from shortcut_builder import (
+    Action,
+    count_items,
+    dictionary,
+    end_if,
+    format_date,
+    generate_hash,
+    get_current_date,
+    get_dictionary_from_input,
+    get_dictionary_keys,
+    get_dictionary_value_from_variable,
+    get_file,
+    get_variable,
+    if_equals,
+    if_has_no_value,
+    if_less_than,
+    otherwise,
+    save_file,
+    set_dictionary_value,
+    set_variable,
+    text,
+    token_string,
+    variable_ref,
+)
+
+CACHE_PATH = "Shortcuts/pencil-me-in-cache.json"
+WEEK_FORMAT = "YYYY-'W'ww"  # the week an entry is valid for, e.g. 2025-W01
+MAX_ENTRIES = 64
+
+
+def load_cache(path: str = CACHE_PATH) -> list[Action]:
+    """
+    Set `cache_week` to the current week and `cache_entries` to the cached
+    entries, or to an empty dictionary when the file is missing or from
+    another week
+    """
+    now, _ = get_current_date()
+    week, _ = format_date(WEEK_FORMAT)
+    get, _ = get_file(path, error_if_not_found=False)
+    parse, _ = get_dictionary_from_input()
+    same_week, group_id = if_equals("cache_file.week", token_string("", "cache_week"))
+    entries, _ = get_variable("cache_file.entries")
+    empty, _ = dictionary({})
+    return [
+        now,
+        week,
+        set_variable("cache_week"),
+        get,
+        parse,
+        set_variable("cache_file"),
+        same_week,
+        entries,
+        set_variable("cache_entries"),
+        otherwise(group_id),
+        empty,
+        set_variable("cache_entries"),
+        end_if(group_id),
+    ]
+
+
+def cached_call(
+    key: tuple[str, ...],
+    variable: str,
+    call: list[Action],
+    max_entries: int = MAX_ENTRIES,
+) -> list[Action]:
+    """
+    Set `variable` to the cached answer for `key` (token_string() segments),
+    or run `call` and cache its output. Needs load_cache() first.
+    """
+    key_text, _ = text(token_string(*key))
+    hash_action, _ = generate_hash("SHA256")
+    lookup, _ = get_dictionary_value_from_variable(
+        token_string("", "cache_key"), "cache_entries"
+    )
+    miss, miss_id = if_has_no_value(variable)
+    keys, _ = get_dictionary_keys("cache_entries")
+    size, _ = count_items()
+    room, room_id = if_less_than("cache_size", max_entries)
+    return [
+        key_text,
+        hash_action,
+        set_variable("cache_key"),
+        lookup,
+        set_variable(variable),
+        miss,
+        *call,
+        set_variable(variable),
+        keys,
+        size,
+        set_variable("cache_size"),
+        room,
+        set_dictionary_value(
+            token_string("", "cache_key"),
+            variable_ref(variable),
+            dictionary_var="cache_entries",
+        ),
+        set_variable("cache_entries"),
+        end_if(room_id),
+        end_if(miss_id),
+    ]
+
+
+def save_cache(path: str = CACHE_PATH) -> list[Action]:
+    """Write this week's entries back to the cache file"""
+    cache, _ = dictionary({})
+    return [
+        cache,
+        set_dictionary_value("week", token_string("", "cache_week")),
+        set_dictionary_value("entries", variable_ref("cache_entries")),
+        save_file(path, overwrite=True),
+    ]
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+UUID-insensitive canonical form, Merkle hashes and diffs for shortcuts
+
+Every build may mint fresh UUIDs, so two versions of a shortcut differ in
+almost every action even when nothing meaningful changed. This module looks
+through that:
+
+- canonicalize() renames UUIDs and GroupingIdentifiers by order of
+  appearance, and shortcut_hash() hashes the result, so equal hashes mean
+  equal shortcuts up to UUID renaming
+- action_hashes() hashes each action without its identifiers; references to
+  other actions are hashed by the referenced action's kind and output name
+- subtree hashes combine those over each If, Menu and Repeat block
+  (Merkle style), so equal blocks are recognized in one comparison
+- diff() reports only the actions that changed, in time linear in size
+
+Usage:
+    python builder/canonical.py old.shortcut new.shortcut
+    python builder/canonical.py old.shortcut new.shortcut --json
+    python builder/canonical.py --hash shortcuts/*.shortcut
+"""
+
+import argparse
+import hashlib
+import json
+import plistlib
+import sys
+import uuid
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from typing import NamedTuple
+
+from controlflow import Block, control_flow_tree, identifier, lowered, params
+
+# Parameters that hold identifiers rather than content
+IDENTITY_KEYS = ("UUID", "GroupingIdentifier")
+
+
+class Change(NamedTuple):
+    kind: str  # "added", "removed" or "changed"
+    old: int | None  # action index in the old shortcut
+    new: int | None  # action index in the new shortcut
+    identifier: str
+
+
+def _json_default(value):
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot hash {type(value).__name__}")
+
+
+def _digest(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=_json_default)
+
+
+# =============================================================================
+# Canonical Form
+# =============================================================================
+
+
+def _rename(value, names: dict[str, str]):
+    if isinstance(value, str):
+        return names.get(value, value)
+    if isinstance(value, dict):
+        return {key: _rename(item, names) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rename(item, names) for item in value]
+    return value
+
+
+def canonicalize(shortcut: dict) -> dict:
+    """
+    Copy of a shortcut with UUIDs and GroupingIdentifiers renamed by order of
+    first appearance (00000000-0000-0000-0000-000000000001, ...)
+    """
+    names = {}
+    for action in shortcut.get("WFWorkflowActions", []):
+        p = params(action)
+        for key in IDENTITY_KEYS:
+            if key in p and p[key] not in names:
+                names[p[key]] = str(uuid.UUID(int=len(names) + 1)).upper()
+    return _rename(shortcut, names)
+
+
+def shortcut_hash(shortcut: dict) -> str:
+    """Hash of the canonical form: equal for shortcuts equal up to UUIDs"""
+    return _digest(_dumps(canonicalize(shortcut)))
+
+
+# =============================================================================
+# Merkle Hashes
+# =============================================================================
+
+
+def _local(value, sources: dict[str, str]):
+    """A parameter value with identifiers dropped and references made local"""
+    if isinstance(value, dict):
+        if value.get("Type") == "ActionOutput":
+            return {
+                "Type": "ActionOutput",
+                "OutputName": value.get("OutputName"),
+                "Source": sources.get(value.get("OutputUUID")),
+            }
+        return {
+            key: _local(item, sources)
+            for key, item in value.items()
+            if key not in IDENTITY_KEYS
+        }
+    if isinstance(value, list):
+        return [_local(item, sources) for item in value]
+    return value
+
+
+def action_hashes(actions: list[dict]) -> list[str]:
+    """
+    Per-action content hashes. A reference hashes as the referenced action's
+    identifier and output name, so an action keeps its hash when something
+    upstream changes, and edits are reported where they were made.
+    """
+    sources = {}  # UUID -> identifier of the action that produces it
+    hashes = []
+    for action in lowered(actions):
+        p = params(action)
+        ident = identifier(action)
+        hashes.append(_digest(ident, _dumps(_local(p, sources))))
+        if "UUID" in p:
+            sources[p["UUID"]] = ident
+    return hashes
+
+
+class MerkleTree:
+    """Control flow tree of a shortcut with a hash for every item"""
+
+    def __init__(self, actions: list[dict]):
+        self.actions = actions = lowered(actions)
+        self.hashes = action_hashes(actions)
+        self.root = control_flow_tree(actions)
+        self.subtrees = {}  # Block start index -> subtree hash
+        self.hash = _digest("root", *map(self.key, self.root))
+
+    def key(self, item: int | Block) -> str:
+        """Hash of an action or, for a block, of everything in it"""
+        if not isinstance(item, Block):
+            return self.hashes[item]
+        if item.start not in self.subtrees:
+            parts = [self.hashes[item.start]]
+            for n, branch in enumerate(item.branches):
+                if n:
+                    parts.append(self.hashes[item.middles[n - 1]])
+                parts.append(_digest("branch", *map(self.key, branch)))
+            if item.end is not None:
+                parts.append(self.hashes[item.end])
+            self.subtrees[item.start] = _digest("block", *parts)
+        return self.subtrees[item.start]
+
+    def indices(self, item: int | Block) -> list[int]:
+        """Every action index inside an item, in order"""
+        if not isinstance(item, Block):
+            return [item]
+        result = [item.start]
+        for n, branch in enumerate(item.branches):
+            if n:
+                result.append(item.middles[n - 1])
+            for child in branch:
+                result.extend(self.indices(child))
+        if item.end is not None:
+            result.append(item.end)
+        return result
+
+
+# =============================================================================
+# Diff
+# =============================================================================
+
+
+def diff(old_actions: list[dict], new_actions: list[dict]) -> list[Change]:
+    """
+    Actions that differ between two action lists, ignoring UUIDs. Equal
+    subtrees are matched by hash (also when moved), and blocks of the same
+    kind are compared branch by branch.
+    """
+    old, new = MerkleTree(old_actions), MerkleTree(new_actions)
+    changes = []
+    if old.hash != new.hash:
+        _diff_items(old, old.root, new, new.root, changes)
+    return changes
+
+
+def _diff_items(old: MerkleTree, a: list, new: MerkleTree, b: list, changes: list):
+    # Drop the common prefix and suffix, then items found on both sides
+    lo = 0
+    while lo < min(len(a), len(b)) and old.key(a[lo]) == new.key(b[lo]):
+        lo += 1
+    hi = 0
+    while hi < min(len(a), len(b)) - lo and old.key(a[-1 - hi]) == new.key(b[-1 - hi]):
+        hi += 1
+    a, b = a[lo : len(a) - hi], b[lo : len(b) - hi]
+    in_b = Counter(map(new.key, b))
+    in_a = Counter(map(old.key, a))
+    a_left = [item for item in a if not _take(in_b, old.key(item))]
+    b_left = [item for item in b if not _take(in_a, new.key(item))]
+
+    # Pair what's left by kind: same action identifier, or same kind of block
+    pending = defaultdict(deque)
+    for item in b_left:
+        pending[_pair_key(new, item)].append(item)
+    for item in a_left:
+        queue = pending[_pair_key(old, item)]
+        if not queue:
+            changes.extend(_changes("removed", old, item))
+            continue
+        other = queue.popleft()
+        if not isinstance(item, Block):
+            changes.append(
+                Change("changed", item, other, identifier(old.actions[item]))
+            )
+        elif len(item.branches) == len(other.branches):
+            _diff_block(old, item, new, other, changes)
+        else:
+            changes.extend(_changes("removed", old, item))
+            changes.extend(_changes("added", new, other))
+    for item in b_left:
+        queue = pending[_pair_key(new, item)]
+        if queue and queue[0] == item:
+            queue.popleft()
+            changes.extend(_changes("added", new, item))
+
+
+def _take(counts: Counter, key: str) -> bool:
+    if counts[key]:
+        counts[key] -= 1
+        return True
+    return False
+
+
+def _pair_key(tree: MerkleTree, item: int | Block) -> tuple:
+    index = item.start if isinstance(item, Block) else item
+    return isinstance(item, Block), identifier(tree.actions[index])
+
+
+def _changes(kind: str, tree: MerkleTree, item: int | Block) -> list[Change]:
+    side = [(i, identifier(tree.actions[i])) for i in tree.indices(item)]
+    if kind == "added":
+        return [Change(kind, None, i, ident) for i, ident in side]
+    return [Change(kind, i, None, ident) for i, ident in side]
+
+
+def _diff_block(old: MerkleTree, a: Block, new: MerkleTree, b: Block, changes: list):
+    markers = [(a.start, b.start)] + list(zip(a.middles, b.middles))
+    for n, (i, j) in enumerate(markers):
+        if old.hashes[i] != new.hashes[j]:
+            changes.append(Change("changed", i, j, identifier(old.actions[i])))
+        _diff_items(old, a.branches[n], new, b.branches[n], changes)
+    if (
+        a.end is not None
+        and b.end is not None
+        and old.hashes[a.end] != new.hashes[b.end]
+    ):
+        changes.append(Change("changed", a.end, b.end, identifier(old.actions[a.end])))
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+
+def _load(path: str) -> dict:
+    with open(path, "rb") as f:
+        if f.read(4) == b"AEA1":
+            raise SystemExit(f"{path}: signed shortcut; use the unsigned file")
+        f.seek(0)
+        return plistlib.load(f)
+
+
+def _describe(actions: list[dict], index: int) -> str:
+    p = params(actions[index])
+    for key in ("WFCommentActionText", "WFVariableName", "WFMenuItemTitle"):
+        if key in p:
+            return f" {str(p[key]).splitlines()[0][:50]!r}"
+    name = p.get("CustomOutputName")
+    return f" ({name})" if name else ""
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Diff or hash shortcuts, ignoring UUIDs"
+    )
+    parser.add_argument("paths", nargs="+", help="old.shortcut new.shortcut")
+    parser.add_argument(
+        "--hash", action="store_true", help="Print the canonical hash of each file"
+    )
+    parser.add_argument("--json", action="store_true", help="Print changes as JSON")
+    args = parser.parse_args(argv)
+
+    if args.hash:
+        for path in args.paths:
+            print(f"{shortcut_hash(_load(path))}  {path}")
+        return 0
+    if len(args.paths) != 2:
+        parser.error("diff takes exactly two shortcuts")
+
+    old = _load(args.paths[0]).get("WFWorkflowActions", [])
+    new = _load(args.paths[1]).get("WFWorkflowActions", [])
+    changes = diff(old, new)
+    if args.json:
+        print(json.dumps([c._asdict() for c in changes], indent=2))
+    else:
+        symbols = {"added": "+", "removed": "-", "changed": "~"}
+        for change in changes:
+            index = change.new if change.new is not None else change.old
+            actions = new if change.new is not None else old
+            short = change.identifier.rsplit(".", 1)[-1]
+            print(
+                f"{symbols[change.kind]} [{index}] {short}{_describe(actions, index)}"
+            )
+        print(f"{len(changes)} actions differ")
+    return 1 if changes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
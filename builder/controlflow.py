@@ -0,0 +1,355 @@
+"""
+Control flow and reference helpers for lowered WFWorkflowActions
+
+Shared by the optimizer and the analysis tools. Everything here works on plain
+plist dicts, so it applies equally to freshly built and loaded shortcuts.
+"""
+
+from typing import Iterator, NamedTuple, Union
+
+CONDITIONAL = "is.workflow.actions.conditional"
+MENU = "is.workflow.actions.choosefrommenu"
+REPEAT_EACH = "is.workflow.actions.repeat.each"
+REPEAT_COUNT = "is.workflow.actions.repeat.count"
+COMMENT = "is.workflow.actions.comment"
+SET_VARIABLE = "is.workflow.actions.setvariable"
+APPEND_VARIABLE = "is.workflow.actions.appendvariable"
+GET_VARIABLE = "is.workflow.actions.getvariable"
+
+CONTROL_FLOW = {CONDITIONAL, MENU, REPEAT_EACH, REPEAT_COUNT}
+LOOPS = {REPEAT_EACH, REPEAT_COUNT}
+
+# WFControlFlowMode values
+START, MIDDLE, END = 0, 1, 2
+
+# Actions that accept their input through an explicit parameter instead of
+# the implicit output of the previous action
+INPUT_PARAMETERS = {
+    SET_VARIABLE: "WFInput",
+    APPEND_VARIABLE: "WFInput",
+    REPEAT_EACH: "WFInput",
+    "is.workflow.actions.getvalueforkey": "WFInput",
+    "is.workflow.actions.detect.dictionary": "WFInput",
+    "is.workflow.actions.detect.text": "WFInput",
+    "is.workflow.actions.documentpicker.save": "WFInput",
+    "is.workflow.actions.share": "WFInput",
+}
+
+# Actions that never read the implicit output of the previous action
+IGNORES_INPUT = {
+    COMMENT,
+    GET_VARIABLE,
+    "is.workflow.actions.gettext",
+    "is.workflow.actions.dictionary",
+    "is.workflow.actions.list",
+    "is.workflow.actions.date",
+    "is.workflow.actions.alert",
+    "is.workflow.actions.notification",
+    "is.workflow.actions.showresult",
+    "is.workflow.actions.documentpicker.open",
+    "is.workflow.actions.getupcomingevents",
+    "is.workflow.actions.filter.calendarevents",
+    "is.workflow.actions.getcurrentlocation",
+    "is.workflow.actions.askllm",
+    "is.workflow.actions.exit",
+    "com.openai.chat.AskIntent",
+}
+
+# Actions without side effects: removable when nothing uses their output
+PURE = {
+    GET_VARIABLE,
+    "is.workflow.actions.gettext",
+    "is.workflow.actions.dictionary",
+    "is.workflow.actions.list",
+    "is.workflow.actions.date",
+    "is.workflow.actions.format.date",
+    "is.workflow.actions.count",
+    "is.workflow.actions.getvalueforkey",
+    "is.workflow.actions.detect.dictionary",
+    "is.workflow.actions.detect.text",
+    "is.workflow.actions.hash",
+}
+
+# Built-in variables whose value changes on every loop iteration
+LOOP_VARIABLES = {"Repeat Item", "Repeat Index"}
+
+# Output names Shortcuts shows for magic variables of common actions
+OUTPUT_NAMES = {
+    "is.workflow.actions.gettext": "Text",
+    "is.workflow.actions.dictionary": "Dictionary",
+    "is.workflow.actions.list": "List",
+    "is.workflow.actions.date": "Date",
+    "is.workflow.actions.format.date": "Formatted Date",
+    "is.workflow.actions.count": "Count",
+    "is.workflow.actions.getvalueforkey": "Dictionary Value",
+    "is.workflow.actions.detect.dictionary": "Dictionary",
+    "is.workflow.actions.detect.text": "Text",
+    "is.workflow.actions.hash": "Hash",
+    "is.workflow.actions.documentpicker.open": "File",
+    "is.workflow.actions.downloadurl": "Contents of URL",
+    "is.workflow.actions.filter.calendarevents": "Calendar Events",
+    "is.workflow.actions.choosefromlist": "Chosen Item",
+    "is.workflow.actions.getcurrentlocation": "Current Location",
+    "is.workflow.actions.getaddressfromlocation": "Street Address",
+}
+
+
+def lowered(actions: list) -> list[dict]:
+    """
+    Actions as plist dicts, lowering builder IR nodes (see shortcut_builder)
+    once rather than on every key a pass reads. Plain dicts are kept as is.
+    """
+    result = []
+    for action in actions:
+        lower = getattr(action, "to_plist", None)
+        result.append(lower() if lower else action)
+    return result
+
+
+def identifier(action: dict) -> str:
+    return action.get("WFWorkflowActionIdentifier", "")
+
+
+def params(action: dict) -> dict:
+    return action.get("WFWorkflowActionParameters", {})
+
+
+def control_mode(action: dict) -> int | None:
+    """WFControlFlowMode of a control flow action, else None"""
+    if identifier(action) not in CONTROL_FLOW:
+        return None
+    return params(action).get("WFControlFlowMode")
+
+
+def scope_paths(actions: list[dict]) -> list[tuple]:
+    """
+    Return, per action, the path of enclosing blocks as ((group_id, branch), ...).
+    Start/middle/end markers belong to the enclosing scope, not their own body.
+    """
+    paths = []
+    stack = []
+    for action in actions:
+        mode = control_mode(action)
+        group_id = params(action).get("GroupingIdentifier")
+        if mode == START:
+            paths.append(tuple(stack))
+            stack.append((group_id, 0))
+        elif mode == MIDDLE and stack and stack[-1][0] == group_id:
+            stack[-1] = (group_id, stack[-1][1] + 1)
+            paths.append(tuple(stack[:-1]))
+        elif mode == END and stack and stack[-1][0] == group_id:
+            stack.pop()
+            paths.append(tuple(stack))
+        else:
+            paths.append(tuple(stack))
+    return paths
+
+
+def within(path: tuple, scope: tuple) -> bool:
+    """True if `path` is `scope` or nested inside it"""
+    return path[: len(scope)] == scope
+
+
+def block_end(actions: list[dict], index: int) -> int | None:
+    """Index of the end marker of the block that actions[index] starts or splits"""
+    group_id = params(actions[index]).get("GroupingIdentifier")
+    for j in range(index + 1, len(actions)):
+        p = params(actions[j])
+        if p.get("GroupingIdentifier") == group_id and control_mode(actions[j]) == END:
+            return j
+    return None
+
+
+def loops(actions: list[dict]) -> list[tuple[int, int]]:
+    """(start, end) index pairs of every repeat block, outer loops first"""
+    pairs = []
+    for i, action in enumerate(actions):
+        if identifier(action) in LOOPS and control_mode(action) == START:
+            end = block_end(actions, i)
+            if end is not None:
+                pairs.append((i, end))
+    return pairs
+
+
+def loop_writes(actions: list[dict]) -> dict[int, set[str]]:
+    """Variables that change inside each loop, keyed by the loop's start index"""
+    writes = {}
+    for start, end in loops(actions):
+        names = set(LOOP_VARIABLES)
+        names.update(filter(None, map(variable_write, actions[start + 1 : end])))
+        writes[start] = names
+    return writes
+
+
+class Block(NamedTuple):
+    """A control flow block: start marker, branches of nested items, end marker"""
+
+    start: int
+    end: int | None  # None if the block is never closed
+    branches: list[list[Union[int, "Block"]]]  # action indices and nested blocks
+    middles: list[int]  # Otherwise/menu item markers, one per branch after the first
+
+
+def control_flow_tree(actions: list[dict]) -> list[int | Block]:
+    """
+    Nest actions by GroupingIdentifier. Returns the top-level items: plain
+    action indices and Blocks. Middle markers (Otherwise, menu items) start a
+    new branch; unmatched markers are kept as plain actions.
+    """
+    root = []
+    stack = []  # (group_id, start index, branches, middles)
+    for i, action in enumerate(actions):
+        mode = control_mode(action)
+        group_id = params(action).get("GroupingIdentifier")
+        if mode == START:
+            stack.append((group_id, i, [[]], []))
+        elif mode == MIDDLE and stack and stack[-1][0] == group_id:
+            stack[-1][2].append([])
+            stack[-1][3].append(i)
+        elif mode == END and stack and stack[-1][0] == group_id:
+            _, start, branches, middles = stack.pop()
+            parent = stack[-1][2][-1] if stack else root
+            parent.append(Block(start, i, branches, middles))
+        else:
+            (stack[-1][2][-1] if stack else root).append(i)
+    while stack:
+        _, start, branches, middles = stack.pop()
+        parent = stack[-1][2][-1] if stack else root
+        parent.append(Block(start, None, branches, middles))
+    return root
+
+
+# =============================================================================
+# References
+# =============================================================================
+
+
+def iter_refs(value) -> Iterator[dict]:
+    """
+    Yield every variable/action-output reference dict inside a parameter value:
+    {"Type": "Variable", "VariableName": ...} or {"Type": "ActionOutput", ...}
+    """
+    if isinstance(value, dict):
+        kind = value.get("Type")
+        if (kind == "Variable" and "VariableName" in value) or kind == "ActionOutput":
+            yield value
+            return
+        for item in value.values():
+            yield from iter_refs(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_refs(item)
+
+
+def variable_reads(action: dict) -> Iterator[str]:
+    for ref in iter_refs(params(action)):
+        if ref["Type"] == "Variable":
+            yield ref["VariableName"]
+
+
+def variable_write(action: dict) -> str | None:
+    """Name of the variable an action writes, if any"""
+    if identifier(action) in (SET_VARIABLE, APPEND_VARIABLE):
+        return params(action).get("WFVariableName")
+    return None
+
+
+def referenced_outputs(actions: list[dict]) -> set[str]:
+    """UUIDs referenced through ActionOutput anywhere"""
+    return {
+        ref["OutputUUID"]
+        for action in actions
+        for ref in iter_refs(params(action))
+        if ref["Type"] == "ActionOutput"
+    }
+
+
+def output_ref(output_uuid: str, output_name: str) -> dict:
+    return {
+        "Type": "ActionOutput",
+        "OutputUUID": output_uuid,
+        "OutputName": output_name,
+    }
+
+
+def attachment(ref: dict) -> dict:
+    """Wrap a reference as a WFTextTokenAttachment parameter value"""
+    return {"Value": dict(ref), "WFSerializationType": "WFTextTokenAttachment"}
+
+
+def uses_implicit_input(action: dict) -> bool:
+    """True if the action may read the previous action's output"""
+    ident = identifier(action)
+    if ident in IGNORES_INPUT:
+        return False
+    if ident == CONDITIONAL and control_mode(action) == START:
+        return "WFInput" not in params(action)
+    key = INPUT_PARAMETERS.get(ident)
+    return key is None or key not in params(action)
+
+
+def implicit_consumer(actions: list[dict], index: int) -> int | None:
+    """
+    Index of the action that receives actions[index]'s output implicitly
+    (comments pass their input through), or None if nothing does.
+    len(actions) means the output becomes the shortcut's own output.
+    """
+    for j in range(index + 1, len(actions)):
+        if identifier(actions[j]) == COMMENT:
+            continue
+        return j if uses_implicit_input(actions[j]) else None
+    return len(actions)
+
+
+def implicit_source(actions: list[dict], index: int) -> int | None:
+    """Index of the action whose output actions[index] receives implicitly"""
+    for j in range(index - 1, -1, -1):
+        if identifier(actions[j]) != COMMENT:
+            return j
+    return None
+
+
+def passes_input_through(actions: list[dict], index: int) -> bool:
+    """
+    True if a Set Variable outputs exactly what it received implicitly: it has
+    no explicit input, or that input is the previous action's own output.
+    """
+    value = params(actions[index]).get("WFInput")
+    if value is None:
+        return True
+    ref = value.get("Value") if isinstance(value, dict) else None
+    source = implicit_source(actions, index)
+    return (
+        isinstance(ref, dict)
+        and ref.get("Type") == "ActionOutput"
+        and source is not None
+        and ref.get("OutputUUID") == params(actions[source]).get("UUID")
+    )
+
+
+def output_name(action: dict) -> str | None:
+    """Magic variable name of an action's output, if known"""
+    p = params(action)
+    return p.get("CustomOutputName") or OUTPUT_NAMES.get(identifier(action))
+
+
+def output_consumer(actions: list[dict], index: int) -> int | None:
+    """
+    Like implicit_consumer, but the last action of a branch or loop body feeds
+    whatever consumes the whole block, so follow the output out of the block.
+    """
+    j = implicit_consumer(actions, index)
+    while (
+        j is not None
+        and j < len(actions)
+        and control_mode(actions[j])
+        in (
+            MIDDLE,
+            END,
+        )
+    ):
+        end = block_end(actions, j) if control_mode(actions[j]) == MIDDLE else j
+        if end is None:
+            return j
+        j = implicit_consumer(actions, end)
+    return j
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Static runtime cost estimator for shortcuts
+
+Walks WFWorkflowActions as a control flow tree and applies a per-action cost
+model. Loops multiply their body by an expected iteration count, looked up by
+the name of what they repeat over (a variable or a renamed magic variable,
+e.g. "sources" or "events"). Branches of an If or Menu take the most
+expensive branch, so estimates are worst case.
+
+Top-level comments split a shortcut into phases ("1. Load config", ...),
+which get their own totals and optional budgets.
+
+Usage:
+    python builder/cost.py shortcuts/Pencil-Me-In.shortcut
+    python builder/cost.py shortcuts/*.shortcut --iterations sources=8 events=30
+    python builder/cost.py Pencil-Me-In.shortcut --model costs.json
+"""
+
+import argparse
+import json
+import plistlib
+import sys
+from collections import Counter
+from typing import NamedTuple
+
+from controlflow import (
+    COMMENT,
+    LOOPS,
+    REPEAT_COUNT,
+    Block,
+    control_flow_tree,
+    identifier,
+    lowered,
+    params,
+)
+
+# Expected seconds per action on a phone. Anything unlisted costs DEFAULT_COST.
+DEFAULT_COSTS = {
+    "com.openai.chat.AskIntent": 20.0,
+    "is.workflow.actions.askllm": 10.0,
+    "is.workflow.actions.downloadurl": 1.5,
+    "is.workflow.actions.getwebpagecontents": 2.0,
+    "is.workflow.actions.getcurrentlocation": 2.0,
+    "is.workflow.actions.getupcomingevents": 0.5,
+    "is.workflow.actions.filter.calendarevents": 0.5,
+    "is.workflow.actions.addnewevent": 0.3,
+    "is.workflow.actions.addnewreminder": 0.3,
+    "is.workflow.actions.documentpicker.open": 0.2,
+    "is.workflow.actions.documentpicker.save": 0.3,
+    "is.workflow.actions.detect.dictionary": 0.01,
+    "is.workflow.actions.getvalueforkey": 0.005,
+    "is.workflow.actions.hash": 0.002,
+    "is.workflow.actions.setvariable": 0.001,
+    "is.workflow.actions.getvariable": 0.001,
+    "is.workflow.actions.gettext": 0.00005,
+    "is.workflow.actions.comment": 0.0,
+    # Waiting on the user isn't runtime
+    "is.workflow.actions.choosefrommenu": 0.0,
+    "is.workflow.actions.choosefromlist": 0.0,
+    "is.workflow.actions.ask": 0.0,
+    "is.workflow.actions.alert": 0.0,
+    "is.workflow.actions.showresult": 0.0,
+    "is.workflow.actions.share": 0.0,
+}
+DEFAULT_COST = 0.01
+
+CATEGORIES = {
+    "com.openai.chat.AskIntent": "llm",
+    "is.workflow.actions.askllm": "llm",
+    "is.workflow.actions.downloadurl": "network",
+    "is.workflow.actions.getwebpagecontents": "network",
+    "is.workflow.actions.getupcomingevents": "calendar",
+    "is.workflow.actions.filter.calendarevents": "calendar",
+    "is.workflow.actions.addnewevent": "calendar",
+    "is.workflow.actions.addnewreminder": "reminders",
+    "is.workflow.actions.documentpicker.open": "file",
+    "is.workflow.actions.documentpicker.save": "file",
+}
+REPORTED_CATEGORIES = ("llm", "network", "calendar")
+
+DEFAULT_ITERATIONS = 10
+
+
+class CostModel(NamedTuple):
+    costs: dict[str, float] = DEFAULT_COSTS
+    default_cost: float = DEFAULT_COST
+    categories: dict[str, str] = CATEGORIES
+    iterations: dict[str, int] = {}  # loop input name -> expected iterations
+    default_iterations: int = DEFAULT_ITERATIONS
+
+    @classmethod
+    def load(cls, path: str) -> "CostModel":
+        """Load overrides from JSON: {"costs": {...}, "iterations": {...}, ...}"""
+        with open(path) as f:
+            data = json.load(f)
+        model = cls()
+        return model._replace(
+            costs={**model.costs, **data.get("costs", {})},
+            default_cost=data.get("default_cost", model.default_cost),
+            categories={**model.categories, **data.get("categories", {})},
+            iterations=data.get("iterations", {}),
+            default_iterations=data.get("default_iterations", DEFAULT_ITERATIONS),
+        )
+
+
+class Budget(NamedTuple):
+    total: float  # seconds for the whole shortcut
+    phases: dict[str, float] = {}  # phase name -> seconds
+    iterations: dict[str, int] = {}  # loop sizes to budget for
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, message: str, phases: list["Phase"], budget: Budget):
+        super().__init__(message)
+        self.phases = phases
+        self.budget = budget
+
+
+class Cost:
+    """Accumulated estimate for a run of actions"""
+
+    __slots__ = ("seconds", "actions", "calls", "looped")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.actions = 0
+        self.calls = Counter()  # category -> calls
+        self.looped = Counter()  # category -> calls made inside loops
+
+    def add(self, other: "Cost", times: int = 1, looped: bool = False):
+        self.seconds += other.seconds * times
+        self.actions += other.actions * times
+        for category, n in other.calls.items():
+            self.calls[category] += n * times
+            if looped:
+                self.looped[category] += n * times
+        if not looped:
+            for category, n in other.looped.items():
+                self.looped[category] += n * times
+
+
+class Phase(NamedTuple):
+    name: str
+    cost: Cost
+
+
+# =============================================================================
+# Estimation
+# =============================================================================
+
+
+def loop_name(action: dict) -> str | None:
+    """
+    Name of what a repeat block iterates over, with the key it reads if any
+    (e.g. "config.calendars_to_check")
+    """
+    value = params(action).get("WFInput")
+    ref = value.get("Value") if isinstance(value, dict) else None
+    if not isinstance(ref, dict):
+        return None
+    name = ref.get("VariableName") or ref.get("OutputName")
+    for aggrandizement in ref.get("Aggrandizements", ()):
+        if "DictionaryKey" in aggrandizement and name:
+            name += "." + aggrandizement["DictionaryKey"]
+    return name
+
+
+def _iterations(action: dict, model: CostModel) -> int:
+    if identifier(action) == REPEAT_COUNT:
+        count = params(action).get("WFRepeatCount")
+        if isinstance(count, (int, float)):
+            return int(count)
+    return model.iterations.get(loop_name(action), model.default_iterations)
+
+
+def _action_cost(action: dict, model: CostModel) -> Cost:
+    ident = identifier(action)
+    cost = Cost()
+    cost.seconds = model.costs.get(ident, model.default_cost)
+    cost.actions = 1
+    category = model.categories.get(ident)
+    if category:
+        cost.calls[category] = 1
+    return cost
+
+
+def _items_cost(items: list, actions: list[dict], model: CostModel) -> Cost:
+    total = Cost()
+    for item in items:
+        if isinstance(item, Block):
+            total.add(_block_cost(item, actions, model))
+        else:
+            total.add(_action_cost(actions[item], model))
+    return total
+
+
+def _block_cost(block: Block, actions: list[dict], model: CostModel) -> Cost:
+    start = actions[block.start]
+    marker = _action_cost(start, model)
+    total = Cost()
+    # start, one marker per extra branch, end
+    total.add(marker, times=len(block.branches) + (block.end is not None))
+    branches = [_items_cost(items, actions, model) for items in block.branches]
+    if identifier(start) in LOOPS:
+        total.add(branches[0], times=_iterations(start, model), looped=True)
+    else:
+        total.add(max(branches, key=lambda c: c.seconds))
+    return total
+
+
+def phases(actions: list[dict], model: CostModel = CostModel()) -> list[Phase]:
+    """Split at top-level comments and estimate each part"""
+    actions = lowered(actions)
+    result = []
+    name, items = "(start)", []
+    for item in control_flow_tree(actions):
+        if not isinstance(item, Block) and identifier(actions[item]) == COMMENT:
+            if items:
+                result.append(Phase(name, _items_cost(items, actions, model)))
+            text = params(actions[item]).get("WFCommentActionText", "")
+            name, items = text.splitlines()[0] if text else "", []
+        else:
+            items.append(item)
+    if items:
+        result.append(Phase(name, _items_cost(items, actions, model)))
+    return result
+
+
+def estimate(actions: list[dict], model: CostModel = CostModel()) -> Cost:
+    total = Cost()
+    for phase in phases(actions, model):
+        total.add(phase.cost)
+    return total
+
+
+def over_budget(phase_list: list[Phase], budget: Budget) -> list[str]:
+    """Messages for every phase (and the total) over its budget"""
+    return seconds_over_budget([(p.name, p.cost.seconds) for p in phase_list], budget)
+
+
+def seconds_over_budget(seconds: list[tuple[str, float]], budget: Budget) -> list[str]:
+    """over_budget() for (phase name, seconds) pairs, e.g. from a manifest"""
+    problems = []
+    for name, phase_seconds in seconds:
+        limit = budget.phases.get(name)
+        if limit is not None and phase_seconds > limit:
+            problems.append(f"{name}: {phase_seconds:.1f}s > {limit:.1f}s budget")
+    total = sum(phase_seconds for _, phase_seconds in seconds)
+    if total > budget.total:
+        problems.append(f"total: {total:.1f}s > {budget.total:.1f}s budget")
+    return problems
+
+
+def check_budget(
+    actions: list[dict], budget: Budget, model: CostModel = CostModel()
+) -> list[Phase]:
+    """
+    Estimate phases at the budget's loop sizes. Returns them, or raises
+    BudgetExceeded if any phase or the total is over budget.
+    """
+    model = model._replace(iterations={**model.iterations, **budget.iterations})
+    phase_list = phases(actions, model)
+    problems = over_budget(phase_list, budget)
+    if problems:
+        raise BudgetExceeded("; ".join(problems), phase_list, budget)
+    return phase_list
+
+
+# =============================================================================
+# Report
+# =============================================================================
+
+
+def format_report(title: str, phase_list: list[Phase], budget: Budget = None) -> str:
+    """Per-phase table with LLM/network/calendar calls and seconds"""
+    header = (
+        f"{'Phase':<40} {'Actions':>8} {'LLM':>5} {'Net':>5} {'Cal':>5} {'Seconds':>9}"
+    )
+    lines = [title, header]
+    total = Cost()
+    for phase in phase_list:
+        total.add(phase.cost)
+        lines.append(
+            _row(phase.name, phase.cost, budget and budget.phases.get(phase.name))
+        )
+    lines.append(_row("Total", total, budget and budget.total))
+    looped = ", ".join(
+        f"{total.looped[c]} of {total.calls[c]} {c}"
+        for c in REPORTED_CATEGORIES
+        if total.looped[c]
+    )
+    lines.append(f"Calls inside loops: {looped or 'none'}")
+    return "\n".join(lines)
+
+
+def _row(name: str, cost: Cost, limit: float = None) -> str:
+    calls = " ".join(f"{cost.calls[c]:>5}" for c in REPORTED_CATEGORIES)
+    row = f"{name[:40]:<40} {cost.actions:>8} {calls} {cost.seconds:>9.2f}"
+    if limit is not None:
+        row += f"  / {limit:.0f}" + (" ✗" if cost.seconds > limit else "")
+    return row
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Estimate shortcut runtime cost")
+    parser.add_argument("shortcuts", nargs="+", help=".shortcut files (unsigned)")
+    parser.add_argument("--model", help="JSON cost model overrides")
+    parser.add_argument(
+        "--iterations",
+        nargs="*",
+        default=[],
+        metavar="NAME=N",
+        help="Expected loop sizes, e.g. sources=8 events=30",
+    )
+    args = parser.parse_args(argv)
+
+    model = CostModel.load(args.model) if args.model else CostModel()
+    iterations = dict(model.iterations)
+    for item in args.iterations:
+        name, _, count = item.partition("=")
+        if not count.isdigit():
+            parser.error(f"bad iteration count: {item}")
+        iterations[name] = int(count)
+    model = model._replace(iterations=iterations)
+
+    for path in args.shortcuts:
+        with open(path, "rb") as f:
+            actions = plistlib.load(f).get("WFWorkflowActions", [])
+        print(format_report(path, phases(actions, model)))
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Dataflow passes over repeat, if and menu blocks
+
+Complements the peephole passes in optimizer.py:
+
+- loop invariants: actions inside a repeat body that read nothing the loop
+  changes are moved in front of the loop, so they run once instead of once
+  per item
+- dead variables: Set/Append Variable for variables nothing reads
+- dead code: pure actions whose output nobody uses, and loops left empty
+- undefined variables: reads of variables nothing writes are reported
+
+Only pure actions are hoisted by default. Model calls (askllm, ChatGPT) can
+answer differently each time, and a hoisted call runs even when the loop
+runs zero times. hoist_models=True opts in to hoisting them too, from loops
+that provably run at least once: a literal count or list.
+"""
+
+from controlflow import (
+    COMMENT,
+    INPUT_PARAMETERS,
+    PURE,
+    REPEAT_COUNT,
+    SET_VARIABLE,
+    attachment,
+    control_mode,
+    identifier,
+    implicit_consumer,
+    iter_refs,
+    loop_writes,
+    loops,
+    output_consumer,
+    output_name,
+    output_ref,
+    params,
+    passes_input_through,
+    referenced_outputs,
+    scope_paths,
+    uses_implicit_input,
+    variable_reads,
+    variable_write,
+)
+
+MODEL_CALLS = {"is.workflow.actions.askllm", "com.openai.chat.AskIntent"}
+
+# Variables Shortcuts provides without a Set Variable ("Repeat Item 2", ...)
+BUILTIN_VARIABLES = ("Repeat Item", "Repeat Index", "Shortcut Input")
+
+
+def undefined_variables(actions: list[dict]) -> list[str]:
+    """Warnings for variables that are read but never written"""
+    written = set(filter(None, map(variable_write, actions)))
+    warnings = []
+    seen = set()
+    for i, action in enumerate(actions):
+        for name in variable_reads(action):
+            if name in written or name in seen or name.startswith(BUILTIN_VARIABLES):
+                continue
+            seen.add(name)
+            warnings.append(f"Action {i}: variable '{name}' is read but never written")
+    return warnings
+
+
+def eliminate_dead_variables(actions: list[dict], keep: set[int]) -> set[int]:
+    """Drop writes to variables that are never read"""
+    read = {name for action in actions for name in variable_reads(action)}
+    removed = set()
+    for i, action in enumerate(actions):
+        name = variable_write(action)
+        if name is None or name in read or i in keep:
+            continue
+        # Set Variable passes its input on; anything else must go unused
+        passes = identifier(action) == SET_VARIABLE and passes_input_through(actions, i)
+        if passes or output_consumer(actions, i) is None:
+            removed.add(i)
+    return removed
+
+
+def eliminate_dead_code(actions: list[dict], keep: set[int]) -> set[int]:
+    """Drop unused pure actions and loops whose body is only comments"""
+    referenced = referenced_outputs(actions)
+    removed = set()
+    for i, action in enumerate(actions):
+        if i in keep or identifier(action) not in PURE:
+            continue
+        if params(action).get("UUID") in referenced:
+            continue
+        if output_consumer(actions, i) is None:
+            removed.add(i)
+
+    for start, end in loops(actions):
+        body = range(start + 1, end)
+        if any(identifier(actions[j]) != COMMENT for j in body if j not in removed):
+            continue
+        block = set(range(start, end + 1))
+        if not block & keep and output_consumer(actions, end) is None:
+            removed |= block
+    return removed
+
+
+def _rewire_consumer(actions: list[dict], index: int) -> bool:
+    """
+    Before actions[index] moves away, give the action that reads its output
+    implicitly an explicit reference instead. False if that isn't possible.
+    """
+    consumer = output_consumer(actions, index)
+    if consumer is None:
+        return True
+    # Past the end of a block the consumer sees the block's output, not ours
+    if consumer != implicit_consumer(actions, index) or consumer == len(actions):
+        return False
+    if control_mode(actions[consumer]) is not None:
+        return False
+    key = INPUT_PARAMETERS.get(identifier(actions[consumer]))
+    action_uuid = params(actions[index]).get("UUID")
+    name = output_name(actions[index])
+    if key is None or not action_uuid or not name:
+        return False
+    params(actions[consumer])[key] = attachment(output_ref(action_uuid, name))
+    return True
+
+
+def _runs_at_least_once(actions: list[dict], start: int) -> bool:
+    """True if the loop at `start` repeats a literal count or list, not empty"""
+    p = params(actions[start])
+    if identifier(actions[start]) == REPEAT_COUNT:
+        count = p.get("WFRepeatCount", 1)
+        return type(count) is int and count > 0
+    ref = p.get("WFInput", {}).get("Value", {})
+    if set(ref) - {"Type", "OutputUUID", "OutputName"}:
+        return False  # coerced or narrowed
+    for action in actions[:start]:
+        if ref.get("OutputUUID") and params(action).get("UUID") == ref["OutputUUID"]:
+            items = params(action).get("WFItems")
+            return identifier(action).endswith(".list") and bool(items)
+    return False
+
+
+def _hoist_from(
+    actions: list[dict], start: int, end: int, keep: set[int], hoist_models: bool
+):
+    """Indices in the loop body that can run once before the loop"""
+    hoistable = PURE
+    if hoist_models and _runs_at_least_once(actions, start):
+        hoistable = PURE | MODEL_CALLS
+    paths = scope_paths(actions)
+    body_path = paths[start + 1] if start + 1 < end else None
+    changing = loop_writes(actions)[start]
+    defined = set()
+    hoisted = []
+    for i in range(start + 1, end):
+        action = actions[i]
+        action_uuid = params(action).get("UUID")
+        invariant = (
+            paths[i] == body_path
+            and i not in keep
+            and identifier(action) in hoistable
+            and not uses_implicit_input(action)
+            and not changing.intersection(variable_reads(action))
+            and not any(
+                ref.get("OutputUUID") in defined for ref in iter_refs(params(action))
+            )
+            and _rewire_consumer(actions, i)
+        )
+        if invariant:
+            hoisted.append(i)
+        elif action_uuid:
+            defined.add(action_uuid)
+    return hoisted
+
+
+def hoist_loop_invariants(
+    actions: list[dict], keep: set[int], hoist_models: bool = False
+) -> tuple[list[dict], int]:
+    """
+    Move loop-invariant actions in front of their loop.
+    Returns (actions, number of actions moved).
+
+    Args:
+        hoist_models: Also move model calls out of loops that run at least once
+    """
+    pinned = {id(actions[i]) for i in keep}
+    moved = set()
+    pending = True
+    while pending:
+        pending = False
+        # Inner loops first, so invariants can bubble out of nested loops
+        for start, end in reversed(loops(actions)):
+            keep_now = {i for i, a in enumerate(actions) if id(a) in pinned}
+            if uses_implicit_input(actions[start]):
+                continue  # inserting before the loop would change its input
+            hoisted = _hoist_from(actions, start, end, keep_now, hoist_models)
+            if not hoisted:
+                continue
+            block = [
+                a for i, a in enumerate(actions[start:end], start) if i not in hoisted
+            ]
+            actions = (
+                actions[:start] + [actions[i] for i in hoisted] + block + actions[end:]
+            )
+            moved.update(id(actions[start + n]) for n in range(len(hoisted)))
+            pending = True
+            break  # indices changed; rescan
+    return actions, len(moved)
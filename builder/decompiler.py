@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Decompiler: load .shortcut plists back into the builder's action model
+
+decompile() lifts every action into an Action IR node (see shortcut_builder),
+turning plain variable and action-output attachments back into VariableRef
+and OutputRef nodes and simple token strings back into TokenStrings. Anything
+the IR has no node for stays a plain plist value, so lowering the result
+gives back the original shortcut.
+
+The result is indexed once by UUID, GroupingIdentifier, variable name and
+action identifier, so queries don't rescan the action list. to_python()
+emits builder code that rebuilds the same shortcut.
+
+Usage:
+    python builder/decompiler.py shortcuts/Pencil-Me-In.shortcut
+    python builder/decompiler.py downloaded.shortcut -o build_downloaded.py
+"""
+
+import argparse
+import keyword
+import plistlib
+import re
+import sys
+
+from controlflow import COMMENT, identifier, params, variable_reads, variable_write
+from shortcut_builder import (
+    PLACEHOLDER,
+    Action,
+    CompiledTemplate,
+    OutputRef,
+    TokenString,
+    VariableRef,
+    compile_segments,
+    create_shortcut,
+    to_plist,
+)
+
+# Keys create_shortcut() sets itself, and their values when left at defaults
+_DEFAULTS = create_shortcut("", [])
+
+
+def load_shortcut(path: str) -> dict:
+    """Read an unsigned .shortcut plist"""
+    with open(path, "rb") as f:
+        if f.read(4) == b"AEA1":
+            raise ValueError(f"{path} is signed (AEA1); decompile the unsigned file")
+        f.seek(0)
+        return plistlib.load(f)
+
+
+# =============================================================================
+# Lifting
+# =============================================================================
+
+
+def _lift_ref(ref: dict):
+    """VariableRef/OutputRef for a plain reference, else None"""
+    if ref.keys() == {"Type", "VariableName"} and ref["Type"] == "Variable":
+        if "." in ref["VariableName"] or ":" in ref["VariableName"]:
+            return None  # VariableRef would read it as a key or property
+        return VariableRef(ref["VariableName"])
+    if ref.keys() == {"Type", "OutputUUID", "OutputName"} and (
+        ref["Type"] == "ActionOutput"
+    ):
+        return OutputRef(ref["OutputUUID"], ref["OutputName"])
+    return None
+
+
+def token_segments(value: dict) -> tuple[str, ...] | None:
+    """
+    Alternating (literal, variable, literal, ...) segments of a token string
+    whose attachments are all plain variables, else None
+    """
+    string = value.get("string")
+    attachments = value.get("attachmentsByRange")
+    if not isinstance(string, str) or not isinstance(attachments, dict):
+        return None
+    ranges = []
+    for key, ref in attachments.items():
+        match = re.fullmatch(r"\{(\d+), 1\}", key)
+        if not match or not isinstance(_lift_ref(ref), VariableRef):
+            return None
+        ranges.append((int(match.group(1)), ref["VariableName"]))
+    units = string.encode("utf-16-le")
+    segments = []
+    pos = 0
+    for offset, name in sorted(ranges):
+        if units[offset * 2 : offset * 2 + 2] != PLACEHOLDER.encode("utf-16-le"):
+            return None
+        segments += [units[pos * 2 : offset * 2].decode("utf-16-le"), name]
+        pos = offset + 1
+    segments.append(units[pos * 2 :].decode("utf-16-le"))
+    return tuple(segments)
+
+
+def _lift_token_string(value: dict) -> TokenString | None:
+    segments = token_segments(value)
+    if segments is None:
+        return None
+    template = compile_segments(segments)
+    # Only when lowering would give back exactly the same string
+    if template.string != value["string"] or dict(template.attachments) != {
+        key: ref["VariableName"] for key, ref in value["attachmentsByRange"].items()
+    }:
+        return None
+    return TokenString(template)
+
+
+def lift(value):
+    """Replace plist values that have an IR node with that node"""
+    if isinstance(value, list):
+        return [lift(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    kind = value.get("WFSerializationType")
+    if value.keys() == {"Value", "WFSerializationType"}:
+        node = None
+        if kind == "WFTextTokenAttachment" and isinstance(value["Value"], dict):
+            node = _lift_ref(value["Value"])
+        elif kind == "WFTextTokenString" and isinstance(value["Value"], dict):
+            node = _lift_token_string(value["Value"])
+        if node is not None:
+            return node
+    return {key: lift(item) for key, item in value.items()}
+
+
+def lift_action(action: dict) -> Action:
+    return Action(identifier(action), lift(params(action)))
+
+
+# =============================================================================
+# Decompiled Shortcut
+# =============================================================================
+
+
+class Decompiled:
+    """A shortcut as Action IR nodes, with indexes built in one pass"""
+
+    def __init__(self, shortcut: dict):
+        raw = shortcut.get("WFWorkflowActions", [])
+        self.metadata = {k: v for k, v in shortcut.items() if k != "WFWorkflowActions"}
+        self.actions = [lift_action(action) for action in raw]
+
+        self.by_uuid = {}  # UUID -> action index
+        self.by_group = {}  # GroupingIdentifier -> [start, middles..., end]
+        self.by_identifier = {}  # action identifier -> [indices]
+        self.reads = {}  # variable name -> [indices of actions that read it]
+        self.writes = {}  # variable name -> [indices of actions that set it]
+        for i, action in enumerate(raw):
+            p = params(action)
+            if "UUID" in p:
+                self.by_uuid.setdefault(p["UUID"], i)
+            if "GroupingIdentifier" in p:
+                self.by_group.setdefault(p["GroupingIdentifier"], []).append(i)
+            self.by_identifier.setdefault(identifier(action), []).append(i)
+            for name in set(variable_reads(action)):
+                self.reads.setdefault(name, []).append(i)
+            name = variable_write(action)
+            if name is not None:
+                self.writes.setdefault(name, []).append(i)
+
+    def output(self, output_uuid: str) -> Action | None:
+        """The action that produces an output UUID"""
+        index = self.by_uuid.get(output_uuid)
+        return None if index is None else self.actions[index]
+
+    def group(self, group_id: str) -> list[int]:
+        return self.by_group.get(group_id, [])
+
+    def find(self, action_identifier: str) -> list[int]:
+        return self.by_identifier.get(action_identifier, [])
+
+    def readers(self, name: str) -> list[int]:
+        return self.reads.get(name, [])
+
+    def writers(self, name: str) -> list[int]:
+        return self.writes.get(name, [])
+
+    def to_plist(self) -> dict:
+        """Lower back to a shortcut dict"""
+        shortcut = dict(self.metadata)
+        shortcut["WFWorkflowActions"] = to_plist(self.actions)
+        return shortcut
+
+    def to_python(self, function: str = "build_shortcut", name: str = "") -> str:
+        """Builder code for a function that returns this shortcut"""
+        return _python(self, function, name)
+
+
+def decompile(shortcut: dict | str) -> Decompiled:
+    """Decompile a shortcut dict or a path to an unsigned .shortcut file"""
+    if isinstance(shortcut, str):
+        shortcut = load_shortcut(shortcut)
+    return Decompiled(shortcut)
+
+
+# =============================================================================
+# Code Generation
+# =============================================================================
+
+
+def _expr(value) -> str:
+    """Python expression that builds a lifted parameter value"""
+    if isinstance(value, VariableRef):
+        return f"variable_ref({value.name!r})"
+    if isinstance(value, OutputRef):
+        return f"action_output_ref({value.uuid!r}, {value.output_name!r})"
+    if isinstance(value, TokenString):
+        args = ", ".join(map(repr, _segments(value.template)))
+        return f"token_string({args})"
+    if isinstance(value, dict):
+        items = ", ".join(f"{k!r}: {_expr(v)}" for k, v in value.items())
+        return f"{{{items}}}"
+    if isinstance(value, list):
+        return f"[{', '.join(map(_expr, value))}]"
+    return repr(value)
+
+
+def _segments(template: CompiledTemplate) -> tuple[str, ...]:
+    return token_segments(template.token_string()["Value"])
+
+
+def _action_expr(action: Action) -> str:
+    if action.identifier == COMMENT and action.params.keys() == {"WFCommentActionText"}:
+        return f"comment({action.params['WFCommentActionText']!r})"
+    lines = [f"Action(\n            {action.identifier!r},\n            {{"]
+    for key, value in action.params.items():
+        lines.append(f"                {key!r}: {_expr(value)},")
+    lines.append("            },\n        )")
+    return "\n".join(lines)
+
+
+def _python(decompiled: Decompiled, function: str, name: str) -> str:
+    if not function.isidentifier() or keyword.iskeyword(function):
+        raise ValueError(f"not a function name: {function!r}")
+    meta = decompiled.metadata
+    icon = meta.get("WFWorkflowIcon", {})
+    args = [
+        repr(name),
+        "actions",
+        f"icon_color={icon.get('WFWorkflowIconStartColor')!r}",
+        f"icon_glyph={icon.get('WFWorkflowIconGlyphNumber')!r}",
+    ]
+    if meta.get("WFWorkflowImportQuestions"):
+        args.append(f"import_questions={meta['WFWorkflowImportQuestions']!r}")
+    handled = {"WFWorkflowIcon", "WFWorkflowImportQuestions"}
+    overrides = {
+        key: value
+        for key, value in meta.items()
+        if key not in handled and _DEFAULTS.get(key, object()) != value
+    }
+    missing = [
+        key for key in _DEFAULTS if key not in meta and key != "WFWorkflowActions"
+    ]
+
+    out = [
+        '"""Generated by decompiler.py"""',
+        "",
+        "from shortcut_builder import (",
+        "    Action,",
+        "    action_output_ref,",
+        "    comment,",
+        "    create_shortcut,",
+        "    token_string,",
+        "    variable_ref,",
+        ")",
+        "",
+        "",
+        f"def {function}():",
+        "    actions = [",
+    ]
+    out += [f"        {_action_expr(action)}," for action in decompiled.actions]
+    out += ["    ]", f"    shortcut = create_shortcut({', '.join(args)})"]
+    if overrides:
+        out.append(f"    shortcut.update({overrides!r})")
+    for key in missing:
+        out.append(f"    del shortcut[{key!r}]")
+    out += ["    return shortcut", ""]
+    return "\n".join(out)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Decompile a shortcut to builder code")
+    parser.add_argument("shortcut", help="Unsigned .shortcut file")
+    parser.add_argument("-o", "--output", help="Write Python here (default: stdout)")
+    parser.add_argument("--function", default="build_shortcut")
+    args = parser.parse_args(argv)
+
+    name = args.shortcut.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    code = decompile(args.shortcut).to_python(args.function, name)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(code)
+    else:
+        sys.stdout.write(code)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,864 @@
+"""
+Offline interpreter for shortcuts
+
+Runs lowered WFWorkflowActions on any machine, so the generated shortcuts can
+be exercised end to end in tests without a Mac or an iPhone. Each supported
+action is a small function in a registry keyed by its identifier; control
+flow (If, Menu, Repeat) is walked as a tree.
+
+Anything that touches the outside world (menus, model calls, the calendar,
+files, the network) goes through a Stubs object. The defaults are
+deterministic and record what the shortcut did; pass canned responses or
+subclass Stubs to script a run:
+
+    stubs = Stubs(files={"config.json": "{}"}, llm="[]", menu=["⏭️ Skip"])
+    result = Interpreter(stubs).run(build_main_shortcut())
+    stubs.events  # events the shortcut added
+"""
+
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Any, Callable, NamedTuple
+
+from controlflow import (
+    CONDITIONAL,
+    LOOPS,
+    MENU,
+    REPEAT_COUNT,
+    Block,
+    control_flow_tree,
+    identifier,
+    lowered,
+    params,
+)
+from shortcut_builder import DATE_UNITS, FILTER_OPERATORS, PLACEHOLDER
+
+# Registry: action identifier -> fn(interpreter, params, input) -> output
+ACTIONS: dict[str, Callable[["Interpreter", dict, Any], Any]] = {}
+
+
+def action(*identifiers: str):
+    """Register an action implementation under one or more identifiers"""
+
+    def register(fn):
+        for ident in identifiers:
+            ACTIONS[ident] = fn
+        return fn
+
+    return register
+
+
+class UnsupportedAction(Exception):
+    pass
+
+
+class ShortcutError(Exception):
+    """An error the shortcut itself would show, e.g. a missing file"""
+
+
+class _Exit(Exception):
+    pass
+
+
+class Result(NamedTuple):
+    output: Any  # the last action's output
+    variables: dict[str, Any]
+    steps: int  # actions executed
+
+
+# =============================================================================
+# Stubs
+# =============================================================================
+
+
+def _respond(source, *args):
+    """A canned response: callable(*args), next item of a list, or a constant"""
+    if callable(source):
+        return source(*args)
+    if isinstance(source, list):
+        if not source:
+            raise ShortcutError(f"No canned response left for {args!r}")
+        return source.pop(0)
+    return source
+
+
+class Stubs:
+    """
+    Stand-ins for everything outside the shortcut. Responses may be a constant,
+    a list (used in order) or a callable taking the same arguments as the
+    method. Everything the shortcut does is recorded on the instance.
+    """
+
+    def __init__(
+        self,
+        files: dict[str, str] = None,
+        llm=None,
+        chatgpt=None,
+        menu=None,
+        answers=None,
+        calendar: list = None,
+        urls=None,
+        location: str = "1 Infinite Loop, Cupertino, CA",
+        now: datetime = None,
+    ):
+        self.files = dict(files or {})  # path -> contents, also receives saves
+        self.llm = llm if llm is not None else ""
+        self.chatgpt = chatgpt if chatgpt is not None else self.llm
+        self.menu = menu  # None chooses the first item
+        self.answers = answers
+        self.calendar = list(calendar or [])  # event dicts, see EVENT_PROPERTIES
+        self.urls = urls if urls is not None else {}
+        self.location = location
+        self.now = now or datetime(2025, 1, 1, 9, 0)
+
+        self.prompts = []  # model prompts, in order
+        self.menus = []  # (prompt, chosen item)
+        self.events = []  # dicts of the calendar fields that were set
+        self.reminders = []
+        self.alerts = []  # (title, message)
+        self.results = []  # Show Result texts
+        self.notifications = []  # (title, body)
+        self.shared = []
+        self.saved = []  # paths written
+
+    def ask_llm(self, prompt: str, model: str) -> str:
+        self.prompts.append(prompt)
+        return _respond(self.llm, prompt)
+
+    def ask_chatgpt(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return _respond(self.chatgpt, prompt)
+
+    def choose_menu(self, prompt: str, items: list[str]) -> str:
+        choice = items[0] if self.menu is None else _respond(self.menu, prompt, items)
+        self.menus.append((prompt, choice))
+        return choice
+
+    def choose_from_list(self, items: list, prompt: str, multiple: bool):
+        if self.answers is None:
+            return list(items) if multiple else (items[0] if items else None)
+        return _respond(self.answers, prompt, items)
+
+    def ask(self, prompt: str, default: str):
+        if self.answers is None:
+            return default or ""
+        return _respond(self.answers, prompt, default)
+
+    def read_file(self, path: str) -> str | None:
+        return self.files.get(path)
+
+    def save_file(self, path: str, contents: str):
+        self.files[path] = contents
+        self.saved.append(path)
+
+    def upcoming_events(self, count: int, calendar: str | None) -> list:
+        return self.calendar[:count]
+
+    def calendar_events(self) -> list:
+        """Every event Find Calendar Events searches"""
+        return list(self.calendar)
+
+    def add_event(self, fields: dict):
+        self.events.append(fields)
+
+    def add_reminder(self, fields: dict):
+        self.reminders.append(fields)
+
+    def download(self, url: str) -> str:
+        if isinstance(self.urls, dict):
+            if url not in self.urls:
+                raise ShortcutError(f"No stubbed response for {url}")
+            return self.urls[url]
+        return _respond(self.urls, url)
+
+    def alert(self, title: str, message: str, cancel: bool) -> bool:
+        """Return False to press Cancel, which stops the shortcut"""
+        self.alerts.append((title, message))
+        return True
+
+    def show_result(self, text: str):
+        self.results.append(text)
+
+    def notify(self, title: str, body: str):
+        self.notifications.append((title, body))
+
+    def share(self, value):
+        self.shared.append(value)
+
+    def current_location(self) -> str:
+        return self.location
+
+    def street_address(self, location) -> str:
+        return str(location)
+
+    def run_shortcut(self, name: str, value):
+        raise UnsupportedAction(f"Run Shortcut '{name}' needs a stub")
+
+
+# =============================================================================
+# Values
+# =============================================================================
+
+
+def as_text(value) -> str:
+    """Coerce a value to text the way Shortcuts would when embedding it"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.strftime("%b %-d, %Y at %-I:%M %p")
+    return str(value)
+
+
+def has_value(value) -> bool:
+    return value is not None and value != "" and value != [] and value != {}
+
+
+def as_number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        text = as_text(value)
+        return float(text) if "." in text else int(text)
+    except ValueError:
+        return None
+
+
+def as_dictionary(value):
+    """Coerce a value to a dictionary (or list) the way Get Dictionary does"""
+    if isinstance(value, (dict, list)) or value is None:
+        return value
+    try:
+        return json.loads(as_text(value))
+    except json.JSONDecodeError:
+        return None
+
+
+def as_date(value) -> datetime | None:
+    if isinstance(value, datetime) or value is None:
+        return value
+    try:
+        return datetime.fromisoformat(as_text(value))
+    except ValueError:
+        return None
+
+
+# Content item properties of calendar events, as fields of the event dicts
+# Stubs.calendar holds (the same fields addnewevent records)
+EVENT_PROPERTIES = {
+    "Title": "title",
+    "Start Date": "start",
+    "End Date": "end",
+    "Is All Day": "all_day",
+    "Location": "location",
+    "Notes": "notes",
+    "Calendar": "calendar",
+}
+
+_DATE_PATTERN = re.compile(r"'([^']*)'|YYYY|yyyy|MM|dd|ww|HH|mm")
+
+
+def format_date(date: datetime, date_format: str) -> str:
+    """
+    Format a date with a custom Format Date pattern. Supports quoted text and
+    YYYY/ww (ISO week-year and week), yyyy, MM, dd, HH, mm.
+    """
+    week_year, week, _ = date.isocalendar()
+    fields = {
+        "YYYY": f"{week_year:04d}",
+        "yyyy": f"{date.year:04d}",
+        "MM": f"{date.month:02d}",
+        "dd": f"{date.day:02d}",
+        "ww": f"{week:02d}",
+        "HH": f"{date.hour:02d}",
+        "mm": f"{date.minute:02d}",
+    }
+    return _DATE_PATTERN.sub(lambda m: fields.get(m.group(0), m.group(1)), date_format)
+
+
+COERCIONS = {
+    "WFDictionaryContentItem": as_dictionary,
+    "WFNumberContentItem": as_number,
+    "WFStringContentItem": as_text,
+}
+
+
+def aggrandize(value, aggrandizement: dict):
+    """Apply one of a reference's aggrandizements to its value"""
+    kind = aggrandizement.get("Type")
+    if kind == "WFCoercionVariableAggrandizement":
+        coerce = COERCIONS.get(aggrandizement.get("CoercionItemClass"))
+        if coerce is None:
+            return value
+        if isinstance(value, list):  # a list is coerced item by item
+            return [coerce(item) for item in value]
+        return coerce(value)
+    if kind == "WFDictionaryValueVariableAggrandizement":
+        key = aggrandizement.get("DictionaryKey", "")
+        if isinstance(value, list):
+            return [_lookup(item, key, "Value") for item in value]
+        return _lookup(value, key, "Value")
+    if kind == "WFPropertyVariableAggrandizement":
+        field = EVENT_PROPERTIES.get(aggrandizement.get("PropertyName"))
+        if field is None:
+            raise UnsupportedAction(f"property {aggrandizement.get('PropertyName')}")
+        if isinstance(value, list):
+            return [_lookup(item, field, "Value") for item in value]
+        return _lookup(value, field, "Value")
+    raise UnsupportedAction(f"aggrandizement {kind}")
+
+
+def _range(key: str) -> tuple[int, int]:
+    offset, length = key.strip("{}").split(",")
+    return int(offset), int(length)
+
+
+# =============================================================================
+# Interpreter
+# =============================================================================
+
+
+class Interpreter:
+    def __init__(self, stubs: Stubs = None, registry: dict = None):
+        self.stubs = stubs or Stubs()
+        self.registry = ACTIONS if registry is None else registry
+
+    def run(self, shortcut: dict | list, input=None) -> Result:
+        """Run a shortcut (or its action list) and return its final state"""
+        if isinstance(shortcut, dict):
+            shortcut = shortcut.get("WFWorkflowActions", [])
+        self.actions = shortcut = lowered(shortcut)
+        self.variables = {"Shortcut Input": input}
+        self.outputs = {}  # action UUID -> output
+        self.steps = 0
+        output = input
+        try:
+            output = self._run_items(control_flow_tree(shortcut), input)
+        except _Exit:
+            output = None
+        return Result(output, self.variables, self.steps)
+
+    def _run_items(self, items: list, value):
+        for item in items:
+            if isinstance(item, Block):
+                value = self._run_block(item, value)
+            else:
+                value = self._run_action(self.actions[item], value)
+        return value
+
+    def _run_action(self, act: dict, value):
+        ident = identifier(act)
+        fn = self.registry.get(ident)
+        if fn is None:
+            raise UnsupportedAction(ident)
+        self.steps += 1
+        p = params(act)
+        output = fn(self, p, value)
+        if "UUID" in p:
+            self.outputs[p["UUID"]] = output
+        return output
+
+    def _run_block(self, block: Block, value):
+        start = self.actions[block.start]
+        ident = identifier(start)
+        self.steps += 1 + len(block.middles) + (block.end is not None)
+        p = params(start)
+        if ident == CONDITIONAL:
+            subject = (
+                self.resolve(p["WFInput"]["Variable"]) if "WFInput" in p else value
+            )
+            branch = 0 if self.condition(p, subject) else 1
+            if branch < len(block.branches):
+                return self._run_items(block.branches[branch], value)
+            return None
+        if ident == MENU:
+            items = p.get("WFMenuItems", [])
+            prompt = as_text(self.resolve(p.get("WFMenuPrompt", "")))
+            choice = self.stubs.choose_menu(prompt, items)
+            titles = [
+                params(self.actions[i]).get("WFMenuItemTitle") for i in block.middles
+            ]
+            if choice not in titles:
+                raise ShortcutError(f"Menu has no item {choice!r}")
+            return self._run_items(block.branches[titles.index(choice) + 1], value)
+        if ident in LOOPS:
+            return self._run_loop(block, p, value)
+        raise UnsupportedAction(ident)
+
+    def _run_loop(self, block: Block, p: dict, value) -> list:
+        if identifier(self.actions[block.start]) == REPEAT_COUNT:
+            items = [None] * int(self.resolve(p.get("WFRepeatCount", 1)))
+        else:
+            items = self.resolve(p["WFInput"]) if "WFInput" in p else value
+            if not isinstance(items, list):
+                items = [] if items is None else [items]
+        saved = {
+            name: self.variables.get(name) for name in ("Repeat Item", "Repeat Index")
+        }
+        results = []
+        for index, item in enumerate(items, 1):
+            self.variables["Repeat Item"] = item
+            self.variables["Repeat Index"] = index
+            results.append(self._run_items(block.branches[0], value))
+        self.variables.update(saved)
+        return results
+
+    # -------------------------------------------------------------------------
+    # Parameter values
+    # -------------------------------------------------------------------------
+
+    def resolve(self, value):
+        """Evaluate a parameter value: token strings, attachments, dictionaries"""
+        if isinstance(value, list):
+            return [self.resolve(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        kind = value.get("WFSerializationType")
+        if kind == "WFTextTokenString":
+            return self._token_string(value["Value"])
+        if kind == "WFTextTokenAttachment":
+            return self.resolve_ref(value["Value"])
+        if kind == "WFDictionaryFieldValue":
+            return self._dictionary(value["Value"])
+        if "Type" in value:
+            return self.resolve_ref(value)
+        return value
+
+    def resolve_ref(self, ref: dict):
+        value = self._resolve_ref(ref)
+        for aggrandizement in ref.get("Aggrandizements", ()):
+            value = aggrandize(value, aggrandizement)
+        return value
+
+    def _resolve_ref(self, ref: dict):
+        kind = ref.get("Type")
+        if kind == "Variable":
+            return self.variables.get(ref.get("VariableName"))
+        if kind == "ActionOutput":
+            return self.outputs.get(ref.get("OutputUUID"))
+        if kind == "ExtensionInput":
+            return self.variables["Shortcut Input"]
+        if kind == "CurrentDate":
+            return self.stubs.now
+        raise UnsupportedAction(f"variable type {kind}")
+
+    def _token_string(self, value):
+        if isinstance(value, str):
+            return value
+        string = value.get("string", "")
+        ranges = sorted(
+            (_range(key), ref)
+            for key, ref in value.get("attachmentsByRange", {}).items()
+        )
+        # A string that is a single variable keeps the variable's type
+        if len(ranges) == 1 and ranges[0][0] == (0, 1) and string == PLACEHOLDER:
+            return self.resolve_ref(ranges[0][1])
+        units = string.encode("utf-16-le")
+        parts = []
+        pos = 0
+        for (offset, length), ref in ranges:
+            parts.append(units[pos * 2 : offset * 2].decode("utf-16-le"))
+            parts.append(as_text(self.resolve_ref(ref)))
+            pos = offset + length
+        parts.append(units[pos * 2 :].decode("utf-16-le"))
+        return "".join(parts)
+
+    def _dictionary(self, value: dict | list) -> dict:
+        # Shortcuts nests the fields under WFDictionaryFieldValueItems;
+        # dictionary() in shortcut_builder writes the list directly
+        if isinstance(value, dict):
+            value = value.get("WFDictionaryFieldValueItems", [])
+        result = {}
+        for field in value:
+            key = as_text(self.resolve(field.get("WFKey")))
+            item = self.resolve(field.get("WFValue"))
+            if field.get("WFItemType") == 1 and isinstance(item, str):
+                item = float(item) if "." in item else int(item)
+            result[key] = item
+        return result
+
+    def condition(self, p: dict, subject) -> bool:
+        code = p.get("WFCondition")
+        if code == 100:
+            return has_value(subject)
+        if code == 101:
+            return not has_value(subject)
+        if code in (0, 2):  # is less than, is greater than
+            number = as_number(self.resolve(p.get("WFNumberValue")))
+            value = as_number(subject)
+            if number is None or value is None:
+                return False
+            return value < number if code == 0 else value > number
+        other = as_text(self.resolve(p.get("WFConditionalActionString", "")))
+        text = as_text(subject)
+        if code == 4:
+            return text == other
+        if code == 5:
+            return text != other
+        if code == 8:
+            return text.startswith(other)
+        if code == 9:
+            return text.endswith(other)
+        if code == 99:
+            return other in text
+        raise UnsupportedAction(f"condition {code}")
+
+
+def run(shortcut: dict | list, stubs: Stubs = None, input=None) -> Result:
+    return Interpreter(stubs).run(shortcut, input)
+
+
+# =============================================================================
+# Actions
+# =============================================================================
+
+
+def _input(interp: Interpreter, p: dict, value, key: str = "WFInput"):
+    """An explicit input parameter if set, else the implicit input"""
+    return interp.resolve(p[key]) if key in p else value
+
+
+def _text(interp: Interpreter, p: dict, key: str, default: str = "") -> str:
+    return as_text(interp.resolve(p.get(key, default)))
+
+
+@action("is.workflow.actions.comment")
+def _comment(interp, p, value):
+    return value
+
+
+@action("is.workflow.actions.gettext")
+def _gettext(interp, p, value):
+    return _text(interp, p, "WFTextActionText")
+
+
+@action("is.workflow.actions.setvariable")
+def _setvariable(interp, p, value):
+    value = _input(interp, p, value)
+    interp.variables[p["WFVariableName"]] = value
+    return value
+
+
+@action("is.workflow.actions.appendvariable")
+def _appendvariable(interp, p, value):
+    value = _input(interp, p, value)
+    current = interp.variables.get(p["WFVariableName"])
+    items = (
+        []
+        if current is None
+        else list(current)
+        if isinstance(current, list)
+        else [current]
+    )
+    items.extend(value if isinstance(value, list) else [value])
+    interp.variables[p["WFVariableName"]] = items
+    return items
+
+
+@action("is.workflow.actions.getvariable")
+def _getvariable(interp, p, value):
+    return interp.resolve(p.get("WFVariable"))
+
+
+@action("is.workflow.actions.dictionary")
+def _dictionary(interp, p, value):
+    return interp.resolve(p.get("WFItems", {})) or {}
+
+
+@action("is.workflow.actions.list")
+def _list(interp, p, value):
+    return [interp.resolve(item) for item in p.get("WFItems", [])]
+
+
+@action("is.workflow.actions.date")
+def _date(interp, p, value):
+    return interp.stubs.now
+
+
+@action("is.workflow.actions.format.date")
+def _format_date(interp, p, value):
+    date = as_date(_input(interp, p, value, "WFDate"))
+    if date is None:
+        return None
+    if p.get("WFDateFormatStyle") != "Custom":
+        return as_text(date)
+    return format_date(date, _text(interp, p, "WFDateFormat"))
+
+
+@action("is.workflow.actions.count")
+def _count(interp, p, value):
+    value = _input(interp, p, value)
+    if value is None:
+        return 0
+    return len(value) if isinstance(value, list) else 1
+
+
+@action("is.workflow.actions.detect.dictionary")
+def _detect_dictionary(interp, p, value):
+    return as_dictionary(_input(interp, p, value))
+
+
+@action("is.workflow.actions.detect.text")
+def _detect_text(interp, p, value):
+    return as_text(_input(interp, p, value))
+
+
+@action("is.workflow.actions.hash")
+def _hash(interp, p, value):
+    algorithm = p.get("WFHashType", "MD5").replace("-", "").lower()
+    return hashlib.new(algorithm, as_text(value).encode()).hexdigest()
+
+
+@action("is.workflow.actions.getvalueforkey")
+def _getvalueforkey(interp, p, value):
+    value = _input(interp, p, value)
+    key = _text(interp, p, "WFDictionaryKey")
+    mode = p.get("WFGetDictionaryValueType", "Value")
+    if isinstance(value, list):
+        return [_lookup(item, key, mode) for item in value]
+    return _lookup(value, key, mode)
+
+
+def _lookup(value, key: str, mode: str):
+    if not isinstance(value, dict):
+        return None
+    if mode == "All Keys":
+        return list(value)
+    if mode == "All Values":
+        return list(value.values())
+    for part in key.split("."):  # Shortcuts accepts key paths
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+@action("is.workflow.actions.setvalueforkey")
+def _setvalueforkey(interp, p, value):
+    value = _input(interp, p, value, "WFDictionary")
+    result = dict(value) if isinstance(value, dict) else {}
+    result[_text(interp, p, "WFDictionaryKey")] = interp.resolve(
+        p.get("WFDictionaryValue")
+    )
+    return result
+
+
+@action("is.workflow.actions.documentpicker.open")
+def _open_file(interp, p, value):
+    path = _text(interp, p, "WFGetFilePath")
+    contents = interp.stubs.read_file(path)
+    if contents is None and p.get("WFFileErrorIfNotFound"):
+        raise ShortcutError(f"File not found: {path}")
+    return contents
+
+
+@action("is.workflow.actions.documentpicker.save")
+def _save_file(interp, p, value):
+    value = _input(interp, p, value)
+    interp.stubs.save_file(_text(interp, p, "WFFileDestinationPath"), as_text(value))
+    return value
+
+
+@action("is.workflow.actions.downloadurl")
+def _downloadurl(interp, p, value):
+    url = _text(interp, p, "WFURL") if "WFURL" in p else as_text(value)
+    return interp.stubs.download(url)
+
+
+@action("is.workflow.actions.askllm")
+def _askllm(interp, p, value):
+    prompt = _text(interp, p, "WFLLMPrompt")
+    return interp.stubs.ask_llm(prompt, p.get("WFLLMModel"))
+
+
+@action("com.openai.chat.AskIntent")
+def _ask_chatgpt(interp, p, value):
+    return interp.stubs.ask_chatgpt(_text(interp, p, "prompt"))
+
+
+@action("is.workflow.actions.getupcomingevents")
+def _getupcomingevents(interp, p, value):
+    count = interp.resolve(p.get("WFGetUpcomingItemCount", 5))
+    calendar = p.get("WFGetUpcomingItemCalendar")
+    return interp.stubs.upcoming_events(int(count), calendar)
+
+
+@action("is.workflow.actions.filter.calendarevents")
+def _filtercalendarevents(interp, p, value):
+    events = interp.stubs.calendar_events()
+    predicate = p.get("WFContentItemFilter", {}).get("Value", {})
+    tests = [
+        _content_test(interp, template)
+        for template in predicate.get("WFActionParameterFilterTemplates", [])
+    ]
+    match = all if predicate.get("WFActionParameterFilterPrefix", 1) else any
+    found = [event for event in events if match(test(event) for test in tests)]
+    sort_by = p.get("WFContentItemSortProperty")
+    if sort_by:
+        field = EVENT_PROPERTIES[sort_by]
+        found.sort(
+            key=lambda event: _sort_key(_lookup(event, field, "Value")),
+            reverse=p.get("WFContentItemSortOrder") in ("Latest First", "Z to A"),
+        )
+    if p.get("WFContentItemLimitEnabled"):
+        found = found[: int(interp.resolve(p.get("WFContentItemLimitNumber", 0)))]
+    return found
+
+
+def _sort_key(value) -> tuple:
+    """Dates in date order before everything else as text"""
+    date = as_date(value)
+    return (0, date, "") if date else (1, datetime.min, as_text(value))
+
+
+_OPERATORS = {code: name for name, code in FILTER_OPERATORS.items()}
+_UNITS = {
+    DATE_UNITS["hours"]: timedelta(hours=1),
+    DATE_UNITS["days"]: timedelta(days=1),
+    DATE_UNITS["weeks"]: timedelta(weeks=1),
+}
+
+
+def _content_test(interp, template: dict) -> Callable[[Any], bool]:
+    """An event predicate for one condition of a Find action's filter"""
+    field = EVENT_PROPERTIES.get(template.get("Property"))
+    operator = _OPERATORS.get(template.get("Operator"))
+    values = {kind: interp.resolve(v) for kind, v in template["Values"].items()}
+    if field is None or operator is None:
+        raise UnsupportedAction(
+            f"filter {template.get('Property')} {template.get('Operator')}"
+        )
+    if operator in ("is in the next", "is in the last"):
+        if values.get("Unit") not in _UNITS:
+            raise UnsupportedAction(f"date unit {values.get('Unit')}")
+        span = _UNITS[values["Unit"]] * as_number(values.get("Number"))
+        now = interp.stubs.now
+        low, high = (now, now + span) if "next" in operator else (now - span, now)
+
+        def test(event):
+            date = as_date(_lookup(event, field, "Value"))
+            return date is not None and low <= date <= high
+
+        return test
+    other = as_text(values.get("Enumeration", values.get("String")))
+
+    def test(event):
+        text = as_text(_lookup(event, field, "Value"))
+        if operator == "is":
+            return text == other
+        if operator == "is not":
+            return text != other
+        return other in text
+
+    return test
+
+
+_EVENT_FIELDS = {
+    "WFCalendarItemTitle": "title",
+    "WFCalendarItemStartDate": "start",
+    "WFCalendarItemEndDate": "end",
+    "WFCalendarItemAllDay": "all_day",
+    "WFCalendarItemLocation": "location",
+    "WFCalendarItemNotes": "notes",
+    "WFCalendarDescriptor": "calendar",
+    "WFAlertCustomTime": "remind_at",
+}
+
+
+def _calendar_fields(interp, p) -> dict:
+    return {
+        field: interp.resolve(p[key])
+        for key, field in _EVENT_FIELDS.items()
+        if key in p
+    }
+
+
+@action("is.workflow.actions.addnewevent")
+def _addnewevent(interp, p, value):
+    fields = _calendar_fields(interp, p)
+    interp.stubs.add_event(fields)
+    return fields
+
+
+@action("is.workflow.actions.addnewreminder")
+def _addnewreminder(interp, p, value):
+    fields = _calendar_fields(interp, p)
+    interp.stubs.add_reminder(fields)
+    return fields
+
+
+@action("is.workflow.actions.ask")
+def _ask(interp, p, value):
+    prompt = _text(interp, p, "WFAskActionPrompt")
+    default = _text(interp, p, "WFAskActionDefaultAnswer")
+    return interp.stubs.ask(prompt, default)
+
+
+@action("is.workflow.actions.choosefromlist")
+def _choosefromlist(interp, p, value):
+    value = _input(interp, p, value)
+    if isinstance(value, dict):  # lists the keys, outputs their values
+        items = list(value)
+    else:
+        items = value if isinstance(value, list) else [] if value is None else [value]
+    prompt = _text(interp, p, "WFChooseFromListActionPrompt")
+    multiple = bool(p.get("WFChooseFromListActionSelectMultiple"))
+    chosen = interp.stubs.choose_from_list(items, prompt, multiple)
+    if isinstance(value, dict) and chosen is not None:
+        if multiple:
+            return [value[key] for key in chosen]
+        return value[chosen]
+    return chosen
+
+
+@action("is.workflow.actions.alert")
+def _alert(interp, p, value):
+    title = _text(interp, p, "WFAlertActionTitle")
+    message = _text(interp, p, "WFAlertActionMessage")
+    if not interp.stubs.alert(title, message, p.get("WFAlertActionCancelButtonShown")):
+        raise _Exit()
+    return value
+
+
+@action("is.workflow.actions.showresult")
+def _showresult(interp, p, value):
+    interp.stubs.show_result(_text(interp, p, "Text"))
+    return value
+
+
+@action("is.workflow.actions.notification")
+def _notification(interp, p, value):
+    title = _text(interp, p, "WFNotificationActionTitle")
+    interp.stubs.notify(title, _text(interp, p, "WFNotificationActionBody"))
+    return value
+
+
+@action("is.workflow.actions.share")
+def _share(interp, p, value):
+    interp.stubs.share(_input(interp, p, value))
+    return value
+
+
+@action("is.workflow.actions.getcurrentlocation")
+def _getcurrentlocation(interp, p, value):
+    return interp.stubs.current_location()
+
+
+@action("is.workflow.actions.getaddressfromlocation")
+def _getaddressfromlocation(interp, p, value):
+    return interp.stubs.street_address(_input(interp, p, value))
+
+
+@action("is.workflow.actions.runworkflow")
+def _runworkflow(interp, p, value):
+    return interp.stubs.run_shortcut(_text(interp, p, "WFWorkflowName"), value)
+
+
+@action("is.workflow.actions.exit")
+def _exit(interp, p, value):
+    raise _Exit()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Build manifests: where a shortcut's time and bytes go
+
+A manifest is a JSON file next to each built .shortcut (Foo.shortcut ->
+Foo.manifest.json) with:
+
+- actions: total, and counts by WFWorkflowActionIdentifier
+- prompts: UTF-8 bytes of each LLM prompt, by action index
+- variables: every variable the shortcut sets
+- plist_bytes: size of the written file
+- phases and counters: collected by shortcut_builder.instrument() while
+  building ("build", "build/optimize", "serialize", templates compiled, ...)
+- estimate: seconds per cost.py phase at the loop sizes of the target's
+  budget, added by pencil_build for targets with one
+
+Manifests are meant to be kept with releases, so growth shows up in diffs.
+
+Usage:
+    python builder/manifest.py shortcuts/Pencil-Me-In.shortcut
+    python builder/manifest.py shortcuts/*.shortcut --write
+"""
+
+import argparse
+import json
+import os
+import plistlib
+import sys
+from collections import Counter
+
+from controlflow import identifier, params, variable_write
+
+MANIFEST_VERSION = 1
+
+# LLM actions and the parameter that holds their prompt
+PROMPT_PARAMETERS = {
+    "is.workflow.actions.askllm": "WFLLMPrompt",
+    "com.openai.chat.AskIntent": "prompt",
+}
+
+
+def manifest_path(shortcut_path: str) -> str:
+    """Foo.shortcut -> Foo.manifest.json"""
+    return f"{os.path.splitext(shortcut_path)[0]}.manifest.json"
+
+
+def prompt_text(value) -> str:
+    """Text of a prompt parameter: a plain string or a token string"""
+    if isinstance(value, dict):
+        value = value.get("Value", value)
+        return value.get("string", "") if isinstance(value, dict) else ""
+    return value if isinstance(value, str) else ""
+
+
+def build_manifest(
+    shortcut: dict,
+    plist_bytes: int = None,
+    stats=None,
+    source: str = None,
+) -> dict:
+    """
+    Manifest for a shortcut (plist dict or builder output)
+
+    Args:
+        plist_bytes: Size of the written file, if known
+        stats: BuildStats collected by instrument() around the build
+        source: The build function, e.g. "build_main.build_main_shortcut"
+    """
+    # Imported here so manifest_path() stays cheap for no-op builds
+    from shortcut_builder import to_plist
+
+    actions = to_plist(list(shortcut.get("WFWorkflowActions", [])))
+    counts = Counter(map(identifier, actions))
+    prompts = []
+    variables = set()
+    for i, action in enumerate(actions):
+        p = params(action)
+        key = PROMPT_PARAMETERS.get(identifier(action))
+        if key is not None and key in p:
+            size = len(prompt_text(p[key]).encode())
+            prompts.append(
+                {"index": i, "identifier": identifier(action), "bytes": size}
+            )
+        name = variable_write(action)
+        if name is not None:
+            variables.add(name)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "source": source,
+        "actions": len(actions),
+        "action_counts": dict(sorted(counts.items())),
+        "prompts": prompts,
+        "prompt_bytes": sum(prompt["bytes"] for prompt in prompts),
+        "variables": sorted(variables),
+        "plist_bytes": plist_bytes,
+        "phases": {},
+        "counters": {},
+    }
+    if stats is not None:
+        manifest["phases"] = {k: round(v, 6) for k, v in stats.phases.items()}
+        manifest["counters"] = dict(sorted(stats.counters.items()))
+    return manifest
+
+
+def write_manifest(shortcut_path: str, manifest: dict) -> str:
+    """Write a manifest next to its shortcut (atomically). Returns its path."""
+    path = manifest_path(shortcut_path)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manifests for built shortcuts")
+    parser.add_argument("paths", nargs="+", help="Unsigned .shortcut files")
+    parser.add_argument(
+        "--write", action="store_true", help="Write next to each file, not stdout"
+    )
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        with open(path, "rb") as f:
+            manifest = build_manifest(plistlib.load(f), os.path.getsize(path))
+        if args.write:
+            print(f"✓ {write_manifest(path, manifest)}")
+        else:
+            print(json.dumps(dict(manifest, path=path), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+Peephole optimizer for WFWorkflowActions
+
+Every action costs time on the phone, and the builders favour readability:
+a Set Variable after each step, a Get Variable before each use. These passes
+remove that overhead without changing what the shortcut does:
+
+- copy propagation: a variable written once from an action's output (and only
+  read afterwards, in the same block) is replaced by direct ActionOutput
+  references, and its Set Variable is dropped; the output is renamed after
+  the variable so the shortcut still reads the same in the editor
+- load forwarding: a Get Variable feeding the next action becomes that
+  action's explicit input; one whose output nobody uses is dropped
+- common subexpressions: a repeated pure action (variable load, dictionary
+  lookup, ...) in the same block reuses the first one's output
+
+The dataflow passes in dataflow.py (dead variables, dead code, loop-invariant
+hoisting) run in the same loop. Passes run on lowered plist actions and repeat until nothing changes.
+"""
+
+import logging
+from collections import defaultdict
+from typing import NamedTuple
+
+from controlflow import (
+    GET_VARIABLE,
+    INPUT_PARAMETERS,
+    PURE,
+    SET_VARIABLE,
+    attachment,
+    control_mode,
+    identifier,
+    implicit_consumer,
+    implicit_source,
+    iter_refs,
+    loop_writes,
+    output_consumer,
+    output_name,
+    output_ref,
+    params,
+    passes_input_through,
+    referenced_outputs,
+    scope_paths,
+    uses_implicit_input,
+    variable_reads,
+    variable_write,
+    within,
+)
+from dataflow import (
+    eliminate_dead_code,
+    eliminate_dead_variables,
+    hoist_loop_invariants,
+    undefined_variables,
+)
+
+log = logging.getLogger(__name__)
+
+MAX_ROUNDS = 10
+
+# Attachment types that read fresh state each time they are evaluated
+VOLATILE_TYPES = {"CurrentDate", "Clipboard", "Ask", "DeviceDetails"}
+
+
+class OptimizationReport(NamedTuple):
+    before: int
+    after: int
+    passes: dict[str, int]  # pass name -> actions removed
+    hoisted: int = 0  # actions moved out of loops
+    warnings: tuple[str, ...] = ()
+
+    @property
+    def removed(self) -> int:
+        return self.before - self.after
+
+    def __str__(self) -> str:
+        counts = dict(self.passes, **{"loop invariants hoisted": self.hoisted})
+        detail = ", ".join(f"{name}: {n}" for name, n in counts.items() if n)
+        return f"Optimizer removed {self.removed} of {self.before} actions" + (
+            f" ({detail})" if detail else ""
+        )
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+
+def _lower(action) -> dict:
+    from shortcut_builder import to_plist
+
+    return to_plist(action)
+
+
+def _retarget(ref: dict, new_ref: dict):
+    """Point a reference dict somewhere else, keeping e.g. Aggrandizements"""
+    ref.pop("VariableName", None)
+    ref.update(new_ref)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _volatile(value) -> bool:
+    if isinstance(value, dict):
+        return value.get("Type") in VOLATILE_TYPES or any(
+            _volatile(v) for v in value.values()
+        )
+    if isinstance(value, list):
+        return any(_volatile(v) for v in value)
+    return False
+
+
+# =============================================================================
+# Passes
+# =============================================================================
+
+
+def _copy_source(actions: list[dict], index: int, by_uuid: dict) -> tuple | None:
+    """(source index, ActionOutput ref) a Set Variable copies from, if known"""
+    value = params(actions[index]).get("WFInput")
+    if value is not None:
+        ref = value.get("Value") if isinstance(value, dict) else None
+        if not isinstance(ref, dict) or ref.get("Type") != "ActionOutput":
+            return None
+        if set(ref) - {"Type", "OutputUUID", "OutputName"}:
+            return None  # coerced or narrowed: not a plain copy
+        source = by_uuid.get(ref["OutputUUID"])
+        return None if source is None else (source, dict(ref))
+
+    source = implicit_source(actions, index)
+    if source is None or control_mode(actions[source]) is not None:
+        return None
+    source_uuid = params(actions[source]).get("UUID")
+    name = output_name(actions[source])
+    if not source_uuid or not name:
+        return None
+    return source, output_ref(source_uuid, name)
+
+
+def propagate_copies(actions: list[dict], keep: set[int]) -> set[int]:
+    """Replace single-assignment variables with the output they copy"""
+    paths = scope_paths(actions)
+    by_uuid = {}
+    writes = defaultdict(list)
+    reads = defaultdict(list)
+    for i, action in enumerate(actions):
+        action_uuid = params(action).get("UUID")
+        if action_uuid:
+            by_uuid[action_uuid] = i
+        name = variable_write(action)
+        if name is not None:
+            writes[name].append(i)
+        for name in set(variable_reads(action)):
+            reads[name].append(i)
+
+    removed = set()
+    renamed = {}  # source UUID -> output name
+    for name, indices in writes.items():
+        if len(indices) != 1:
+            continue
+        index = indices[0]
+        if index in keep or identifier(actions[index]) != SET_VARIABLE:
+            continue
+        copy = _copy_source(actions, index, by_uuid)
+        if copy is None:
+            continue
+        source, ref = copy
+        scope = paths[index]
+        if source >= index or not within(scope, paths[source]):
+            continue
+        if any(r <= index or not within(paths[r], scope) for r in reads[name]):
+            continue
+        used = output_consumer(actions, index) is not None
+        if used and not passes_input_through(actions, index):
+            continue  # the next action reads the Set Variable's output
+        if reads[name]:
+            # Keep the variable's name visible as the magic variable's name
+            source_params = params(actions[source])
+            ref["OutputName"] = source_params.setdefault("CustomOutputName", name)
+            renamed[ref["OutputUUID"]] = ref["OutputName"]
+        for r in reads[name]:
+            for var in iter_refs(params(actions[r])):
+                if var.get("VariableName") == name and var["Type"] == "Variable":
+                    _retarget(var, ref)
+        removed.add(index)
+
+    if renamed:
+        for action in actions:
+            for ref in iter_refs(params(action)):
+                if ref.get("OutputUUID") in renamed:
+                    ref["OutputName"] = renamed[ref["OutputUUID"]]
+    return removed
+
+
+def forward_loads(actions: list[dict], keep: set[int]) -> set[int]:
+    """Feed Get Variable straight into its consumer, or drop it if unused"""
+    referenced = referenced_outputs(actions)
+    removed = set()
+    for i, action in enumerate(actions):
+        if identifier(action) != GET_VARIABLE or i in keep:
+            continue
+        if params(action).get("UUID") in referenced:
+            continue
+        consumer = implicit_consumer(actions, i)
+        if consumer is None:
+            removed.add(i)
+            continue
+        if consumer == len(actions):
+            continue  # the shortcut's result
+        key = INPUT_PARAMETERS.get(identifier(actions[consumer]))
+        variable = params(action).get("WFVariable")
+        if key is None or variable is None:
+            continue
+        params(actions[consumer])[key] = _lower(variable)
+        removed.add(i)
+    return removed
+
+
+def _reuse(actions: list[dict], index: int, first: int) -> bool:
+    """Make consumers of actions[index] use actions[first] instead"""
+    old_uuid = params(actions[index]).get("UUID")
+    new_uuid = params(actions[first]).get("UUID")
+    if not old_uuid or not new_uuid:
+        return False
+
+    consumer = implicit_consumer(actions, index)
+    if consumer == len(actions):
+        return False
+    if consumer is not None:
+        key = INPUT_PARAMETERS.get(identifier(actions[consumer]))
+        if identifier(actions[first]) == GET_VARIABLE:
+            value = params(actions[first]).get("WFVariable")
+        else:
+            name = output_name(actions[first])
+            value = name and attachment(output_ref(new_uuid, name))
+        if key is None or not value:
+            return False
+        params(actions[consumer])[key] = _lower(value)
+
+    for action in actions[index + 1 :]:
+        for ref in iter_refs(params(action)):
+            if ref.get("OutputUUID") == old_uuid:
+                ref["OutputUUID"] = new_uuid
+    return True
+
+
+def eliminate_common_subexpressions(actions: list[dict], keep: set[int]) -> set[int]:
+    """Drop pure actions that repeat an earlier one with the same inputs"""
+    paths = scope_paths(actions)
+    changed_in_loop = loop_writes(actions)
+    available = {}  # frozen action -> (index, variables it reads)
+    removed = set()
+    merged = {}  # removed index -> the index it reuses
+
+    def invalidate(names: set[str]):
+        for key in [k for k, (_, r) in available.items() if r & names]:
+            del available[key]
+
+    for i, action in enumerate(actions):
+        if i in changed_in_loop:
+            invalidate(changed_in_loop[i])
+        name = variable_write(action)
+        if name is not None:
+            invalidate({name})
+        if identifier(action) not in PURE or i in keep:
+            continue
+        p = params(action)
+        if _volatile(p):
+            continue
+        source = None
+        if uses_implicit_input(action):
+            # Hash, Count, ... repeat an earlier one only when they hash,
+            # count, ... the same previous action's output
+            source = implicit_source(actions, i)
+            if source is not None and control_mode(actions[source]) is not None:
+                continue
+            source = merged.get(source, source)
+        key = (
+            identifier(action),
+            _freeze(
+                {k: v for k, v in p.items() if k not in ("UUID", "CustomOutputName")}
+            ),
+            source,
+        )
+        seen = available.get(key)
+        if seen is not None and within(paths[i], paths[seen[0]]):
+            if _reuse(actions, i, seen[0]):
+                removed.add(i)
+                merged[i] = seen[0]
+                continue
+        available[key] = (i, set(variable_reads(action)))
+    return removed
+
+
+PASSES = {
+    "copy propagation": propagate_copies,
+    "dead variables": eliminate_dead_variables,
+    "load forwarding": forward_loads,
+    "common subexpressions": eliminate_common_subexpressions,
+    "dead code": eliminate_dead_code,
+}
+
+
+# =============================================================================
+# Driver
+# =============================================================================
+
+
+def optimize(
+    actions, keep: set[int] = frozenset(), hoist_models: bool = False
+) -> tuple[list[dict], OptimizationReport]:
+    """
+    Optimize actions (IR or plist). Returns (lowered actions, report).
+
+    Args:
+        keep: Indices of actions that must survive (e.g. import question targets)
+        hoist_models: Also hoist model calls out of loops (see dataflow.py)
+    """
+    return _optimize([_lower(action) for action in actions], keep, hoist_models)
+
+
+def _optimize(
+    actions: list[dict], keep, hoist_models: bool = False
+) -> tuple[list[dict], OptimizationReport]:
+    before = len(actions)
+    warnings = tuple(undefined_variables(actions))
+    for warning in warnings:
+        log.warning("%s", warning)
+    pinned = {id(actions[i]) for i in keep}
+    counts = dict.fromkeys(PASSES, 0)
+    hoisted = 0
+
+    def keep_now():
+        return {i for i, a in enumerate(actions) if id(a) in pinned}
+
+    for _ in range(MAX_ROUNDS):
+        changed = False
+        for name, run in PASSES.items():
+            removed = run(actions, keep_now())
+            if removed:
+                actions = [a for i, a in enumerate(actions) if i not in removed]
+                counts[name] += len(removed)
+                changed = True
+        actions, moved = hoist_loop_invariants(actions, keep_now(), hoist_models)
+        hoisted += moved
+        if not changed and not moved:
+            break
+
+    report = OptimizationReport(before, len(actions), counts, hoisted, warnings)
+    log.info("%s", report)
+    return actions, report
+
+
+def optimize_shortcut(shortcut: dict) -> tuple[dict, OptimizationReport]:
+    """Optimize a shortcut's actions, keeping import questions pointed right"""
+    actions = [_lower(action) for action in shortcut["WFWorkflowActions"]]
+    questions = shortcut.get("WFWorkflowImportQuestions", [])
+    targets = [actions[q["ActionIndex"]] for q in questions]
+    optimized, report = _optimize(actions, {q["ActionIndex"] for q in questions})
+
+    index = {id(action): i for i, action in enumerate(optimized)}
+    shortcut = dict(shortcut, WFWorkflowActions=optimized)
+    shortcut["WFWorkflowImportQuestions"] = [
+        dict(q, ActionIndex=index[id(target)]) for q, target in zip(questions, targets)
+    ]
+    return shortcut, report
@@ -0,0 +1,701 @@
+#!/usr/bin/env python3
+"""
+Incremental build driver for all shortcuts
+
+Each target is fingerprinted from its inputs: the build script, every local
+module it imports (shortcut_builder.py, ...), which includes the prompt
+constants, plus any extra input files. Unchanged targets are skipped, and
+outputs for fingerprints seen before are restored from the artifact cache.
+Rebuilds that come out equal up to UUIDs (see canonical.py) leave the output
+untouched. Each output gets a build manifest next to it (see manifest.py).
+Targets with a budget are estimated with cost.py, and fail the build when over.
+
+No-op builds are meant to run on every save: they only fingerprint inputs,
+and import the builder modules lazily, when a target actually needs building.
+Their cold start is kept under COLD_START_BUDGET (see test_pencil_build.py,
+and the pencil_build_cold_start case in bench.py).
+
+Usage (pip install -e . for the pencil-build command, or run this file; it
+builds from and into the checkout, so it isn't installable on its own):
+    pencil-build                                   # build all default targets
+    pencil-build main setup                        # build a subset
+    pencil-build --force                           # ignore the cache
+    pencil-build --watch                           # rebuild on file change
+    pencil-build --configs families.jsonl --out-dir out/
+    pencil-build execute --bake-config config.json # bake a config in (bake.py)
+    python builder/build_main.py                   # same as pencil-build main
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import logging
+import os
+import plistlib
+import sys
+import time
+from typing import NamedTuple
+
+BUILDER_DIR = os.path.dirname(os.path.realpath(__file__))
+ROOT_DIR = os.path.dirname(BUILDER_DIR)
+SHORTCUTS_DIR = os.path.join(ROOT_DIR, "shortcuts")
+CACHE_DIR = os.path.join(ROOT_DIR, ".build-cache")
+
+# Only this module is installed (see pyproject.toml): the builder modules and
+# the outputs stay in the checkout it was installed from with pip install -e
+if not os.path.exists(os.path.join(BUILDER_DIR, "shortcut_builder.py")):
+    sys.exit(
+        f"pencil-build runs from a checkout, but {BUILDER_DIR} has no builder "
+        "modules: install it with pip install -e . from the repo"
+    )
+if BUILDER_DIR not in sys.path:
+    sys.path.insert(0, BUILDER_DIR)
+
+from cost import (  # noqa: E402 (needs BUILDER_DIR on sys.path)
+    Budget,
+    BudgetExceeded,
+    check_budget,
+    format_report,
+    seconds_over_budget,
+)
+from manifest import build_manifest, manifest_path, write_manifest  # noqa: E402
+
+# Bump to invalidate every cached artifact (e.g. when the cache format changes)
+CACHE_VERSION = 1
+CACHE_MAX_ARTIFACTS = 64
+WATCH_INTERVAL = 0.1
+COLD_START_BUDGET = 0.5  # seconds for a whole no-op `pencil-build` process
+
+
+class Target(NamedTuple):
+    name: str
+    module: str
+    function: str
+    output: str
+    inputs: tuple[str, ...] = ()  # extra files, relative to the repo root
+    default: bool = True
+    budget: Budget = None  # estimated runtime limits, see cost.py
+    bakes: bool = False  # the function takes a BakedConfig (--bake-config)
+    bake: str = None  # config file to bake in, also listed in inputs
+
+
+TARGETS = {
+    target.name: target
+    for target in [
+        Target(
+            "main",
+            "build_main",
+            "build_main_shortcut",
+            "Pencil-Me-In.shortcut",
+            budget=Budget(
+                total=60.0,
+                phases={"3. Ask ChatGPT": 30.0, "5. Loop through events": 15.0},
+                iterations={
+                    "config.calendars_to_check": 3,
+                    "found_events": 50,
+                    "events": 20,
+                    "chosen_events": 20,
+                },
+            ),
+        ),
+        Target(
+            "setup",
+            "build_setup",
+            "build_setup_shortcut",
+            "Pencil-Me-In-Setup.shortcut",
+            budget=Budget(
+                total=45.0,
+                phases={"4. AI discovers local event sources": 30.0},
+            ),
+        ),
+        Target("test", "build_test", "build_test", "AI-Test.shortcut"),
+        Target(
+            "capture",
+            "build_test_capture",
+            "build_test",
+            "Test-ChatGPT-Capture.shortcut",
+        ),
+        # Legacy weekly digest. Writes the same file as "main", so only on request.
+        Target(
+            "execute",
+            "build_execute",
+            "build_execute_shortcut",
+            "Pencil-Me-In.shortcut",
+            default=False,
+            budget=Budget(
+                total=360.0,
+                phases={"--- Fetch Event Sources ---": 320.0},
+                iterations={
+                    "calendars_to_check": 3,
+                    "found_events": 100,
+                    "sources": 15,  # uncached, one ChatGPT call each
+                },
+            ),
+            bakes=True,
+        ),
+    ]
+}
+
+
+def get_target(name: str, bake_config: str = None) -> Target:
+    """A target, with a config file to bake in if given (see bake.py)"""
+    target = TARGETS[name]
+    if bake_config is None:
+        return target
+    if not target.bakes:
+        raise ValueError(f"{name} doesn't support --bake-config")
+    path = os.path.abspath(bake_config)
+    return target._replace(inputs=(*target.inputs, path), bake=path)
+
+
+# =============================================================================
+# Fingerprinting
+# =============================================================================
+
+
+_imports_cache = {}  # path -> ((mtime_ns, size), imported module names)
+
+
+def _imports(path: str) -> list[str]:
+    """
+    Absolute imports anywhere in a file, including inside functions, but not
+    under `if __name__ == "__main__":` (which can't change what is built)
+    """
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _imports_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = []
+    pending = [tree]
+    while pending:  # imports are statements: skip walking into expressions
+        node = pending.pop()
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+        pending.extend(
+            child
+            for child in ast.iter_child_nodes(node)
+            if isinstance(child, (ast.stmt, ast.excepthandler, ast.match_case))
+            and not _is_main_guard(child)
+        )
+    _imports_cache[path] = (stamp, names)
+    return names
+
+
+def _is_main_guard(node: ast.AST) -> bool:
+    return (
+        isinstance(node, ast.If)
+        and isinstance(node.test, ast.Compare)
+        and isinstance(node.test.left, ast.Name)
+        and node.test.left.id == "__name__"
+        and len(node.test.comparators) == 1
+        and isinstance(node.test.comparators[0], ast.Constant)
+        and node.test.comparators[0].value == "__main__"
+    )
+
+
+def local_dependencies(module: str) -> list[str]:
+    """Return the sorted import closure of `module` within the builder directory"""
+    seen = set()
+    pending = [module]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        path = os.path.join(BUILDER_DIR, f"{name}.py")
+        if not os.path.exists(path):
+            continue
+        seen.add(name)
+        pending.extend(_imports(path))
+    return sorted(seen)
+
+
+def fingerprint(target: Target) -> str:
+    """Hash everything that can change the bytes of a target's output"""
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION} py{sys.version_info[0]}.{sys.version_info[1]}".encode())
+    h.update(f"\0{target.module}.{target.function}".encode())
+    paths = [
+        os.path.join(BUILDER_DIR, f"{m}.py") for m in local_dependencies(target.module)
+    ]
+    paths += [os.path.join(ROOT_DIR, p) for p in target.inputs]
+    for path in paths:
+        h.update(f"\0{os.path.relpath(path, ROOT_DIR)}\0".encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+# =============================================================================
+# Artifact Cache
+# =============================================================================
+
+
+def _load_state(cache_dir: str) -> dict:
+    try:
+        with open(os.path.join(cache_dir, "state.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(cache_dir: str, state: dict):
+    _atomic_write(
+        os.path.join(cache_dir, "state.json"), json.dumps(state, indent=2).encode()
+    )
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _prune_cache(cache_dir: str, keep: int = CACHE_MAX_ARTIFACTS):
+    """Drop the least recently used artifacts beyond `keep`"""
+    artifacts = [
+        os.path.join(cache_dir, name)
+        for name in os.listdir(cache_dir)
+        if name.endswith(".shortcut")
+    ]
+    artifacts.sort(key=os.path.getmtime, reverse=True)
+    for path in artifacts[keep:]:
+        os.unlink(path)
+        if os.path.exists(manifest_path(path)):
+            os.unlink(manifest_path(path))
+
+
+def _output_matches(path: str, record: dict) -> bool:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_size == record.get("size") and st.st_mtime_ns == record.get("mtime_ns")
+
+
+def _import_fresh(module: str):
+    """Import a build module, dropping stale copies of local modules first"""
+    import importlib
+
+    if BUILDER_DIR not in sys.path:
+        sys.path.insert(0, BUILDER_DIR)
+    for name in local_dependencies(module):
+        sys.modules.pop(name, None)
+    return importlib.import_module(module)
+
+
+def _check_budget(target: Target, path: str) -> list:
+    """Estimate a built shortcut against the target's budget (raises if over)"""
+    if target.budget is None:
+        return []
+    with open(path, "rb") as f:
+        actions = plistlib.load(f)["WFWorkflowActions"]
+    return check_budget(actions, target.budget)
+
+
+def _budget_estimate(target: Target, phase_list: list) -> dict:
+    """The manifest's record of a budget check, for _check_stored_budget()"""
+    return {
+        "iterations": dict(target.budget.iterations),
+        "phases": [[p.name, round(p.cost.seconds, 6)] for p in phase_list],
+    }
+
+
+def _check_stored_budget(target: Target, path: str):
+    """
+    _check_budget() from the estimate in the shortcut's manifest, so no-op
+    builds don't parse the plist. Re-estimates when the manifest has no
+    estimate for the budget's loop sizes, or to report one over budget.
+    """
+    if target.budget is None:
+        return
+    try:
+        with open(manifest_path(path)) as f:
+            estimate = json.load(f).get("estimate") or {}
+    except (OSError, ValueError):
+        estimate = {}
+    if estimate.get("iterations") == target.budget.iterations and not (
+        seconds_over_budget(estimate["phases"], target.budget)
+    ):
+        return
+    _check_budget(target, path)
+
+
+def build_target(
+    target: Target,
+    out_dir: str = SHORTCUTS_DIR,
+    cache_dir: str = CACHE_DIR,
+    force: bool = False,
+) -> str:
+    """
+    Build one target if its inputs changed. Returns "skipped", "restored",
+    "built", or "unchanged" if it was rebuilt to an equivalent shortcut.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(out_dir, exist_ok=True)
+    output_path = os.path.join(out_dir, target.output)
+    fp = fingerprint(target)
+    artifact = os.path.join(cache_dir, f"{fp}.shortcut")
+
+    state = _load_state(cache_dir)
+    record = state.get(output_path, {})
+    if (
+        not force
+        and record.get("fingerprint") == fp
+        and os.path.exists(artifact)
+        and _output_matches(output_path, record)
+        and os.path.exists(manifest_path(output_path))
+    ):
+        _check_stored_budget(target, artifact)
+        return "skipped"
+
+    from canonical import shortcut_hash  # not needed by no-op builds
+
+    cached_manifest = manifest_path(artifact)
+    if not force and os.path.exists(artifact):
+        status = "restored"
+        stats = None
+    else:
+        module = _import_fresh(target.module)
+        builder = sys.modules["shortcut_builder"]  # the copy the module uses
+        with builder.instrument() as stats:
+            with builder.phase("build"):
+                args = []
+                if target.bake is not None:
+                    bake = sys.modules["bake"]  # the copy the module uses
+                    args.append(bake.load_baked_config(target.bake))
+                shortcut = getattr(module, target.function)(*args)
+            tmp_path = f"{artifact}.tmp{os.getpid()}"
+            builder.save_shortcut(shortcut, tmp_path)
+        os.replace(tmp_path, artifact)
+        status = "built"
+
+    phase_list = _check_budget(target, artifact)
+    with open(artifact, "rb") as f:
+        data = f.read()
+    os.utime(artifact)  # mark as recently used for pruning
+    plist = plistlib.loads(data)
+    if stats is not None or not os.path.exists(cached_manifest):
+        source = f"{target.module}.{target.function}"
+        manifest = build_manifest(plist, len(data), stats, source)
+        if target.budget is not None:
+            manifest["estimate"] = _budget_estimate(target, phase_list)
+        write_manifest(artifact, manifest)
+
+    # Inputs changed but the shortcut didn't (up to UUIDs): leave the output,
+    # and whatever was derived from it, alone
+    content_hash = shortcut_hash(plist)
+    if (
+        not force
+        and record.get("hash") == content_hash
+        and _output_matches(output_path, record)
+    ):
+        status = "unchanged"
+    else:
+        _atomic_write(output_path, data)
+    with open(cached_manifest, "rb") as f:
+        _atomic_write(manifest_path(output_path), f.read())
+
+    st = os.stat(output_path)
+    state[output_path] = {
+        "fingerprint": fp,
+        "hash": content_hash,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+    _save_state(cache_dir, state)
+    _prune_cache(cache_dir)
+    return status
+
+
+def build(
+    names: list[str],
+    out_dir: str = SHORTCUTS_DIR,
+    cache_dir: str = CACHE_DIR,
+    force: bool = False,
+    bake_config: str = None,
+) -> dict[str, str]:
+    """Build the named targets. Returns {name: status}."""
+    results = {}
+    for name in names:
+        target = get_target(name, bake_config)
+        start = time.perf_counter()
+        results[name] = build_target(target, out_dir, cache_dir, force)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"✓ {name}: {results[name]} {target.output} ({elapsed:.0f} ms)")
+        if target.budget and results[name] != "skipped":
+            phases = _check_budget(target, os.path.join(out_dir, target.output))
+            print(format_report(f"  Budget for {target.output}", phases, target.budget))
+    return results
+
+
+# =============================================================================
+# Per-Family Builds
+# =============================================================================
+
+CONFIG_SCHEMA = os.path.join(ROOT_DIR, "schema", "config-schema.json")
+JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+class BatchResult(NamedTuple):
+    built: dict[str, str]  # config name -> output path
+    failed: dict[str, str]  # config name -> error
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        """Shortcuts built per second"""
+        return len(self.built) / self.seconds if self.seconds else 0.0
+
+
+def load_configs(path: str) -> list[tuple[str, dict]]:
+    """
+    Load household configs from a directory of .json files (named after the
+    file) or a .jsonl file (named "<file>-<line>"). Returns [(name, config)].
+    """
+    if os.path.isdir(path):
+        configs = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".json"):
+                with open(os.path.join(path, name)) as f:
+                    configs.append((name[: -len(".json")], json.load(f)))
+        return configs
+    stem = os.path.splitext(os.path.basename(path))[0]
+    with open(path) as f:
+        return [
+            (f"{stem}-{n}", json.loads(line))
+            for n, line in enumerate(f, 1)
+            if line.strip()
+        ]
+
+
+def check_config(config: dict, schema: dict) -> list[str]:
+    """Required keys and top-level types from the config schema"""
+    if not isinstance(config, dict):
+        return ["config is not an object"]
+    errors = [f"missing '{key}'" for key in schema["required"] if key not in config]
+    for key, spec in schema["properties"].items():
+        expected = JSON_TYPES.get(spec.get("type"))
+        if key in config and expected and not isinstance(config[key], expected):
+            errors.append(f"'{key}' should be {spec['type']}")
+    return errors
+
+
+def _build_variant(item: tuple[str, dict], out_dir: str) -> tuple[str, str, str]:
+    """Build one household's main shortcut. Returns (name, path, error)."""
+    if BUILDER_DIR not in sys.path:
+        sys.path.insert(0, BUILDER_DIR)
+    from build_main import build_main_shortcut
+    from shortcut_builder import instrument, phase, save_shortcut
+
+    name, config = item
+    path = os.path.join(out_dir, f"{name}.shortcut")
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with instrument() as stats:
+            with phase("build"):
+                shortcut = build_main_shortcut(config)
+            save_shortcut(shortcut, tmp_path)
+        os.replace(tmp_path, path)
+        source = "build_main.build_main_shortcut"
+        manifest = build_manifest(shortcut, os.path.getsize(path), stats, source)
+        write_manifest(path, manifest)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return name, None, repr(e)
+    return name, path, None
+
+
+def build_many(
+    configs: list[tuple[str, dict]],
+    out_dir: str,
+    jobs: int = None,
+    chunksize: int = None,
+) -> BatchResult:
+    """
+    Build a personalized main shortcut per (name, config) into out_dir, across
+    `jobs` processes. Outputs are written atomically; configs that don't match
+    the schema or fail to build are reported in BatchResult.failed.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    names = [name for name, _ in configs]
+    if len(set(names)) != len(names):
+        raise ValueError("config names must be unique")
+    with open(CONFIG_SCHEMA) as f:
+        schema = json.load(f)
+    os.makedirs(out_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    failed = {}
+    valid = []
+    for name, config in configs:
+        errors = check_config(config, schema)
+        if errors:
+            failed[name] = "; ".join(errors)
+        else:
+            valid.append((name, config))
+
+    jobs = jobs or os.cpu_count() or 1
+    build_one = partial(_build_variant, out_dir=out_dir)
+    if jobs == 1 or len(valid) < 2:
+        results = map(build_one, valid)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        chunksize = chunksize or max(1, len(valid) // (jobs * 4))
+        results = pool.map(build_one, valid, chunksize=chunksize)
+
+    built = {}
+    try:
+        for name, path, error in results:
+            if error:
+                failed[name] = error
+            else:
+                built[name] = path
+    finally:
+        if pool:
+            pool.shutdown()
+    return BatchResult(built, failed, time.perf_counter() - start)
+
+
+# =============================================================================
+# Watch Mode
+# =============================================================================
+
+
+def _watched_files(names: list[str], bake_config: str = None) -> list[str]:
+    paths = set()
+    for name in names:
+        target = get_target(name, bake_config)
+        paths.update(
+            os.path.join(BUILDER_DIR, f"{m}.py")
+            for m in local_dependencies(target.module)
+        )
+        paths.update(os.path.join(ROOT_DIR, p) for p in target.inputs)
+    return sorted(paths)
+
+
+def _snapshot(paths: list[str]) -> dict[str, int]:
+    snapshot = {}
+    for path in paths:
+        try:
+            snapshot[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            snapshot[path] = 0
+    return snapshot
+
+
+def watch(
+    names: list[str],
+    out_dir: str = SHORTCUTS_DIR,
+    cache_dir: str = CACHE_DIR,
+    bake_config: str = None,
+):
+    """Poll inputs and rebuild changed targets until interrupted"""
+    build(names, out_dir, cache_dir, bake_config=bake_config)
+    snapshot = _snapshot(_watched_files(names, bake_config))
+    print(f"Watching {len(snapshot)} files (Ctrl-C to stop)...")
+    while True:
+        time.sleep(WATCH_INTERVAL)
+        current = _snapshot(_watched_files(names, bake_config))
+        if current == snapshot:
+            continue
+        snapshot = current
+        try:
+            build(names, out_dir, cache_dir, bake_config=bake_config)
+        except Exception as e:  # keep watching after a broken edit
+            print(f"✗ Build failed: {e!r}")
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build Pencil Me In shortcuts")
+    parser.add_argument(
+        "targets",
+        nargs="*",
+        help=f"Targets to build: {', '.join(TARGETS)} (default: all but execute)",
+    )
+    parser.add_argument(
+        "--configs",
+        metavar="PATH",
+        help="Build a main shortcut per household config (directory or .jsonl)",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="Worker processes for --configs"
+    )
+    parser.add_argument("--out-dir", default=None)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument(
+        "--force", action="store_true", help="Rebuild even if unchanged"
+    )
+    parser.add_argument("--watch", action="store_true", help="Rebuild on file change")
+    parser.add_argument(
+        "--bake-config",
+        metavar="PATH",
+        help="Bake a household config into the shortcut (execute only)",
+    )
+    args = parser.parse_args(argv)
+    # One optimizer report per household would drown the summary
+    level = logging.WARNING if args.configs else logging.INFO
+    logging.basicConfig(level=level, format="  %(message)s")
+
+    if args.configs:
+        if args.targets or args.watch or args.bake_config or not args.out_dir:
+            parser.error(
+                "--configs takes --out-dir and no targets, --watch or --bake-config"
+            )
+        result = build_many(load_configs(args.configs), args.out_dir, args.jobs)
+        for name, error in sorted(result.failed.items()):
+            print(f"✗ {name}: {error}")
+        print(
+            f"✓ Built {len(result.built)} shortcuts in {result.seconds:.1f} s "
+            f"({result.rate:.0f} shortcuts/s), {len(result.failed)} failed"
+        )
+        return 1 if result.failed else 0
+    args.out_dir = args.out_dir or SHORTCUTS_DIR
+
+    unknown = [n for n in args.targets if n not in TARGETS]
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(unknown)}")
+    names = args.targets or [t.name for t in TARGETS.values() if t.default]
+    outputs = [TARGETS[n].output for n in names]
+    if len(set(outputs)) != len(outputs):
+        parser.error("targets write the same output file; build them separately")
+    if args.bake_config:
+        unbakeable = [n for n in names if not TARGETS[n].bakes]
+        if unbakeable:
+            parser.error(f"--bake-config doesn't apply to: {', '.join(unbakeable)}")
+
+    if args.watch:
+        try:
+            watch(names, args.out_dir, args.cache_dir, args.bake_config)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    try:
+        build(names, args.out_dir, args.cache_dir, args.force, args.bake_config)
+    except BudgetExceeded as e:
+        print(format_report("✗ Over budget", e.phases, e.budget))
+        print(f"✗ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
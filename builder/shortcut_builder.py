@@ -2,29 +2,149 @@
 Shortcut Builder - Generate Apple Shortcuts programmatically
 """
 
-import plistlib
+import json
+import re
+import sys
+import time
 import uuid
-from typing import Any
+from collections.abc import Mapping
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, NamedTuple
+
+from bplist_writer import dump_shortcut
+
+# The ￼ character (U+FFFC) marks where a variable is attached in a token string
+PLACEHOLDER = "\ufffc"
+
+# Compiled templates are cached so per-family builds can reuse large prompts
+TEMPLATE_CACHE_SIZE = 512
+
+
+def random_uuid() -> str:
+    """Generate a random UUID (the default outside of a uuid_scope)"""
+    return str(uuid.uuid4()).upper()
+
+
+class UUIDAllocator:
+    """
+    Deterministic UUIDs: a prefix derived from the seed plus a counter.
+    Building the same shortcut twice gives byte-identical plists.
+    """
+
+    __slots__ = ("prefix", "count")
+
+    def __init__(self, seed: str):
+        # uuid5 gives the seed-dependent bits (with version/variant set);
+        # the last 12 hex digits are replaced by the counter
+        self.prefix = str(uuid.uuid5(uuid.NAMESPACE_URL, seed)).upper()[:24]
+        self.count = 0
+
+    def __call__(self) -> str:
+        self.count += 1
+        return f"{self.prefix}{self.count:012X}"
+
+
+_allocate_uuid = random_uuid
 
 
 def new_uuid() -> str:
     """Generate a new UUID for action references"""
-    return str(uuid.uuid4()).upper()
+    return _allocate_uuid()
+
+
+def set_uuid_allocator(allocator: Callable[[], str]) -> Callable[[], str]:
+    """Install a zero-argument callable used by new_uuid(). Returns the previous one."""
+    global _allocate_uuid
+    previous = _allocate_uuid
+    _allocate_uuid = allocator or random_uuid
+    return previous
+
+
+@contextmanager
+def uuid_scope(seed: str):
+    """
+    Allocate deterministic UUIDs seeded from `seed` (usually the shortcut name).
+    Works as a context manager or as a decorator on a build function.
+    """
+    previous = set_uuid_allocator(UUIDAllocator(seed))
+    try:
+        yield
+    finally:
+        set_uuid_allocator(previous)
+
+
+# =============================================================================
+# Instrumentation
+# =============================================================================
+
+
+class BuildStats:
+    """Phase timings and counters collected inside instrument()"""
+
+    def __init__(self):
+        self.phases = {}  # phase name -> seconds; nested ones are "outer/inner"
+        self.counters = {}
+        self.open = []  # names of the phases being timed
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+
+_stats = None
+
+
+@contextmanager
+def instrument():
+    """Collect BuildStats for everything built inside. Yields the stats."""
+    global _stats
+    previous = _stats
+    _stats = stats = BuildStats()
+    try:
+        yield stats
+    finally:
+        _stats = previous
+
+
+@contextmanager
+def phase(name: str):
+    """Time a build phase (adds up when entered again). No-op outside instrument()."""
+    stats = _stats
+    if stats is None:
+        yield
+        return
+    stats.open.append(name)
+    key = "/".join(stats.open)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.phases[key] = stats.phases.get(key, 0.0) + elapsed
+        stats.open.pop()
+
+
+def count(name: str, n: int = 1):
+    """Add to a build counter. No-op outside instrument()."""
+    if _stats is not None:
+        _stats.count(name, n)
 
 
 def create_shortcut(
     name: str,
-    actions: list[dict],
+    actions: list["Action"],
     icon_color: int = 4282601983,
     icon_glyph: int = 59771,
     import_questions: list[dict] = None,
+    optimize: bool = False,
 ) -> dict:
     """Create a shortcut plist structure
 
     Args:
         import_questions: List of import question dicts from import_question()
+        optimize: Run the peephole optimizer over the actions (see optimizer.py)
     """
-    return {
+    shortcut = {
         "WFWorkflowClientVersion": "2605.0.5",
         "WFWorkflowClientRelease": "7.0",
         "WFWorkflowMinimumClientVersion": 900,
@@ -42,6 +162,13 @@ def create_shortcut(
         "WFWorkflowActions": actions,
         "WFWorkflowTypes": ["NCWidget", "WatchKit"],
     }
+    if optimize:
+        from optimizer import optimize_shortcut
+
+        with phase("optimize"):
+            shortcut, report = optimize_shortcut(shortcut)
+        count("actions_removed_by_optimizer", report.removed)
+    return shortcut
 
 
 def import_question(
@@ -75,9 +202,341 @@ def import_question(
 
 
 def save_shortcut(shortcut: dict, path: str):
-    """Save shortcut to file"""
-    with open(path, "wb") as f:
-        plistlib.dump(shortcut, f, fmt=plistlib.FMT_BINARY)
+    """Save shortcut to file, streaming actions through the bplist writer"""
+    with phase("serialize"), open(path, "wb") as f:
+        dump_shortcut(shortcut, f)
+
+
+# =============================================================================
+# Aggrandizements
+# =============================================================================
+#
+# Wherever a builder takes a variable name, "Repeat Item.title" reads the
+# Repeat Item dictionary's value for "title" (a key path, like Get Dictionary
+# Value) through aggrandizements on the reference, without an extra action.
+# "Repeat Item:Start Date" reads a property of a content item instead, e.g.
+# of a calendar event.
+
+COERCION_CLASSES = {
+    "Boolean": "WFBooleanContentItem",
+    "Date": "WFDateContentItem",
+    "Dictionary": "WFDictionaryContentItem",
+    "Number": "WFNumberContentItem",
+    "Text": "WFStringContentItem",
+    "URL": "WFURLContentItem",
+}
+
+Aggrandizements = tuple[tuple[tuple[str, str], ...], ...]  # frozen dicts
+
+
+def coercion(type_name: str) -> tuple[tuple[str, str], ...]:
+    """Aggrandizement coercing a reference to a type (see COERCION_CLASSES)"""
+    return (
+        ("CoercionItemClass", COERCION_CLASSES[type_name]),
+        ("Type", "WFCoercionVariableAggrandizement"),
+    )
+
+
+def dictionary_key(key: str) -> tuple[tuple[str, str], ...]:
+    """Aggrandizement reading a dictionary value by key (or key path)"""
+    return (
+        ("DictionaryKey", key),
+        ("Type", "WFDictionaryValueVariableAggrandizement"),
+    )
+
+
+def property_name(name: str) -> tuple[tuple[str, str], ...]:
+    """Aggrandizement reading a content item's property, e.g. Start Date"""
+    return (
+        ("PropertyName", name),
+        ("Type", "WFPropertyVariableAggrandizement"),
+    )
+
+
+def aggrandizements(key: str = None, as_type: str = None) -> Aggrandizements:
+    """Aggrandizements for a dictionary key and/or a coercion to a type"""
+    result = ()
+    if key is not None:
+        result = (coercion("Dictionary"), dictionary_key(key))
+    if as_type is not None:
+        result += (coercion(as_type),)
+    return result
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def parse_reference(name: str) -> tuple[str, Aggrandizements]:
+    """
+    Split "variable.key.path" or "variable:Property" into the variable and
+    its aggrandizements
+    """
+    variable, dot, key = name.partition(".")
+    if ":" in variable:
+        variable, _, prop = name.partition(":")
+        return sys.intern(variable), (property_name(prop),)
+    return sys.intern(variable), aggrandizements(key) if dot else ()
+
+
+def _variable_value(name: str) -> dict:
+    """A reference's Value dict for a variable name (which may read a key)"""
+    variable, extras = parse_reference(name)
+    value = {"Type": "Variable", "VariableName": variable}
+    if extras:
+        value["Aggrandizements"] = [dict(a) for a in extras]
+    return value
+
+
+# =============================================================================
+# Token String Templates
+# =============================================================================
+
+_TEMPLATE_VARIABLE = re.compile(r"\{([^{}\n]+)\}")
+
+
+def _utf16_len(s: str) -> int:
+    """Length of s in UTF-16 code units (what attachmentsByRange offsets count)"""
+    return len(s.encode("utf-16-le")) // 2
+
+
+class CompiledTemplate(NamedTuple):
+    """A token string with its attachments resolved to UTF-16 range keys"""
+
+    string: str
+    attachments: tuple[tuple[str, str], ...]  # (range_key, variable_name)
+
+    def token_string(self) -> dict:
+        """Emit a fresh WFTextTokenString value"""
+        return {
+            "Value": {
+                "attachmentsByRange": {
+                    range_key: _variable_value(name)
+                    for range_key, name in self.attachments
+                },
+                "string": self.string,
+            },
+            "WFSerializationType": "WFTextTokenString",
+        }
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_segments(segments: tuple[str, ...]) -> CompiledTemplate:
+    """
+    Compile alternating (literal, variable, literal, variable, ...) segments.
+    Example: ("Hello, ", "name", "!") -> "Hello, ￼!" with name at {7, 1}
+    """
+    count("templates_compiled")
+    parts = []
+    attachments = []
+    offset = 0
+    for i, segment in enumerate(segments):
+        if i % 2:
+            attachments.append((f"{{{offset}, 1}}", segment))
+            parts.append(PLACEHOLDER)
+            offset += 1
+        elif segment:
+            parts.append(segment)
+            offset += _utf16_len(segment)
+    return CompiledTemplate("".join(parts), tuple(attachments))
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(
+    template: str, variable_names: tuple[str, ...] = None
+) -> CompiledTemplate:
+    """
+    Compile a template with {variable_name} placeholders in a single pass.
+
+    Args:
+        template: Text with {var} placeholders
+        variable_names: Only these names become variables; other {...} stay
+            literal (prompts often contain JSON). None means every {var}.
+    """
+    segments = []
+    pos = 0
+    for match in _TEMPLATE_VARIABLE.finditer(template):
+        name = match.group(1)
+        if variable_names is not None and name not in variable_names:
+            continue
+        segments.append(template[pos : match.start()])
+        segments.append(name)
+        pos = match.end()
+    segments.append(template[pos:])
+    return compile_segments(tuple(segments))
+
+
+def token_string(*segments: str) -> "TokenString":
+    """
+    Build a WFTextTokenString from alternating literal/variable segments.
+    Example: token_string("Hello, ", "name", "!") -> "Hello, {name}!"
+    """
+    return TokenString(compile_segments(segments))
+
+
+def template_token_string(
+    template: str, variable_names: list[str] = None
+) -> "TokenString":
+    """Build a WFTextTokenString from a {var} template"""
+    names = tuple(variable_names) if variable_names is not None else None
+    return TokenString(compile_template(template, names))
+
+
+# =============================================================================
+# Action IR
+# =============================================================================
+#
+# Builders return compact nodes instead of nested plist dicts. Nodes read like
+# the dicts they stand for (node["Value"], action["WFWorkflowActionParameters"]),
+# but the plist structure is only materialized by to_plist(), which
+# save_shortcut() calls once when writing the file. Reading a key lowers the
+# node again each time, so what it returns is read-only rather than silently
+# dropping writes: to edit an action, edit to_plist()'s output instead. Passes
+# that read every action (see controlflow.lowered) lower each node once.
+
+
+def _refuse_write(self, *args, **kwargs):
+    raise TypeError("IR node values are read-only, edit to_plist()'s output")
+
+
+class _ReadOnlyDict(dict):
+    """A dict that raises on writes, equal to the plain dict it copies"""
+
+    __setitem__ = __delitem__ = __ior__ = _refuse_write
+    clear = pop = popitem = setdefault = update = _refuse_write
+
+
+class _ReadOnlyList(list):
+    """A list that raises on writes, equal to the plain list it copies"""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _refuse_write
+    append = extend = insert = pop = remove = clear = sort = reverse = _refuse_write
+
+
+def _read_only(value: Any) -> Any:
+    """Lower `value` like to_plist(), straight into read-only containers"""
+    kind = type(value)
+    if kind is str or kind is int or kind is bool:
+        return value
+    if kind is dict:
+        return _ReadOnlyDict((key, _read_only(item)) for key, item in value.items())
+    if kind is list:
+        return _ReadOnlyList(_read_only(item) for item in value)
+    lower = getattr(value, "to_plist", None)
+    return _read_only(lower()) if lower else value
+
+
+class Node(Mapping):
+    """Base for IR nodes. Reading a key lowers the node to its plist dict."""
+
+    __slots__ = ()
+
+    def to_plist(self) -> dict:
+        raise NotImplementedError
+
+    def __getitem__(self, key):
+        return _read_only(self.to_plist()[key])
+
+    def __iter__(self):
+        return iter(self.to_plist())
+
+    def __len__(self):
+        return len(self.to_plist())
+
+    def __repr__(self):
+        fields = ", ".join(repr(getattr(self, name)) for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class TokenString(Node):
+    """WFTextTokenString backed by a shared CompiledTemplate"""
+
+    __slots__ = ("template",)
+
+    def __init__(self, template: CompiledTemplate):
+        self.template = template
+
+    def to_plist(self) -> dict:
+        return self.template.token_string()
+
+
+class VariableRef(Node):
+    """WFTextTokenAttachment pointing at a named variable (or one of its keys)"""
+
+    __slots__ = ("name", "as_type")
+
+    def __init__(self, name: str, as_type: str = None):
+        self.name = sys.intern(name)
+        self.as_type = as_type
+
+    def to_plist(self) -> dict:
+        value = _variable_value(self.name)
+        if self.as_type is not None:
+            value.setdefault("Aggrandizements", [])
+            value["Aggrandizements"].append(dict(coercion(self.as_type)))
+        return {"Value": value, "WFSerializationType": "WFTextTokenAttachment"}
+
+
+class OutputRef(Node):
+    """WFTextTokenAttachment pointing at a previous action's output"""
+
+    __slots__ = ("uuid", "output_name", "aggrandizements")
+
+    def __init__(
+        self, uuid: str, output_name: str, aggrandizements: Aggrandizements = ()
+    ):
+        self.uuid = uuid
+        self.output_name = sys.intern(output_name)
+        self.aggrandizements = aggrandizements
+
+    def to_plist(self) -> dict:
+        value = {
+            "OutputName": self.output_name,
+            "OutputUUID": self.uuid,
+            "Type": "ActionOutput",
+        }
+        if self.aggrandizements:
+            value["Aggrandizements"] = [dict(a) for a in self.aggrandizements]
+        return {"Value": value, "WFSerializationType": "WFTextTokenAttachment"}
+
+
+class Action(Node):
+    """A workflow action: identifier plus parameters that may hold IR nodes"""
+
+    __slots__ = ("identifier", "params")
+
+    def __init__(self, identifier: str, params: dict):
+        self.identifier = identifier  # builders pass interned string literals
+        self.params = params
+
+    def to_plist(self) -> dict:
+        return {
+            "WFWorkflowActionIdentifier": self.identifier,
+            "WFWorkflowActionParameters": to_plist(self.params),
+        }
+
+    def __getitem__(self, key):
+        if key == "WFWorkflowActionIdentifier":
+            return self.identifier
+        if key == "WFWorkflowActionParameters":
+            return _read_only(self.params)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("WFWorkflowActionIdentifier", "WFWorkflowActionParameters"))
+
+    def __len__(self):
+        return 2
+
+
+def to_plist(value: Any) -> Any:
+    """Lower IR nodes (at any depth) to plain plist values"""
+    kind = type(value)
+    if kind is str or kind is int or kind is bool:
+        return value
+    if kind is dict:
+        return {key: to_plist(item) for key, item in value.items()}
+    if kind is list:
+        return [to_plist(item) for item in value]
+    lower = getattr(value, "to_plist", None)  # IR node (cheaper than an ABC check)
+    return lower() if lower else value
 
 
 # =============================================================================
@@ -85,72 +544,50 @@ def save_shortcut(shortcut: dict, path: str):
 # =============================================================================
 
 
-def comment(text: str) -> dict:
+def comment(text: str) -> Action:
     """Add a comment (for organization)"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.comment",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.comment",
+        {
             "WFCommentActionText": text,
         },
-    }
+    )
 
 
-def text(content: str, output_name: str = None) -> tuple[dict, str]:
+def text(content: str, output_name: str = None) -> tuple[Action, str]:
     """Create a text action. Returns (action, uuid) for variable references."""
     action_uuid = new_uuid()
-    action = {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.gettext",
-        "WFWorkflowActionParameters": {
-            "WFTextActionText": content,
-            "UUID": action_uuid,
-        },
+    params = {
+        "WFTextActionText": content,
+        "UUID": action_uuid,
     }
     if output_name:
-        action["WFWorkflowActionParameters"]["CustomOutputName"] = output_name
-    return action, action_uuid
+        params["CustomOutputName"] = output_name
+    return Action("is.workflow.actions.gettext", params), action_uuid
 
 
 def text_with_variable(
     prefix: str, variable_name: str, suffix: str = ""
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """
     Create a text action with an embedded variable.
     Example: text_with_variable("Hello, ", "name", "!") -> "Hello, {name}!"
     Returns (action, uuid).
     """
     action_uuid = new_uuid()
-    # The ￼ character (U+FFFC) is a placeholder for the variable
-    placeholder = "￼"
-    full_string = f"{prefix}{placeholder}{suffix}"
-
-    # Calculate the position of the placeholder
-    pos = len(prefix)
-    range_key = f"{{{pos}, 1}}"
-
-    action = {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.gettext",
-        "WFWorkflowActionParameters": {
+    action = Action(
+        "is.workflow.actions.gettext",
+        {
             "UUID": action_uuid,
-            "WFTextActionText": {
-                "Value": {
-                    "attachmentsByRange": {
-                        range_key: {
-                            "Type": "Variable",
-                            "VariableName": variable_name,
-                        }
-                    },
-                    "string": full_string,
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+            "WFTextActionText": token_string(prefix, variable_name, suffix),
         },
-    }
+    )
     return action, action_uuid
 
 
 def ask(
     question: str, default: str = None, input_type: str = "Text"
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """Ask for input. Returns (action, uuid)."""
     action_uuid = new_uuid()
     params = {
@@ -160,26 +597,20 @@ def ask(
     }
     if default:
         params["WFAskActionDefaultAnswer"] = default
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.ask",
-        "WFWorkflowActionParameters": params,
-    }, action_uuid
+    return Action("is.workflow.actions.ask", params), action_uuid
 
 
-def set_variable(name: str, input_ref: str = None) -> dict:
+def set_variable(name: str, input_ref: str = None) -> Action:
     """Set a variable from input or previous action output"""
     params = {"WFVariableName": name}
     if input_ref:
         params["WFInput"] = variable_ref(input_ref)
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.setvariable",
-        "WFWorkflowActionParameters": params,
-    }
+    return Action("is.workflow.actions.setvariable", params)
 
 
 def set_variable_from_action(
     name: str, action_uuid: str, output_name: str = "Result"
-) -> dict:
+) -> Action:
     """
     Set a variable from a specific action's output (Magic Variable).
     Use this for third-party app intents that don't auto-pass output to pipeline.
@@ -189,92 +620,73 @@ def set_variable_from_action(
         action_uuid: The UUID of the action whose output to capture
         output_name: The name of the output (default "Result", may vary by intent)
     """
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.setvariable",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.setvariable",
+        {
             "WFVariableName": name,
             "WFInput": action_output_ref(action_uuid, output_name),
         },
-    }
+    )
 
 
-def get_variable(name: str) -> tuple[dict, str]:
+def get_variable(name: str) -> tuple[Action, str]:
     """Get a variable. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.getvariable",
-        "WFWorkflowActionParameters": {
-            "WFVariable": {
-                "Value": {"VariableName": name, "Type": "Variable"},
-                "WFSerializationType": "WFTextTokenAttachment",
-            },
+    return Action(
+        "is.workflow.actions.getvariable",
+        {
+            "WFVariable": variable_ref(name),
             "UUID": action_uuid,
         },
-    }, action_uuid
+    ), action_uuid
 
 
-def show_alert(title: str, message: str, show_cancel: bool = False) -> dict:
+def show_alert(title: str, message: str, show_cancel: bool = False) -> Action:
     """Show an alert dialog"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.alert",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.alert",
+        {
             "WFAlertActionTitle": title,
             "WFAlertActionMessage": message,
             "WFAlertActionCancelButtonShown": show_cancel,
         },
-    }
+    )
 
 
-def show_result(text: str) -> dict:
+def show_result(text: str) -> Action:
     """Show result (output). For variable interpolation, use show_result_with_variable."""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.showresult",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.showresult",
+        {
             "Text": text,
         },
-    }
+    )
 
 
 def show_result_with_variable(
     prefix: str, variable_name: str, suffix: str = ""
-) -> dict:
+) -> Action:
     """
     Show result with an embedded variable.
     Example: show_result_with_variable("Found: ", "data", "") -> displays "Found: {data value}"
     """
-    placeholder = "￼"
-    full_string = f"{prefix}{placeholder}{suffix}"
-    pos = len(prefix)
-    range_key = f"{{{pos}, 1}}"
-
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.showresult",
-        "WFWorkflowActionParameters": {
-            "Text": {
-                "Value": {
-                    "attachmentsByRange": {
-                        range_key: {
-                            "Type": "Variable",
-                            "VariableName": variable_name,
-                        }
-                    },
-                    "string": full_string,
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+    return Action(
+        "is.workflow.actions.showresult",
+        {
+            "Text": token_string(prefix, variable_name, suffix),
         },
-    }
+    )
 
 
-def notification(title: str, body: str) -> dict:
+def notification(title: str, body: str) -> Action:
     """Show a notification"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.notification",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.notification",
+        {
             "WFNotificationActionTitle": title,
             "WFNotificationActionBody": body,
         },
-    }
+    )
 
 
 # =============================================================================
@@ -282,7 +694,7 @@ def notification(title: str, body: str) -> dict:
 # =============================================================================
 
 
-def menu_start(items: list[str], prompt: str = None) -> tuple[dict, str]:
+def menu_start(items: list[str], prompt: str = None) -> tuple[Action, str]:
     """Start a menu. Returns (action, group_id)."""
     group_id = new_uuid()
     params = {
@@ -292,33 +704,30 @@ def menu_start(items: list[str], prompt: str = None) -> tuple[dict, str]:
     }
     if prompt:
         params["WFMenuPrompt"] = prompt
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.choosefrommenu",
-        "WFWorkflowActionParameters": params,
-    }, group_id
+    return Action("is.workflow.actions.choosefrommenu", params), group_id
 
 
-def menu_item(title: str, group_id: str) -> dict:
+def menu_item(title: str, group_id: str) -> Action:
     """Menu item case"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.choosefrommenu",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.choosefrommenu",
+        {
             "GroupingIdentifier": group_id,
             "WFControlFlowMode": 1,  # Item
             "WFMenuItemTitle": title,
         },
-    }
+    )
 
 
-def menu_end(group_id: str) -> dict:
+def menu_end(group_id: str) -> Action:
     """End menu"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.choosefrommenu",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.choosefrommenu",
+        {
             "GroupingIdentifier": group_id,
             "WFControlFlowMode": 2,  # End
         },
-    }
+    )
 
 
 # =============================================================================
@@ -326,67 +735,96 @@ def menu_end(group_id: str) -> dict:
 # =============================================================================
 
 
-def if_equals(value: str, compare_to: str) -> tuple[dict, str]:
+def if_equals(value: str, compare_to: str) -> tuple[Action, str]:
     """If condition (equals). Returns (action, group_id)."""
     group_id = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.conditional",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.conditional",
+        {
             "GroupingIdentifier": group_id,
             "WFControlFlowMode": 0,  # Start
             "WFCondition": 4,  # Equals
             "WFConditionalActionString": compare_to,
             "WFInput": {
                 "Type": "Variable",
-                "Variable": {
-                    "Value": {"VariableName": value, "Type": "Variable"},
-                    "WFSerializationType": "WFTextTokenAttachment",
-                },
+                "Variable": variable_ref(value),
             },
         },
-    }, group_id
+    ), group_id
 
 
-def if_has_value(variable_name: str) -> tuple[dict, str]:
+def if_has_value(variable_name: str) -> tuple[Action, str]:
     """If has any value. Returns (action, group_id)."""
     group_id = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.conditional",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.conditional",
+        {
             "GroupingIdentifier": group_id,
             "WFControlFlowMode": 0,
             "WFCondition": 100,  # Has any value
             "WFInput": {
                 "Type": "Variable",
-                "Variable": {
-                    "Value": {"VariableName": variable_name, "Type": "Variable"},
-                    "WFSerializationType": "WFTextTokenAttachment",
-                },
+                "Variable": variable_ref(variable_name),
+            },
+        },
+    ), group_id
+
+
+def if_has_no_value(variable_name: str) -> tuple[Action, str]:
+    """If does not have any value. Returns (action, group_id)."""
+    group_id = new_uuid()
+    return Action(
+        "is.workflow.actions.conditional",
+        {
+            "GroupingIdentifier": group_id,
+            "WFControlFlowMode": 0,
+            "WFCondition": 101,  # Does not have any value
+            "WFInput": {
+                "Type": "Variable",
+                "Variable": variable_ref(variable_name),
+            },
+        },
+    ), group_id
+
+
+def if_less_than(variable_name: str, number: int | float) -> tuple[Action, str]:
+    """If a number is less than `number`. Returns (action, group_id)."""
+    group_id = new_uuid()
+    return Action(
+        "is.workflow.actions.conditional",
+        {
+            "GroupingIdentifier": group_id,
+            "WFControlFlowMode": 0,
+            "WFCondition": 0,  # Is less than
+            "WFNumberValue": number,
+            "WFInput": {
+                "Type": "Variable",
+                "Variable": variable_ref(variable_name),
             },
         },
-    }, group_id
+    ), group_id
 
 
-def otherwise(group_id: str) -> dict:
+def otherwise(group_id: str) -> Action:
     """Else clause"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.conditional",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.conditional",
+        {
             "GroupingIdentifier": group_id,
             "WFControlFlowMode": 1,  # Else
         },
-    }
+    )
 
 
-def end_if(group_id: str) -> dict:
+def end_if(group_id: str) -> Action:
     """End if"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.conditional",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.conditional",
+        {
             "GroupingIdentifier": group_id,
             "WFControlFlowMode": 2,  # End
         },
-    }
+    )
 
 
 # =============================================================================
@@ -394,7 +832,7 @@ def end_if(group_id: str) -> dict:
 # =============================================================================
 
 
-def repeat_each_start(input_variable: str = None) -> tuple[dict, str]:
+def repeat_each_start(input_variable: str = None) -> tuple[Action, str]:
     """Start repeat with each loop. Returns (action, group_id)."""
     group_id = new_uuid()
     params = {
@@ -402,25 +840,19 @@ def repeat_each_start(input_variable: str = None) -> tuple[dict, str]:
         "WFControlFlowMode": 0,
     }
     if input_variable:
-        params["WFInput"] = {
-            "Value": {"VariableName": input_variable, "Type": "Variable"},
-            "WFSerializationType": "WFTextTokenAttachment",
-        }
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.repeat.each",
-        "WFWorkflowActionParameters": params,
-    }, group_id
+        params["WFInput"] = variable_ref(input_variable)
+    return Action("is.workflow.actions.repeat.each", params), group_id
 
 
-def repeat_each_end(group_id: str) -> dict:
+def repeat_each_end(group_id: str) -> Action:
     """End repeat with each"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.repeat.each",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.repeat.each",
+        {
             "GroupingIdentifier": group_id,
             "WFControlFlowMode": 2,
         },
-    }
+    )
 
 
 # =============================================================================
@@ -428,7 +860,7 @@ def repeat_each_end(group_id: str) -> dict:
 # =============================================================================
 
 
-def dictionary(items: dict[str, Any]) -> tuple[dict, str]:
+def dictionary(items: dict[str, Any]) -> tuple[Action, str]:
     """Create a dictionary. Returns (action, uuid)."""
     action_uuid = new_uuid()
     # Convert items to WFDictionaryItems format
@@ -444,19 +876,19 @@ def dictionary(items: dict[str, Any]) -> tuple[dict, str]:
         }
         wf_items.append(item)
 
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.dictionary",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.dictionary",
+        {
             "UUID": action_uuid,
             "WFItems": {
                 "Value": wf_items,
                 "WFSerializationType": "WFDictionaryFieldValue",
             },
         },
-    }, action_uuid
+    ), action_uuid
 
 
-def get_dictionary_value(key: str, input_uuid: str = None) -> tuple[dict, str]:
+def get_dictionary_value(key: str, input_uuid: str = None) -> tuple[Action, str]:
     """Get value from dictionary. Returns (action, uuid)."""
     action_uuid = new_uuid()
     params = {
@@ -465,64 +897,79 @@ def get_dictionary_value(key: str, input_uuid: str = None) -> tuple[dict, str]:
     }
     if input_uuid:
         params["WFInput"] = action_output_ref(input_uuid, "Dictionary")
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.getvalueforkey",
-        "WFWorkflowActionParameters": params,
-    }, action_uuid
+    return Action("is.workflow.actions.getvalueforkey", params), action_uuid
 
 
 def get_dictionary_value_from_variable(
     key: str, variable_name: str
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """Get value from dictionary stored in a variable. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    placeholder = "￼"
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.getvalueforkey",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.getvalueforkey",
+        {
             "UUID": action_uuid,
             "WFDictionaryKey": key,
-            "WFInput": {
-                "Value": {
-                    "attachmentsByRange": {
-                        "{0, 1}": {"Type": "Variable", "VariableName": variable_name}
-                    },
-                    "string": placeholder,
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+            "WFInput": token_string("", variable_name),
         },
-    }, action_uuid
+    ), action_uuid
 
 
-def set_dictionary_value(key: str, value: str) -> dict:
-    """Set value in dictionary"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.setvalueforkey",
-        "WFWorkflowActionParameters": {
-            "WFDictionaryKey": key,
-            "WFDictionaryValue": value,
+def get_dictionary_keys(variable_name: str) -> tuple[Action, str]:
+    """Get every key of a dictionary stored in a variable. Returns (action, uuid)."""
+    action_uuid = new_uuid()
+    return Action(
+        "is.workflow.actions.getvalueforkey",
+        {
+            "UUID": action_uuid,
+            "WFGetDictionaryValueType": "All Keys",
+            "WFInput": variable_ref(variable_name),
         },
+    ), action_uuid
+
+
+def set_dictionary_value(key: str, value: str, dictionary_var: str = None) -> Action:
+    """Set value in dictionary (the input, or the dictionary_var variable)"""
+    params = {
+        "WFDictionaryKey": key,
+        "WFDictionaryValue": value,
     }
+    if dictionary_var:
+        params["WFDictionary"] = variable_ref(dictionary_var)
+    return Action("is.workflow.actions.setvalueforkey", params)
 
 
-def set_dictionary_value_from_variable(key: str, variable_name: str) -> dict:
+def set_dictionary_value_from_variable(key: str, variable_name: str) -> Action:
     """Set dictionary value from a variable"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.setvalueforkey",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.setvalueforkey",
+        {
             "WFDictionaryKey": key,
-            "WFDictionaryValue": {
-                "Value": {
-                    "attachmentsByRange": {
-                        "{0, 1}": {"Type": "Variable", "VariableName": variable_name}
-                    },
-                    "string": "￼",
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+            "WFDictionaryValue": token_string("", variable_name),
         },
-    }
+    )
+
+
+def literal(value: Any) -> tuple[Action, str]:
+    """
+    An action whose output is a JSON value: text for strings and numbers, a
+    list for lists, a dictionary for dicts. Values nested deeper are JSON
+    text, which Shortcuts reads as a dictionary wherever one is expected.
+    Returns (action, uuid).
+    """
+
+    def item(value):
+        return (
+            value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        )
+
+    if isinstance(value, dict):
+        return dictionary(
+            {key: v if type(v) in (int, float) else item(v) for key, v in value.items()}
+        )
+    if isinstance(value, list):
+        return list_action([item(v) for v in value])
+    return text(item(value))
 
 
 # =============================================================================
@@ -532,31 +979,31 @@ def set_dictionary_value_from_variable(key: str, variable_name: str) -> dict:
 
 def get_file(
     path: str, error_if_not_found: bool = False, service: str = "iCloud Drive"
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """Get file from iCloud/Shortcuts folder. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.documentpicker.open",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.documentpicker.open",
+        {
             "UUID": action_uuid,
             "WFGetFilePath": path,
             "WFFileErrorIfNotFound": error_if_not_found,
             "WFShowFilePicker": False,
             "WFFileStorageService": service,
         },
-    }, action_uuid
+    ), action_uuid
 
 
-def save_file(path: str, overwrite: bool = True) -> dict:
+def save_file(path: str, overwrite: bool = True) -> Action:
     """Save to file"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.documentpicker.save",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.documentpicker.save",
+        {
             "WFFileDestinationPath": path,
             "WFSaveFileOverwrite": overwrite,
             "WFShowFilePicker": False,
         },
-    }
+    )
 
 
 # =============================================================================
@@ -564,36 +1011,28 @@ def save_file(path: str, overwrite: bool = True) -> dict:
 # =============================================================================
 
 
-def get_url(url: str) -> tuple[dict, str]:
+def get_url(url: str) -> tuple[Action, str]:
     """Download URL contents. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.downloadurl",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.downloadurl",
+        {
             "UUID": action_uuid,
             "WFURL": url,
         },
-    }, action_uuid
+    ), action_uuid
 
 
-def get_url_variable(variable_name: str) -> tuple[dict, str]:
+def get_url_variable(variable_name: str) -> tuple[Action, str]:
     """Download URL from variable. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.downloadurl",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.downloadurl",
+        {
             "UUID": action_uuid,
-            "WFURL": {
-                "Value": {
-                    "attachmentsByRange": {
-                        "{0, 1}": {"Type": "Variable", "VariableName": variable_name}
-                    },
-                    "string": "￼",
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+            "WFURL": token_string("", variable_name),
         },
-    }, action_uuid
+    ), action_uuid
 
 
 # =============================================================================
@@ -601,27 +1040,27 @@ def get_url_variable(variable_name: str) -> tuple[dict, str]:
 # =============================================================================
 
 
-def ask_chatgpt(prompt: str) -> tuple[dict, str]:
+def ask_chatgpt(prompt: str) -> tuple[Action, str]:
     """
     Ask ChatGPT via the ChatGPT app (com.openai.chat.AskIntent).
     This has internet access unlike Apple's built-in model.
     Returns (action, uuid).
     """
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "com.openai.chat.AskIntent",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "com.openai.chat.AskIntent",
+        {
             "UUID": action_uuid,
             "prompt": prompt,
             "newChat": True,
             "ShowWhenRun": False,
         },
-    }, action_uuid
+    ), action_uuid
 
 
 def ask_chatgpt_with_variable(
     prefix: str, variable_name: str, suffix: str = "", show_when_run: bool = True
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """
     Ask ChatGPT (via ChatGPT app) with a variable embedded in the prompt.
     Example: ask_chatgpt_with_variable("Find events in ", "location", ". Return JSON.")
@@ -631,55 +1070,34 @@ def ask_chatgpt_with_variable(
         show_when_run: If True, shows ChatGPT app while running (needed to capture output)
     """
     action_uuid = new_uuid()
-    placeholder = "￼"
-    full_string = f"{prefix}{placeholder}{suffix}"
-    pos = len(prefix)
-    range_key = f"{{{pos}, 1}}"
-
-    return {
-        "WFWorkflowActionIdentifier": "com.openai.chat.AskIntent",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "com.openai.chat.AskIntent",
+        {
             "UUID": action_uuid,
-            "prompt": {
-                "Value": {
-                    "attachmentsByRange": {
-                        range_key: {"Type": "Variable", "VariableName": variable_name}
-                    },
-                    "string": full_string,
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+            "prompt": token_string(prefix, variable_name, suffix),
             "newChat": True,
             "ShowWhenRun": show_when_run,
         },
-    }, action_uuid
+    ), action_uuid
 
 
 def ask_chatgpt_with_input(
     prompt_template: str, input_variable: str
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """Ask ChatGPT with variable at START of prompt. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.askllm",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.askllm",
+        {
             "UUID": action_uuid,
-            "WFLLMPrompt": {
-                "Value": {
-                    "attachmentsByRange": {
-                        "{0, 1}": {"Type": "Variable", "VariableName": input_variable}
-                    },
-                    "string": f"￼\n\n{prompt_template}",
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+            "WFLLMPrompt": token_string("", input_variable, f"\n\n{prompt_template}"),
         },
-    }, action_uuid
+    ), action_uuid
 
 
 def ask_apple_ai(
     prompt: str, model: str = "ChatGPT", output_format: str = "Text"
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """
     Ask Apple Intelligence.
     Uses is.workflow.actions.askllm - the native Apple AI action.
@@ -691,15 +1109,15 @@ def ask_apple_ai(
     Returns (action, uuid).
     """
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.askllm",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.askllm",
+        {
             "UUID": action_uuid,
             "WFLLMModel": model,
             "WFLLMOutputFormat": output_format,
             "WFLLMPrompt": prompt,
         },
-    }, action_uuid
+    ), action_uuid
 
 
 def ask_apple_ai_with_variable(
@@ -708,7 +1126,7 @@ def ask_apple_ai_with_variable(
     suffix: str = "",
     model: str = "ChatGPT",
     output_format: str = "Text",
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """
     Ask Apple Intelligence with a variable embedded in the prompt.
     Uses is.workflow.actions.askllm - the native Apple AI action.
@@ -720,28 +1138,15 @@ def ask_apple_ai_with_variable(
     Returns (action, uuid).
     """
     action_uuid = new_uuid()
-    placeholder = "￼"
-    full_string = f"{prefix}{placeholder}{suffix}"
-    pos = len(prefix)
-    range_key = f"{{{pos}, 1}}"
-
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.askllm",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.askllm",
+        {
             "UUID": action_uuid,
             "WFLLMModel": model,
             "WFLLMOutputFormat": output_format,
-            "WFLLMPrompt": {
-                "Value": {
-                    "attachmentsByRange": {
-                        range_key: {"Type": "Variable", "VariableName": variable_name}
-                    },
-                    "string": full_string,
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+            "WFLLMPrompt": token_string(prefix, variable_name, suffix),
         },
-    }, action_uuid
+    ), action_uuid
 
 
 def ask_apple_ai_with_variables(
@@ -749,7 +1154,7 @@ def ask_apple_ai_with_variables(
     variable_names: list[str],
     model: str = "ChatGPT",
     output_format: str = "Text",
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """
     Ask Apple Intelligence with multiple variables embedded in the prompt.
     Uses {variable_name} placeholders in the template.
@@ -763,40 +1168,15 @@ def ask_apple_ai_with_variables(
     Returns (action, uuid).
     """
     action_uuid = new_uuid()
-    placeholder = "￼"  # U+FFFC
-
-    # Build string with placeholders and track positions
-    result_string = prompt_template
-    attachments = {}
-
-    for var_name in variable_names:
-        search_pattern = "{" + var_name + "}"
-        pos = result_string.find(search_pattern)
-        if pos != -1:
-            # Replace with placeholder
-            result_string = (
-                result_string[:pos]
-                + placeholder
-                + result_string[pos + len(search_pattern) :]
-            )
-            range_key = f"{{{pos}, 1}}"
-            attachments[range_key] = {"Type": "Variable", "VariableName": var_name}
-
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.askllm",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.askllm",
+        {
             "UUID": action_uuid,
             "WFLLMModel": model,
             "WFLLMOutputFormat": output_format,
-            "WFLLMPrompt": {
-                "Value": {
-                    "attachmentsByRange": attachments,
-                    "string": result_string,
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+            "WFLLMPrompt": template_token_string(prompt_template, variable_names),
         },
-    }, action_uuid
+    ), action_uuid
 
 
 # =============================================================================
@@ -804,7 +1184,7 @@ def ask_apple_ai_with_variables(
 # =============================================================================
 
 
-def get_upcoming_events(calendar: str = None, count: int = 50) -> tuple[dict, str]:
+def get_upcoming_events(calendar: str = None, count: int = 50) -> tuple[Action, str]:
     """Get upcoming calendar events. Returns (action, uuid)."""
     action_uuid = new_uuid()
     params = {
@@ -813,10 +1193,78 @@ def get_upcoming_events(calendar: str = None, count: int = 50) -> tuple[dict, st
     }
     if calendar:
         params["WFGetUpcomingItemCalendar"] = calendar
+    return Action("is.workflow.actions.getupcomingevents", params), action_uuid
+
+
+# Find actions filter on content item properties. Operators and date units
+# are the codes Shortcuts stores in WFActionParameterFilterTemplates.
+FILTER_OPERATORS = {
+    "is": 4,
+    "is not": 5,
+    "contains": 99,
+    "is in the last": 1001,
+    "is in the next": 1002,
+}
+DATE_UNITS = {"hours": 32, "days": 16, "weeks": 8192}  # NSCalendarUnit
+
+
+def content_filter(property_name: str, operator: str, **values: Any) -> dict:
+    """
+    One condition of a Find action's filter. values are keyed by kind:
+    Enumeration, String, Number, Unit. Example:
+        content_filter("Calendar", "is", Enumeration="Work")
+    """
     return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.getupcomingevents",
-        "WFWorkflowActionParameters": params,
-    }, action_uuid
+        "Operator": FILTER_OPERATORS[operator],
+        "Property": property_name,
+        "Removable": True,
+        "Values": values,
+    }
+
+
+def calendar_is(calendar: str = None, calendar_var: str = None) -> dict:
+    """Filter condition: the event is in a calendar (or the calendar_var one)"""
+    value = variable_ref(calendar_var) if calendar_var else calendar
+    return content_filter("Calendar", "is", Enumeration=value)
+
+
+def starts_within(number: int, unit: str = "days") -> dict:
+    """Filter condition: the event starts between now and `number` units ahead"""
+    return content_filter(
+        "Start Date", "is in the next", Number=number, Unit=DATE_UNITS[unit]
+    )
+
+
+def find_calendar_events(
+    filters: list[dict],
+    match_all: bool = True,
+    sort_by: str = None,
+    order: str = "Oldest First",
+    limit: int = None,
+) -> tuple[Action, str]:
+    """
+    Find Calendar Events matching all (or any) of `filters`, optionally
+    sorted ("Oldest First"/"Latest First") and limited. Returns (action, uuid).
+    """
+    action_uuid = new_uuid()
+    params = {
+        "UUID": action_uuid,
+        "WFContentItemFilter": {
+            "Value": {
+                "WFActionParameterFilterPrefix": 1 if match_all else 0,
+                "WFActionParameterFilterTemplates": filters,
+                "WFContentPredicateBoundedDate": False,
+            },
+            "WFSerializationType": "WFContentPredicateTableTemplate",
+        },
+    }
+    if sort_by:
+        params["WFContentItemSortProperty"] = sort_by
+        params["WFContentItemSortOrder"] = order
+    if limit is not None:
+        params["WFContentItemLimitEnabled"] = True
+        params["WFContentItemLimitNumber"] = limit
+    return Action("is.workflow.actions.filter.calendarevents", params), action_uuid
 
 
 def add_calendar_event(
@@ -826,7 +1274,7 @@ def add_calendar_event(
     calendar: str = None,
     all_day: bool = False,
     notes: str = None,
-) -> dict:
+) -> Action:
     """Add a new calendar event"""
     params = {"WFCalendarItemTitle": title}
     if calendar:
@@ -839,10 +1287,7 @@ def add_calendar_event(
         params["WFCalendarItemAllDay"] = True
     if notes:
         params["WFCalendarItemNotes"] = notes
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.addnewevent",
-        "WFWorkflowActionParameters": params,
-    }
+    return Action("is.workflow.actions.addnewevent", params)
 
 
 # =============================================================================
@@ -852,7 +1297,7 @@ def add_calendar_event(
 
 def add_reminder(
     title: str, remind_date: str = None, list_name: str = None, notes: str = None
-) -> dict:
+) -> Action:
     """Add a new reminder"""
     params: dict[str, Any] = {"WFCalendarItemTitle": title}
     if list_name:
@@ -862,10 +1307,7 @@ def add_reminder(
         params["WFAlertCustomTime"] = remind_date
     if notes:
         params["WFCalendarItemNotes"] = notes
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.addnewreminder",
-        "WFWorkflowActionParameters": params,
-    }
+    return Action("is.workflow.actions.addnewreminder", params)
 
 
 def add_calendar_event_from_variables(
@@ -874,152 +1316,64 @@ def add_calendar_event_from_variables(
     end_date_var: str = None,
     location_var: str = None,
     notes_var: str = None,
-) -> dict:
+) -> Action:
     """Add calendar event using variable values"""
-    placeholder = "￼"
-
-    params = {
-        "WFCalendarItemTitle": {
-            "Value": {
-                "attachmentsByRange": {
-                    "{0, 1}": {"Type": "Variable", "VariableName": title_var}
-                },
-                "string": placeholder,
-            },
-            "WFSerializationType": "WFTextTokenString",
-        }
-    }
+    params = {"WFCalendarItemTitle": token_string("", title_var)}
 
     if start_date_var:
-        params["WFCalendarItemStartDate"] = {
-            "Value": {
-                "attachmentsByRange": {
-                    "{0, 1}": {"Type": "Variable", "VariableName": start_date_var}
-                },
-                "string": placeholder,
-            },
-            "WFSerializationType": "WFTextTokenString",
-        }
+        params["WFCalendarItemStartDate"] = token_string("", start_date_var)
 
     if location_var:
-        params["WFCalendarItemLocation"] = {
-            "Value": {
-                "attachmentsByRange": {
-                    "{0, 1}": {"Type": "Variable", "VariableName": location_var}
-                },
-                "string": placeholder,
-            },
-            "WFSerializationType": "WFTextTokenString",
-        }
+        params["WFCalendarItemLocation"] = token_string("", location_var)
 
     if notes_var:
-        params["WFCalendarItemNotes"] = {
-            "Value": {
-                "attachmentsByRange": {
-                    "{0, 1}": {"Type": "Variable", "VariableName": notes_var}
-                },
-                "string": placeholder,
-            },
-            "WFSerializationType": "WFTextTokenString",
-        }
+        params["WFCalendarItemNotes"] = token_string("", notes_var)
 
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.addnewevent",
-        "WFWorkflowActionParameters": params,
-    }
+    return Action("is.workflow.actions.addnewevent", params)
 
 
 def add_reminder_from_variable(
     title_var: str,
     remind_date_var: str = None,
     notes_var: str = None,
-) -> dict:
+) -> Action:
     """Add reminder using variable values"""
-    placeholder = "￼"
-
-    params = {
-        "WFCalendarItemTitle": {
-            "Value": {
-                "attachmentsByRange": {
-                    "{0, 1}": {"Type": "Variable", "VariableName": title_var}
-                },
-                "string": placeholder,
-            },
-            "WFSerializationType": "WFTextTokenString",
-        }
-    }
+    params = {"WFCalendarItemTitle": token_string("", title_var)}
 
     if remind_date_var:
         params["WFAlertEnabled"] = True
-        params["WFAlertCustomTime"] = {
-            "Value": {
-                "attachmentsByRange": {
-                    "{0, 1}": {"Type": "Variable", "VariableName": remind_date_var}
-                },
-                "string": placeholder,
-            },
-            "WFSerializationType": "WFTextTokenString",
-        }
+        params["WFAlertCustomTime"] = token_string("", remind_date_var)
 
     if notes_var:
-        params["WFCalendarItemNotes"] = {
-            "Value": {
-                "attachmentsByRange": {
-                    "{0, 1}": {"Type": "Variable", "VariableName": notes_var}
-                },
-                "string": placeholder,
-            },
-            "WFSerializationType": "WFTextTokenString",
-        }
+        params["WFCalendarItemNotes"] = token_string("", notes_var)
 
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.addnewreminder",
-        "WFWorkflowActionParameters": params,
-    }
+    return Action("is.workflow.actions.addnewreminder", params)
 
 
-def share_variable(variable_name: str) -> dict:
+def share_variable(variable_name: str) -> Action:
     """Open share sheet for a variable"""
-    placeholder = "￼"
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.share",
-        "WFWorkflowActionParameters": {
-            "WFInput": {
-                "Value": {
-                    "attachmentsByRange": {
-                        "{0, 1}": {"Type": "Variable", "VariableName": variable_name}
-                    },
-                    "string": placeholder,
-                },
-                "WFSerializationType": "WFTextTokenString",
-            }
+    return Action(
+        "is.workflow.actions.share",
+        {
+            "WFInput": token_string("", variable_name),
         },
-    }
+    )
 
 
 def menu_start_with_variable_prompt(
     items: list[str], prompt_var: str
-) -> tuple[dict, str]:
+) -> tuple[Action, str]:
     """Start a menu with prompt from a variable. Returns (action, group_id)."""
     group_id = new_uuid()
-    placeholder = "￼"
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.choosefrommenu",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.choosefrommenu",
+        {
             "GroupingIdentifier": group_id,
             "WFControlFlowMode": 0,
             "WFMenuItems": items,
-            "WFMenuPrompt": {
-                "Value": {
-                    "attachmentsByRange": {
-                        "{0, 1}": {"Type": "Variable", "VariableName": prompt_var}
-                    },
-                    "string": placeholder,
-                },
-                "WFSerializationType": "WFTextTokenString",
-            },
+            "WFMenuPrompt": token_string("", prompt_var),
         },
-    }, group_id
+    ), group_id
 
 
 # =============================================================================
@@ -1027,157 +1381,188 @@ def menu_start_with_variable_prompt(
 # =============================================================================
 
 
-def variable_ref(name: str) -> dict:
-    """Create a variable reference for use in parameters"""
-    return {
-        "Value": {"VariableName": name, "Type": "Variable"},
-        "WFSerializationType": "WFTextTokenAttachment",
-    }
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def variable_ref(name: str, as_type: str = None) -> VariableRef:
+    """
+    Create a variable reference for use in parameters. "name.key" reads a
+    dictionary value; as_type coerces the result (see COERCION_CLASSES).
+    """
+    return VariableRef(name, as_type)
 
 
-def action_output_ref(output_uuid: str, output_name: str) -> dict:
-    """Create a reference to a previous action's output"""
-    return {
-        "Value": {
-            "OutputName": output_name,
-            "OutputUUID": output_uuid,
-            "Type": "ActionOutput",
-        },
-        "WFSerializationType": "WFTextTokenAttachment",
-    }
+def action_output_ref(
+    output_uuid: str, output_name: str, key: str = None, as_type: str = None
+) -> OutputRef:
+    """
+    Create a reference to a previous action's output, optionally its value
+    for a dictionary key and/or coerced to a type (see COERCION_CLASSES)
+    """
+    return OutputRef(output_uuid, output_name, aggrandizements(key, as_type))
 
 
-def run_shortcut(name: str, show_while_running: bool = False) -> dict:
+def run_shortcut(name: str, show_while_running: bool = False) -> Action:
     """Run another shortcut"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.runworkflow",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.runworkflow",
+        {
             "WFWorkflowName": name,
             "WFShowWorkflow": show_while_running,
         },
-    }
+    )
 
 
-def exit_shortcut() -> dict:
+def exit_shortcut() -> Action:
     """Exit/stop the shortcut"""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.exit",
-        "WFWorkflowActionParameters": {},
-    }
+    return Action("is.workflow.actions.exit", {})
 
 
 def choose_from_list(
-    prompt: str = None, select_multiple: bool = False
-) -> tuple[dict, str]:
-    """Choose from a list. Returns (action, uuid)."""
+    prompt: str = None, select_multiple: bool = False, input_var: str = None
+) -> tuple[Action, str]:
+    """
+    Choose from a list (the input, or the input_var variable). A dictionary
+    lists its keys and gives the chosen values. Returns (action, uuid).
+    """
     action_uuid = new_uuid()
     params = {"UUID": action_uuid}
+    if input_var:
+        params["WFInput"] = variable_ref(input_var)
     if prompt:
         params["WFChooseFromListActionPrompt"] = prompt
     if select_multiple:
         params["WFChooseFromListActionSelectMultiple"] = True
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.choosefromlist",
-        "WFWorkflowActionParameters": params,
-    }, action_uuid
+    return Action("is.workflow.actions.choosefromlist", params), action_uuid
 
 
-def get_text_from_input() -> tuple[dict, str]:
+def get_text_from_input() -> tuple[Action, str]:
     """Get text from previous action. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.detect.text",
-        "WFWorkflowActionParameters": {"UUID": action_uuid},
-    }, action_uuid
+    return Action("is.workflow.actions.detect.text", {"UUID": action_uuid}), action_uuid
 
 
-def get_dictionary_from_input() -> tuple[dict, str]:
+def get_dictionary_from_input() -> tuple[Action, str]:
     """Parse JSON/dictionary from input. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.detect.dictionary",
-        "WFWorkflowActionParameters": {"UUID": action_uuid},
-    }, action_uuid
+    return Action(
+        "is.workflow.actions.detect.dictionary", {"UUID": action_uuid}
+    ), action_uuid
 
 
-def list_action(items: list[str]) -> tuple[dict, str]:
+def list_action(items: list[str]) -> tuple[Action, str]:
     """Create a list. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.list",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.list",
+        {
             "UUID": action_uuid,
             "WFItems": items,
         },
-    }, action_uuid
+    ), action_uuid
 
 
-def repeat_with_each(input_variable: str) -> tuple[dict, str]:
+def repeat_with_each(input_variable: str) -> tuple[Action, str]:
     """Start a repeat with each loop. Returns (action, grouping_id)."""
     grouping_id = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.repeat.each",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.repeat.each",
+        {
             "GroupingIdentifier": grouping_id,
             "WFControlFlowMode": 0,  # Start
-            "WFInput": {
-                "Value": {"VariableName": input_variable, "Type": "Variable"},
-                "WFSerializationType": "WFTextTokenAttachment",
-            },
+            "WFInput": variable_ref(input_variable),
         },
-    }, grouping_id
+    ), grouping_id
 
 
-def end_repeat(grouping_id: str) -> dict:
+def end_repeat(grouping_id: str) -> Action:
     """End a repeat loop."""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.repeat.each",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.repeat.each",
+        {
             "GroupingIdentifier": grouping_id,
             "WFControlFlowMode": 2,  # End
         },
-    }
+    )
 
 
-def add_to_variable(variable_name: str) -> dict:
+def add_to_variable(variable_name: str) -> Action:
     """Add input to a variable (appends to list)."""
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.appendvariable",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.appendvariable",
+        {
             "WFVariableName": variable_name,
         },
-    }
+    )
 
 
-def get_current_date() -> tuple[dict, str]:
+def get_current_date() -> tuple[Action, str]:
     """Get current date/time. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.date",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.date",
+        {
             "UUID": action_uuid,
             "WFDateActionMode": "Current Date",
         },
-    }, action_uuid
+    ), action_uuid
+
+
+def format_date(date_format: str) -> tuple[Action, str]:
+    """
+    Format the input date with a custom (Unicode) format, e.g.
+    "YYYY-'W'ww" for the ISO week. Returns (action, uuid).
+    """
+    action_uuid = new_uuid()
+    return Action(
+        "is.workflow.actions.format.date",
+        {
+            "UUID": action_uuid,
+            "WFDateFormatStyle": "Custom",
+            "WFDateFormat": date_format,
+        },
+    ), action_uuid
 
 
-def get_current_location() -> tuple[dict, str]:
+def count_items() -> tuple[Action, str]:
+    """Count the items of the input. Returns (action, uuid)."""
+    action_uuid = new_uuid()
+    return Action(
+        "is.workflow.actions.count",
+        {
+            "UUID": action_uuid,
+            "WFCountType": "Items",
+        },
+    ), action_uuid
+
+
+def get_current_location() -> tuple[Action, str]:
     """Get current device location. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.getcurrentlocation",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.getcurrentlocation",
+        {
             "UUID": action_uuid,
         },
-    }, action_uuid
+    ), action_uuid
 
 
-def get_street_address() -> tuple[dict, str]:
+def get_street_address() -> tuple[Action, str]:
     """Get street address from location input. Returns (action, uuid)."""
     action_uuid = new_uuid()
-    return {
-        "WFWorkflowActionIdentifier": "is.workflow.actions.getaddressfromlocation",
-        "WFWorkflowActionParameters": {
+    return Action(
+        "is.workflow.actions.getaddressfromlocation",
+        {
+            "UUID": action_uuid,
+        },
+    ), action_uuid
+
+
+def generate_hash(hash_type: str = "SHA256") -> tuple[Action, str]:
+    """Hash of the input (hex). Returns (action, uuid)."""
+    action_uuid = new_uuid()
+    return Action(
+        "is.workflow.actions.hash",
+        {
             "UUID": action_uuid,
+            "WFHashType": hash_type,
         },
-    }, action_uuid
+    ), action_uuid
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Signing with a content-addressed cache
+
+Signing goes through a pluggable Signer backend:
+
+- CLISigner runs Apple's `shortcuts sign` (macOS only)
+- LocalSigner wraps the plist in an unsigned AEA1 container (see aea.wrap),
+  a stand-in that lets the rest of the pipeline run on Linux
+
+Signed outputs are cached on disk under the canonical hash of the unsigned
+plist (see canonical.py) plus the signer's key, so a shortcut that is
+unchanged up to UUIDs reuses its previous signed file. Only cache misses
+are signed, on a bounded pool of threads (the work happens in the signer's
+subprocess, so threads are enough).
+
+Usage:
+    python builder/signing.py shortcuts/Pencil-Me-In.shortcut
+    python builder/signing.py shortcuts/*.shortcut --jobs 4
+    python builder/signing.py shortcuts/AI-Test.shortcut --signer local
+"""
+
+import argparse
+import hashlib
+import os
+import plistlib
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from aea import MAGIC, wrap
+from canonical import shortcut_hash
+from pencil_build import CACHE_DIR, _atomic_write, _prune_cache
+
+SIGN_CACHE_DIR = os.path.join(CACHE_DIR, "signed")
+SIGN_CACHE_MAX_ARTIFACTS = 256
+DEFAULT_JOBS = 4
+
+
+class SigningError(RuntimeError):
+    """A signer failed or produced no signed file"""
+
+
+class SignResult(NamedTuple):
+    input: str
+    output: str
+    status: str  # "signed", "cached" or "failed"
+    error: str = None
+
+
+# =============================================================================
+# Signers
+# =============================================================================
+
+
+class Signer:
+    """Signs one unsigned .shortcut file into a signed one"""
+
+    name = "signer"
+
+    @property
+    def key(self) -> str:
+        """Everything besides the input that changes the signed bytes"""
+        return self.name
+
+    def sign(self, input_path: str, output_path: str):
+        raise NotImplementedError
+
+
+class CLISigner(Signer):
+    """Apple's `shortcuts sign`"""
+
+    name = "shortcuts"
+
+    def __init__(
+        self,
+        mode: str = "people-who-know-me",
+        cli: str = "/usr/bin/shortcuts",
+        timeout: float = 120,
+    ):
+        self.mode = mode
+        self.cli = cli
+        self.timeout = timeout
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.mode}"
+
+    def sign(self, input_path: str, output_path: str):
+        if not os.path.exists(self.cli):
+            raise SigningError(f"{self.cli} not found (signing needs macOS)")
+        cmd = [self.cli, "sign", "--mode", self.mode]
+        cmd += ["--input", input_path, "--output", output_path]
+        try:
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired:
+            raise SigningError(
+                f"shortcuts sign timed out after {self.timeout} s"
+            ) from None
+        # The CLI logs attribute string warnings as ERROR, so check the output
+        if not _is_signed(output_path):
+            raise SigningError(
+                f"shortcuts sign failed: {result.stderr.strip() or result.stdout}"
+            )
+
+
+class LocalSigner(Signer):
+    """Unsigned AEA1 container, for running the pipeline off macOS"""
+
+    name = "local"
+
+    def sign(self, input_path: str, output_path: str):
+        with open(input_path, "rb") as f:
+            data = f.read()
+        auth_data = {"SigningCertificateChain": [], "SignedBy": self.name}
+        _atomic_write(output_path, wrap(data, auth_data))
+
+
+SIGNERS = {"shortcuts": CLISigner, "local": LocalSigner}
+
+
+def _is_signed(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == MAGIC
+    except OSError:
+        return False
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+
+def cache_key(input_path: str, signer: Signer) -> str:
+    """Signer key plus the canonical hash of the unsigned plist"""
+    with open(input_path, "rb") as f:
+        content = shortcut_hash(plistlib.load(f))
+    return hashlib.sha256(f"{signer.key}\0{content}".encode()).hexdigest()
+
+
+def signed_path(input_path: str) -> str:
+    """Where the signed file goes: Foo.shortcut -> Foo-signed.shortcut"""
+    root, ext = os.path.splitext(input_path)
+    return f"{root}-signed{ext or '.shortcut'}"
+
+
+def _sign_artifact(input_path: str, artifact: str, signer: Signer) -> str:
+    """Sign into the cache. Returns an error message, or None."""
+    tmp_path = f"{artifact}.tmp{os.getpid()}.{threading.get_ident()}"
+    try:
+        signer.sign(input_path, tmp_path)
+        if not _is_signed(tmp_path):
+            raise SigningError(f"{signer.name} produced no signed file")
+        os.replace(tmp_path, artifact)
+    except (OSError, SigningError) as e:
+        return str(e)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return None
+
+
+def sign_many(
+    pairs: list[tuple[str, str]],
+    signer: Signer = None,
+    cache_dir: str = SIGN_CACHE_DIR,
+    jobs: int = DEFAULT_JOBS,
+) -> list[SignResult]:
+    """
+    Sign (input, output) pairs, reusing cached signed files for inputs equal
+    up to UUIDs to one signed before. Each distinct miss is signed once, on
+    up to `jobs` threads. Results are in input order; failures are reported,
+    not raised.
+    """
+    signer = signer or CLISigner()
+    os.makedirs(cache_dir, exist_ok=True)
+    if len({output for _, output in pairs}) != len(pairs):
+        raise ValueError("outputs must be unique")
+
+    keys = {}
+    errors = {}
+    for input_path, _ in pairs:
+        try:
+            keys[input_path] = cache_key(input_path, signer)
+        except (OSError, ValueError) as e:
+            errors[input_path] = f"Unreadable: {e}"
+
+    def artifact(key: str) -> str:
+        return os.path.join(cache_dir, f"{key}.shortcut")
+
+    misses = {}  # key -> first input with that key
+    for input_path, key in keys.items():
+        if not _is_signed(artifact(key)):
+            misses.setdefault(key, input_path)
+    work = [(path, artifact(key), signer) for key, path in misses.items()]
+    if jobs <= 1 or len(work) < 2:
+        failures = [_sign_artifact(*item) for item in work]
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            failures = list(pool.map(lambda item: _sign_artifact(*item), work))
+    failed_keys = {key: e for key, e in zip(misses, failures) if e}
+
+    results = []
+    for input_path, output_path in pairs:
+        key = keys.get(input_path)
+        error = errors.get(input_path) or failed_keys.get(key)
+        if error is None:
+            try:
+                os.utime(artifact(key))  # mark as recently used for pruning
+                tmp_path = f"{output_path}.tmp{os.getpid()}"
+                shutil.copyfile(artifact(key), tmp_path)
+                os.replace(tmp_path, output_path)
+            except OSError as e:
+                error = str(e)
+        if error is not None:
+            results.append(SignResult(input_path, output_path, "failed", error))
+        else:
+            status = "signed" if misses.get(key) == input_path else "cached"
+            results.append(SignResult(input_path, output_path, status))
+    _prune_cache(cache_dir, SIGN_CACHE_MAX_ARTIFACTS)
+    return results
+
+
+def sign_file(
+    input_path: str,
+    output_path: str = None,
+    signer: Signer = None,
+    cache_dir: str = SIGN_CACHE_DIR,
+) -> SignResult:
+    """Sign one file (default output: signed_path(input_path))"""
+    pair = (input_path, output_path or signed_path(input_path))
+    return sign_many([pair], signer, cache_dir, jobs=1)[0]
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sign shortcuts, with caching")
+    parser.add_argument("paths", nargs="+", help="Unsigned .shortcut files")
+    parser.add_argument("--signer", choices=SIGNERS, default="shortcuts")
+    parser.add_argument("--mode", default="people-who-know-me", help="shortcuts sign")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS)
+    parser.add_argument("--cache-dir", default=SIGN_CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    signer = CLISigner(args.mode) if args.signer == "shortcuts" else LocalSigner()
+    paths = [p for p in args.paths if not p.endswith("-signed.shortcut")]
+    start = time.perf_counter()
+    results = sign_many(
+        [(p, signed_path(p)) for p in paths], signer, args.cache_dir, args.jobs
+    )
+    for result in results:
+        if result.status == "failed":
+            print(f"✗ {result.input}: {result.error}")
+        else:
+            print(f"✓ {result.output} ({result.status})")
+    failed = sum(result.status == "failed" for result in results)
+    cached = sum(result.status == "cached" for result in results)
+    print(
+        f"{len(results) - failed} signed ({cached} from cache) in "
+        f"{time.perf_counter() - start:.1f} s, {failed} failed"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for the signed shortcut (AEA1) reader
+"""
+
+import contextlib
+import glob
+import io
+import json
+import os
+import plistlib
+import struct
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+from aea import AEAError, archive_entries, lzfse_decompress, main, read_signed
+from validator import validate_file
+
+# Shortcuts signed by Apple, next to the unsigned plists they were signed from
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+SIGNED = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*-signed.shortcut")))
+
+
+def identifiers(shortcut: dict) -> list[str]:
+    return [a["WFWorkflowActionIdentifier"] for a in shortcut["WFWorkflowActions"]]
+
+
+def test_signed_shortcuts_hold_their_workflow():
+    """Test every signed shortcut decodes to its unsigned counterpart's actions"""
+    assert SIGNED
+    for path in SIGNED:
+        signed = read_signed(path)
+        with open(path.replace("-signed.shortcut", ".shortcut"), "rb") as f:
+            unsigned = plistlib.load(f)
+
+        assert signed.profile == 0
+        assert signed.root.compression == "e"
+        assert len(signed.payload) == signed.root.raw_size
+        assert len(signed.certificates) == 3
+        assert signed.signature.startswith(b"\x30")
+        assert identifiers(signed.workflow) == identifiers(unsigned)
+        assert validate_file(path) == (path, [])
+    print("✓ Signed shortcuts hold their workflow")
+
+
+def test_corruption_is_detected():
+    """Test checksums, truncation and the LZFSE block types"""
+    with open(SIGNED[0], "rb") as f:
+        data = bytearray(f.read())
+    segment = read_signed(bytes(data)).segments[0]
+
+    flipped = bytearray(data)
+    flipped[segment.offset + segment.size - 20] ^= 0xFF
+    for broken in (bytes(flipped), bytes(data[:-100]), b"AEA1", b"bplist00"):
+        try:
+            read_signed(broken)
+        except AEAError:
+            continue
+        raise AssertionError("corrupt file was accepted")
+
+    # Uncompressed and LZVN blocks (literals, then a repeating match)
+    stored = b"bvx-" + struct.pack("<I", 5) + b"hello" + b"bvx$"
+    assert lzfse_decompress(stored) == b"hello"
+    lzvn = b"\xe3abc" + b"\x30\x03" + b"\x06" + b"\0" * 7
+    block = b"bvxn" + struct.pack("<II", 12, len(lzvn)) + lzvn
+    assert lzfse_decompress(block + b"bvx$") == b"abc" * 4
+
+    entries = archive_entries(read_signed(bytes(data)).payload)
+    assert list(entries) == ["Shortcut.wflow"]
+    print("✓ Corruption is detected")
+
+
+def test_cli():
+    """Test the parallel JSON report and --extract"""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        assert main([FIXTURES_DIR, "--json", "--jobs", "2"]) == 0
+    report = json.loads(out.getvalue())
+    assert report["checked"] == len(SIGNED)
+    assert report["invalid"] == 0
+    assert all(r["chain"][-1] == "Apple Root CA - G3" for r in report["results"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "unsigned.shortcut")
+        assert main([SIGNED[0], "--extract", path]) == 0
+        with open(path, "rb") as f:
+            assert plistlib.load(f) == read_signed(SIGNED[0]).workflow
+    print("✓ CLI")
+
+
+if __name__ == "__main__":
+    print("Running AEA reader tests...\n")
+
+    test_signed_shortcuts_hold_their_workflow()
+    test_corruption_is_detected()
+    test_cli()
+
+    print("\n✅ All tests passed!")
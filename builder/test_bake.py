@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for config-baked builds
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from bake import bake_config
+from interpreter import Interpreter, Stubs
+from shortcut_builder import DATE_UNITS, literal, to_plist
+
+CONFIG = {
+    "location": "Springfield",
+    "sources": [{"name": "Library", "url": "https://library.example"}],
+    "kids": [{"name": "Lisa", "age": 8}],
+    "calendars_to_check": ["Family"],
+    "preferences": {"advance_ticket_weeks": 4},
+}
+
+
+def test_literals():
+    """Test that literal() actions output the JSON values"""
+    for value in ["Zürich 😀", 3, [1, "a"], {"n": 1, "s": "x", "l": [2]}]:
+        action, _ = literal(value)
+        output = Interpreter().run(to_plist([action])).output
+        if isinstance(value, dict):
+            assert output == {"n": 1, "s": "x", "l": "[2]"}, output
+        elif isinstance(value, list):
+            assert output == ["1", "a"], output
+        else:
+            assert output == str(value), output
+    print("✓ Literals")
+
+
+def test_baked_execute_shortcut():
+    """Test that a baked shortcut uses its values until the config changes"""
+    from build_execute import CONFIG_PATH, build_execute_shortcut
+
+    data = json.dumps(CONFIG).encode()
+    baked = bake_config(data, "config.json")
+    actions = to_plist(build_execute_shortcut(baked)["WFWorkflowActions"])
+    unbaked = to_plist(build_execute_shortcut()["WFWorkflowActions"])
+    hashes = str(actions).count("is.workflow.actions.hash")
+    # The config's hash, then the cache keys of its batch and source fallback
+    assert hashes == str(unbaked).count("is.workflow.actions.hash") + 3
+    assert "{{" not in str(actions) + str(unbaked), "placeholders are tokens"
+
+    # Run the configuration prologue, up to the calendar fetch
+    end = next(
+        i
+        for i, action in enumerate(actions)
+        if "Get Calendar Events"
+        in action["WFWorkflowActionParameters"].get("WFCommentActionText", "")
+    )
+
+    # Busy times cover the household's advance ticket window
+    def window(actions: list) -> dict:
+        find = next(
+            action["WFWorkflowActionParameters"]
+            for action in actions
+            if action["WFWorkflowActionIdentifier"]
+            == "is.workflow.actions.filter.calendarevents"
+        )
+        templates = find["WFContentItemFilter"]["Value"]
+        return templates["WFActionParameterFilterTemplates"][1]["Values"]
+
+    assert window(actions) == {"Number": 4, "Unit": DATE_UNITS["weeks"]}
+    assert window(unbaked) == {"Number": 12, "Unit": DATE_UNITS["weeks"]}
+
+    def prologue(contents: str):
+        stubs = Stubs(files={CONFIG_PATH: contents})
+        return Interpreter(stubs).run(actions[:end])
+
+    fresh = prologue(data.decode())
+    assert fresh.variables["location"] == "Springfield"
+    assert fresh.variables["kids"] == [json.dumps(CONFIG["kids"][0])]
+    assert fresh.variables["calendars_to_check"] == ["Family"]
+
+    stale = prologue(json.dumps(dict(CONFIG, location="Shelbyville")))
+    assert stale.variables["location"] == "Shelbyville", "edited config is loaded"
+    assert stale.variables["kids"] == CONFIG["kids"]
+    assert fresh.steps < stale.steps
+
+    try:
+        bake_config(b"[]")
+        raise AssertionError("non-object config accepted")
+    except ValueError:
+        pass
+    print("✓ Baked execute shortcut")
+
+
+if __name__ == "__main__":
+    print("Running config baking tests...\n")
+
+    test_literals()
+    test_baked_execute_shortcut()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for source batching
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from bake import bake_config
+from batching import RESPONSE_TOKENS, estimate_tokens, pack_sources, source_key
+from interpreter import Interpreter, Stubs
+
+SOURCES = [
+    {"name": "Library", "url": "https://library.example"},
+    {"name": "Parks", "url": "https://parks.example"},
+    {"name": "Zoo", "url": "https://zoo.example", "enabled": False},
+    {"name": "St. Mary's", "url": "https://stmarys.example"},
+]
+
+CONFIG = {
+    "location": "Springfield",
+    "sources": SOURCES,
+    "kids": [],
+    "calendars_to_check": ["Family"],
+    "preferences": {"batch_tokens": 2 * RESPONSE_TOKENS + 100},
+}
+
+
+def test_pack_sources():
+    """Test packing in order, disabled sources and oversized sources"""
+    assert source_key(SOURCES[3], 2) == "2 St Mary's", "no key paths"
+    assert estimate_tokens(SOURCES[0]) > RESPONSE_TOKENS
+
+    budget = CONFIG["preferences"]["batch_tokens"]
+    assert pack_sources(SOURCES, budget) == [SOURCES[:2], SOURCES[3:]]
+    assert pack_sources(SOURCES, 10**6) == [[SOURCES[0], SOURCES[1], SOURCES[3]]]
+    assert pack_sources(SOURCES, 1) == [[s] for s in SOURCES if s is not SOURCES[2]]
+    assert pack_sources([], budget) == []
+    try:
+        pack_sources(SOURCES, 0)
+        raise AssertionError("zero budget accepted")
+    except ValueError:
+        pass
+    print("✓ Pack sources")
+
+
+def listed_sources(prompt: str) -> list[dict]:
+    """The sources a batch prompt lists, with their keys"""
+    return json.loads(prompt.split("sources:\n", 1)[1].split("\n\n", 1)[0])
+
+
+def run(shortcut: dict, files: dict, chatgpt, now: datetime) -> Stubs:
+    stubs = Stubs(files=files, chatgpt=chatgpt, menu=["Done"], now=now)
+    Interpreter(stubs).run(shortcut)
+    return stubs
+
+
+def test_baked_execute_shortcut_batches():
+    """Test batched fetches, the fallback for a missing source and the cache"""
+    from build_execute import CONFIG_PATH, build_execute_shortcut
+
+    data = json.dumps(CONFIG)
+    shortcut = build_execute_shortcut(bake_config(data.encode(), "config.json"))
+
+    def chatgpt(prompt: str) -> str:
+        if "each of these sources" not in prompt:
+            return '[{"title": "Parks event"}]' if "parks" in prompt else "[]"
+        return json.dumps(
+            {
+                s["key"]: {"events": [{"title": f"{s['name']} event"}]}
+                for s in listed_sources(prompt)
+                if s["name"] != "Parks"
+            }
+        )
+
+    cold = run(shortcut, {CONFIG_PATH: data}, chatgpt, datetime(2025, 1, 1, 9))
+    batches = [p for p in cold.prompts if "each of these sources" in p]
+    assert len(batches) == 2
+    assert "zoo.example" not in "".join(batches), "disabled sources are skipped"
+    fallbacks = [p for p in cold.prompts[:-1] if p not in batches]
+    assert len(fallbacks) == 1 and "parks.example" in fallbacks[0]
+    assert len(cold.prompts) == 4, "two batches, the fallback, then the digest"
+    for name in ["Library", "Parks", "St. Mary's"]:
+        assert f"{name} event" in cold.prompts[-1], f"the digest sees {name}"
+
+    warm = run(shortcut, dict(cold.files), chatgpt, datetime(2025, 1, 3, 9))
+    assert len(warm.prompts) == 1, "only the digest"
+    assert warm.prompts[-1] == cold.prompts[-1], "the same events, from the cache"
+
+    # An edited config is fetched source by source, reusing the fallback's
+    # cached answer for Parks
+    stale_files = dict(cold.files, **{CONFIG_PATH: data + "\n"})
+    stale = run(shortcut, stale_files, chatgpt, datetime(2025, 1, 3))
+    assert not any(p in batches for p in stale.prompts)
+    assert len(stale.prompts) == len(SOURCES), "all sources but Parks, then the digest"
+    assert "Parks event" in stale.prompts[-1]
+    print("✓ Baked execute shortcut batches")
+
+
+def test_same_named_sources_keep_their_events():
+    """Test that sources named alike get their own entries in a batch answer"""
+    from build_execute import CONFIG_PATH, build_execute_shortcut
+
+    sources = [
+        {"name": "Library", "url": "https://north.example"},
+        {"name": "Library", "url": "https://south.example"},
+        {"name": "St. Mary", "url": "https://stmary.example"},
+        {"name": "St Mary", "url": "https://stmary2.example"},
+    ]
+    data = json.dumps(dict(CONFIG, sources=sources, preferences={}))
+    shortcut = build_execute_shortcut(bake_config(data.encode(), "config.json"))
+
+    def chatgpt(prompt: str) -> str:
+        if "each of these sources" not in prompt:
+            return "[]"
+        listed = listed_sources(prompt)
+        assert len({s["key"] for s in listed}) == len(sources), "unique keys"
+        return json.dumps(
+            {s["key"]: {"events": [{"title": f"{s['url']} event"}]} for s in listed}
+        )
+
+    stubs = run(shortcut, {CONFIG_PATH: data}, chatgpt, datetime(2025, 1, 1, 9))
+    assert len(stubs.prompts) == 2, "one batch, then the digest"
+    for source in sources:
+        event = f"{source['url']} event"
+        assert stubs.prompts[-1].count(event) == 1, f"{event} once, to its source"
+    print("✓ Same-named sources keep their events")
+
+
+if __name__ == "__main__":
+    print("Running source batching tests...\n")
+
+    test_pack_sources()
+    test_baked_execute_shortcut_batches()
+    test_same_named_sources_keep_their_events()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark suite
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+from bench import (
+    MEMORY_CASES,
+    TOKEN_BUILDERS,
+    Regression,
+    Result,
+    cases,
+    compare,
+    main,
+    run,
+    synthetic_shortcut,
+)
+from validator import validate_shortcut_structure
+
+
+def test_cases_cover_hot_paths():
+    """Test every hot path has a case per size, on valid synthetic shortcuts"""
+    shortcut = synthetic_shortcut(1000)
+    assert len(shortcut["WFWorkflowActions"]) == 1000
+    assert validate_shortcut_structure(shortcut) == []
+
+    names = set(cases((10, 20)))
+    for build in ("execute", "main", "setup"):
+        assert f"build_{build}_shortcut" in names
+    for size in (10, 20):
+        assert f"save_shortcut[{size}]" in names
+        assert f"validate_shortcut_structure[{size}]" in names
+        assert all(f"{name}[{size}]" in names for name in TOKEN_BUILDERS)
+
+    selected = {k: v for k, v in cases((10,)).items() if k.endswith("[10]")}
+    results = run(selected, rounds=1)
+    assert results.keys() == selected.keys()
+    assert all(r.seconds > 0 and r.loops >= 1 for r in results.values())
+    print("✓ Cases cover the hot paths")
+
+
+def test_build_cases_measure_memory():
+    """Test build cases record memory, and IR nodes hold less than plist dicts"""
+    assert MEMORY_CASES <= set(cases(()))
+    selected = {k: v for k, v in cases(()).items() if "execute" in k}
+    results = run(selected, rounds=1)
+    assert all(r.peak >= r.retained > 0 for r in results.values())
+    ir, plist = (results[f"build_execute_shortcut_{form}"] for form in ("ir", "plist"))
+    assert ir.retained < plist.retained / 2, (ir.retained, plist.retained)
+    print("✓ Build cases measure memory")
+
+
+def test_compare_flags_regressions():
+    """Test only cases beyond the threshold are flagged"""
+    baseline = {
+        "results": {
+            "fast": {"seconds": 1.0},
+            "slow": {"seconds": 1.0},
+            "dropped": {"seconds": 1.0},
+        }
+    }
+    results = {
+        "fast": Result(1.2, 1.2, 1, 1),
+        "slow": Result(1.3, 1.3, 1, 1),
+        "new": Result(9.0, 9.0, 1, 1),
+    }
+    assert compare(baseline, results, threshold=0.25) == [Regression("slow", 1.0, 1.3)]
+    assert compare(baseline, results, threshold=0.1)[0].name == "fast"
+    print("✓ Compare flags regressions")
+
+
+def test_cli_saves_and_compares_baselines():
+    """Test --save writes a baseline and --compare exits 1 on regressions"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "baseline.json")
+        args = ["-k", "validate", "--sizes", "10", "--rounds", "1"]
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            assert main(args + ["--save", path]) == 0
+            assert main(["--compare", path, "--threshold", "100", "--rounds", "1"]) == 0
+
+            with open(path) as f:
+                baseline = json.load(f)
+            assert list(baseline["results"]) == ["validate_shortcut_structure[10]"]
+            for result in baseline["results"].values():
+                result["seconds"] /= 1000
+            with open(path, "w") as f:
+                json.dump(baseline, f)
+            assert main(["--compare", path, "--rounds", "1"]) == 1
+        assert "1 of 1 cases regressed" in out.getvalue()
+    print("✓ CLI saves and compares baselines")
+
+
+if __name__ == "__main__":
+    print("Running benchmark suite tests...\n")
+
+    test_cases_cover_hot_paths()
+    test_build_cases_measure_memory()
+    test_compare_flags_regressions()
+    test_cli_saves_and_compares_baselines()
+
+    print("\n✅ All tests passed!")
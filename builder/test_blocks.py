@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for block templates
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from blocks import block, event_menu, extract_key
+from shortcut_builder import (
+    ask_apple_ai_with_variables,
+    get_dictionary_value_from_variable,
+    instrument,
+    set_variable_from_action,
+    text,
+    to_plist,
+    uuid_scope,
+)
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+def test_instances_match_direct_builds():
+    """Test that instances equal the build function's output, UUIDs and all"""
+    with uuid_scope("Block"):
+        cloned = extract_key("title", "Repeat Item", "event_title")
+    with uuid_scope("Block"):
+        get, value_uuid = get_dictionary_value_from_variable("title", "Repeat Item")
+        direct = to_plist(
+            [
+                get,
+                set_variable_from_action("event_title", value_uuid, "Dictionary Value"),
+            ]
+        )
+    assert cloned == direct
+
+    first = event_menu("Repeat Item")
+    second = event_menu("Repeat Item")
+    with uuid_scope("Block"):
+        cloned = event_menu("event")
+    with uuid_scope("Block"):
+        assert cloned == to_plist(event_menu.build("event")), "property references"
+
+    def group_ids(actions: list) -> set:
+        return {
+            a["WFWorkflowActionParameters"]["GroupingIdentifier"]
+            for a in actions
+            if a["WFWorkflowActionIdentifier"] == "is.workflow.actions.choosefrommenu"
+        }
+
+    assert len(group_ids(first)) == 1, "menu actions share one GroupingIdentifier"
+    assert group_ids(first).isdisjoint(group_ids(second)), "instances get new UUIDs"
+
+    # Action and parameter dicts are per instance, constant subtrees are shared
+    menu, other = (
+        actions[0]["WFWorkflowActionParameters"] for actions in (first, second)
+    )
+    assert first[0] is not second[0] and menu is not other
+    assert menu["WFMenuItems"] is other["WFMenuItems"]
+    print("✓ Instances match direct builds")
+
+
+def test_arguments_in_text():
+    """Test arguments inside token strings, returned UUIDs and bad arguments"""
+
+    @block
+    def ask(topic: str, answer: str = "answer"):
+        action, ai_uuid = ask_apple_ai_with_variables(
+            f"Tell me about {topic}, {{x}} and {{y}} ({topic})", ["x", "y"]
+        )
+        return [action, set_variable_from_action(answer, ai_uuid, "Text")], ai_uuid
+
+    for topic in ["cats", "Zürich 😀 " * 20, ""]:
+        with uuid_scope("Ask"):
+            actions, ai_uuid = ask(topic)
+        with uuid_scope("Ask"):
+            direct = ask.build(topic)
+        assert actions == to_plist(direct[0]) and ai_uuid == direct[1], topic
+    assert actions[1]["WFWorkflowActionParameters"]["WFVariableName"] == "answer"
+
+    with instrument() as stats:
+        ask("dogs", answer="reply")
+        ask("birds")
+    assert "blocks_compiled" not in stats.counters, "compiled once, on first use"
+
+    try:
+        ask(3)
+        raise AssertionError("non-string argument accepted")
+    except TypeError:
+        pass
+
+    @block
+    def unused(name: str):
+        return [text("constant")[0]]
+
+    try:
+        unused("x")
+        raise AssertionError("unused argument accepted")
+    except ValueError as e:
+        assert "name" in str(e)
+    print("✓ Arguments in text")
+
+
+def test_household_template():
+    """Test that per-family builds from the optimized template match full builds"""
+    from build_main import (
+        build_main_shortcut,
+        household_prompt,
+        main_actions,
+        main_shortcut,
+        uuid_scope,  # the copy build_main uses, even after pencil_build reloads
+    )
+
+    with open(os.path.join(ROOT_DIR, "config", "sample-config.json")) as f:
+        sample = json.load(f)
+
+    @uuid_scope("Pencil Me In")
+    def full_build(config: dict, review: str) -> dict:
+        actions = main_actions(household_prompt(config), review)
+        return main_shortcut(actions, optimize=True)
+
+    batch = dict(sample, preferences={"review": "batch"})
+    for config in [sample, dict(sample, location="Zürich 😀", kids=[]), {}, batch]:
+        review = config.get("preferences", {}).get("review", "menu")
+        assert to_plist(build_main_shortcut(config)) == to_plist(
+            full_build(config, review)
+        ), review
+    try:
+        build_main_shortcut(sample, review="swipe")
+        raise AssertionError("unknown review mode accepted")
+    except ValueError:
+        pass
+    print("✓ Household template")
+
+
+if __name__ == "__main__":
+    print("Running block template tests...\n")
+
+    test_instances_match_direct_builds()
+    test_arguments_in_text()
+    test_household_template()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming binary plist writer
+"""
+
+import io
+import os
+import plistlib
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from bplist_writer import BinaryPlistWriter, dump, dump_shortcut
+from shortcut_builder import create_shortcut, text_with_variable, to_plist, uuid_scope
+
+
+def test_round_trip_scalars_and_containers():
+    """Test that plistlib.load reads back everything the writer produces"""
+    value = {
+        "ints": [0, 1, 255, 256, 65536, 2**40, 2**63 + 5, -1, -(2**40)],
+        "floats": [0.5, -1e300],
+        "bools": [True, False, 1, 0],
+        "strings": ["", "short", "x" * 100, "émoji 📅" * 20],
+        "bytes": b"\x00\x01" * 40,
+        "date": datetime(2024, 1, 20, 14, 0),
+        "nested": {"list": [[], {}, [{"a": "b"}] * 20]},
+    }
+    buf = io.BytesIO()
+    dump(value, buf)
+    assert plistlib.loads(buf.getvalue()) == value, "Round trip mismatch"
+    print("✓ Scalars and containers round trip")
+
+
+def test_shortcut_streams_from_generator():
+    """Test streaming IR actions from a generator, with shared subtrees"""
+    with uuid_scope("bplist"):
+        actions = [text_with_variable("Event: ", "title")[0] for _ in range(500)]
+    shortcut = create_shortcut("Stream", iter(actions))
+
+    buf = io.BytesIO()
+    dump_shortcut(shortcut, buf)
+    loaded = plistlib.loads(buf.getvalue())
+    assert loaded["WFWorkflowActions"] == to_plist(actions)
+
+    # The repeated token string is written once, so the file stays small
+    plain = plistlib.dumps(to_plist(create_shortcut("Stream", actions)))
+    assert len(buf.getvalue()) < len(plain) / 2, "Subtrees were not shared"
+    print("✓ Shortcut streams from a generator")
+
+
+def test_small_shortcuts_use_two_byte_refs():
+    """Test that ref size adapts and overflows are reported"""
+    with uuid_scope("bplist"):
+        shortcut = create_shortcut("Small", [text_with_variable("a", "b")[0]])
+    buf = io.BytesIO()
+    dump_shortcut(shortcut, buf)
+    assert buf.getvalue()[-25] == 2, "Expected 2-byte object refs"
+
+    writer = BinaryPlistWriter(io.BytesIO(), ref_size=1)
+    try:
+        writer.write(list(range(300)))
+    except OverflowError:
+        pass
+    else:
+        raise AssertionError("1-byte refs should overflow past 256 objects")
+    print("✓ Ref size adapts")
+
+
+if __name__ == "__main__":
+    print("Running bplist writer tests...\n")
+
+    test_round_trip_scalars_and_containers()
+    test_shortcut_streams_from_generator()
+    test_small_shortcuts_use_two_byte_refs()
+
+    print("\n✅ All tests passed!")
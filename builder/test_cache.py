@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM response cache
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from cache import CACHE_PATH, cached_call, load_cache, save_cache
+from controlflow import params
+from interpreter import Interpreter, Stubs
+from shortcut_builder import (
+    ask_chatgpt,
+    list_action,
+    repeat_each_end,
+    repeat_each_start,
+    set_variable,
+    to_plist,
+)
+
+CONFIG = {
+    "location": "Springfield",
+    "sources": [
+        {"name": "Library", "url": "https://library.example"},
+        {"name": "Parks", "url": "https://parks.example"},
+    ],
+    "kids": [],
+    "calendars_to_check": ["Family"],
+}
+
+
+def test_cached_call():
+    """Test misses, hits, the size cap and the weekly expiry"""
+    items, _ = list_action(["a", "b", "a", "c"])
+    loop, loop_id = repeat_each_start("items")
+    ask, _ = ask_chatgpt("Answer")
+    actions = to_plist(
+        [
+            *load_cache(),
+            items,
+            set_variable("items"),
+            loop,
+            *cached_call(("", "Repeat Item"), "answer", [ask], max_entries=2),
+            repeat_each_end(loop_id),
+            *save_cache(),
+        ]
+    )
+
+    def run(files: dict, now: datetime) -> Stubs:
+        stubs = Stubs(files=files, chatgpt="answer", now=now)
+        Interpreter(stubs).run(actions)
+        return stubs
+
+    first = run({}, datetime(2025, 1, 1, 9, 0))
+    assert len(first.prompts) == 3, "a, b and c miss, the second a hits"
+    cache = json.loads(first.files[CACHE_PATH])
+    assert cache["week"] == "2025-W01"
+    assert len(cache["entries"]) == 2, "c is over the size cap"
+
+    again = run(dict(first.files), datetime(2025, 1, 5, 20, 0))
+    assert len(again.prompts) == 1, "only c, which wasn't stored"
+    assert again.files[CACHE_PATH] == first.files[CACHE_PATH]
+
+    next_week = run(dict(first.files), datetime(2025, 1, 6, 9, 0))
+    assert len(next_week.prompts) == 3, "last week's entries expired"
+    assert json.loads(next_week.files[CACHE_PATH])["week"] == "2025-W02"
+    print("✓ Cached call")
+
+
+def test_execute_shortcut_uses_cache():
+    """Test that a second run in the same week skips the source fetches"""
+    from build_execute import CONFIG_PATH, build_execute_shortcut
+
+    shortcut = build_execute_shortcut()
+    digest = next(
+        p["WFTextActionText"]["Value"]
+        for p in map(params, shortcut["WFWorkflowActions"])
+        if "LOCAL SOURCES" in str(p.get("WFTextActionText"))
+    )
+    names = [ref.get("VariableName") for ref in digest["attachmentsByRange"].values()]
+    assert "all_events_raw" in names, "the digest sees the fetched events"
+
+    def chatgpt(prompt: str) -> str:
+        if "library.example" in prompt:
+            return '[{"title": "Story time"}]'
+        return "[]"
+
+    files = {CONFIG_PATH: json.dumps(CONFIG)}
+    runs = []
+    for now in [datetime(2025, 1, 1, 9), datetime(2025, 1, 3, 9)]:
+        stubs = Stubs(files=files, chatgpt=chatgpt, menu=["Done"], now=now)
+        result = Interpreter(stubs).run(shortcut)
+        files = stubs.files
+        runs.append((len(stubs.prompts), result.steps))
+        assert "Story time" in stubs.prompts[-1], "fetched or cached events"
+    (cold_prompts, cold_steps), (warm_prompts, warm_steps) = runs
+    assert cold_prompts == len(CONFIG["sources"]) + 1, "each source, then the digest"
+    assert warm_prompts == 1, "only the digest"
+    assert warm_steps < cold_steps
+
+    # A new source misses and is added
+    config = dict(CONFIG, sources=[{"name": "Zoo", "url": "https://zoo.example"}])
+    files[CONFIG_PATH] = json.dumps(config)
+    stubs = Stubs(files=files, chatgpt="[]", menu=["Done"])
+    Interpreter(stubs).run(shortcut)
+    assert len(stubs.prompts) == 2
+    assert len(json.loads(stubs.files[CACHE_PATH])["entries"]) == 3
+    print("✓ Execute shortcut uses the cache")
+
+
+if __name__ == "__main__":
+    print("Running LLM cache tests...\n")
+
+    test_cached_call()
+    test_execute_shortcut_uses_cache()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for canonical hashing and UUID-insensitive diffs
+"""
+
+import contextlib
+import copy
+import io
+import json
+import os
+import plistlib
+import sys
+import tempfile
+import uuid
+
+sys.path.insert(0, os.path.dirname(__file__))
+from canonical import Change, MerkleTree, canonicalize, diff, main, shortcut_hash
+from shortcut_builder import (
+    comment,
+    list_action,
+    notification,
+    repeat_each_end,
+    repeat_each_start,
+    set_variable_from_action,
+    show_result_with_variable,
+    to_plist,
+    uuid_scope,
+)
+
+
+def main_shortcut(fresh_uuids: bool = False) -> dict:
+    """The main shortcut, optionally with every UUID replaced by a random one"""
+    from build_main import build_main_shortcut
+
+    shortcut = to_plist(build_main_shortcut())
+    if not fresh_uuids:
+        return shortcut
+    names = {}
+
+    def rename(value):
+        if isinstance(value, dict):
+            return {
+                key: names.setdefault(item, str(uuid.uuid4()).upper())
+                if key in ("UUID", "GroupingIdentifier", "OutputUUID")
+                else rename(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [rename(item) for item in value]
+        return value
+
+    return rename(shortcut)
+
+
+def test_hashes_ignore_uuids():
+    """Test that the same shortcut under different UUIDs hashes the same"""
+    first, second = main_shortcut(), main_shortcut(fresh_uuids=True)
+    assert first != second
+    assert canonicalize(first) == canonicalize(second)
+    assert shortcut_hash(first) == shortcut_hash(second)
+    assert (
+        MerkleTree(first["WFWorkflowActions"]).hash
+        == MerkleTree(second["WFWorkflowActions"]).hash
+    )
+    assert diff(first["WFWorkflowActions"], second["WFWorkflowActions"]) == []
+
+    second["WFWorkflowActions"][0]["WFWorkflowActionParameters"]["x"] = 1
+    assert shortcut_hash(first) != shortcut_hash(second)
+    print("✓ Hashes ignore UUIDs")
+
+
+def test_diff_reports_only_real_changes():
+    """Test changed, removed, added and moved actions"""
+    old = main_shortcut()["WFWorkflowActions"]
+    new = copy.deepcopy(main_shortcut(fresh_uuids=True)["WFWorkflowActions"])
+    ask = next(
+        i for i, a in enumerate(new) if "WFLLMPrompt" in a["WFWorkflowActionParameters"]
+    )
+    new[ask]["WFWorkflowActionParameters"]["WFLLMModel"] = "Private Cloud Compute"
+    remind = next(
+        i
+        for i, a in enumerate(new)
+        if a["WFWorkflowActionIdentifier"].endswith("reminder")
+    )
+    del new[remind]
+    new.insert(1, to_plist(comment("Added")))
+
+    changes = diff(old, new)
+    assert set(changes) == set(
+        [
+            Change("added", None, 1, "is.workflow.actions.comment"),
+            Change("changed", ask, ask + 1, "is.workflow.actions.askllm"),
+            Change("removed", remind, None, "is.workflow.actions.addnewreminder"),
+        ]
+    ), changes
+
+    # Moving a whole block is not a change, unless a reference breaks
+    with uuid_scope("canonical"):
+        items, items_uuid = list_action(["a", "b"])
+        loop, loop_id = repeat_each_start("items")
+        setup = [items, set_variable_from_action("items", items_uuid)]
+        block = [
+            loop,
+            show_result_with_variable("", "Repeat Item"),
+            repeat_each_end(loop_id),
+        ]
+        done = [notification("Done", "All items shown")]
+    old = to_plist(setup + block + done)
+    assert diff(old, to_plist(setup + done + block)) == []
+    broken = to_plist(setup[::-1] + block + done)
+    assert [c.identifier for c in diff(old, broken)] == [
+        "is.workflow.actions.setvariable"
+    ], "the variable is now set before the list exists"
+    print("✓ Diff reports only real changes")
+
+
+def test_cli():
+    """Test --hash and the JSON diff output"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for seed in ("one", "two"):
+            path = os.path.join(tmp, f"{seed}.shortcut")
+            with open(path, "wb") as f:
+                plistlib.dump(
+                    main_shortcut(fresh_uuids=seed == "two"), f, fmt=plistlib.FMT_BINARY
+                )
+            paths.append(path)
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            assert main(["--hash", *paths]) == 0
+            assert main([*paths, "--json"]) == 0
+        lines = out.getvalue().splitlines()
+        assert lines[0].split()[0] == lines[1].split()[0]
+        assert json.loads("\n".join(lines[2:])) == []
+    print("✓ CLI")
+
+
+if __name__ == "__main__":
+    print("Running canonical form tests...\n")
+
+    test_hashes_ignore_uuids()
+    test_diff_reports_only_real_changes()
+    test_cli()
+
+    print("\n✅ All tests passed!")
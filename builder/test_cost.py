@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the runtime cost estimator
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+from cost import Budget, BudgetExceeded, CostModel, check_budget, estimate, phases
+from pencil_build import TARGETS, build_target
+from shortcut_builder import (
+    ask_apple_ai,
+    comment,
+    end_if,
+    if_has_value,
+    otherwise,
+    repeat_each_end,
+    repeat_each_start,
+    show_alert,
+    text,
+    to_plist,
+    uuid_scope,
+)
+
+
+def sample_actions() -> list[dict]:
+    with uuid_scope("cost"):
+        loop, loop_id = repeat_each_start("sources")
+        check, check_id = if_has_value("sources")
+        return to_plist(
+            [
+                comment("1. Fetch"),
+                loop,
+                ask_apple_ai("Find events")[0],
+                text("x")[0],
+                repeat_each_end(loop_id),
+                comment("2. Report"),
+                check,
+                ask_apple_ai("Summarize")[0],
+                otherwise(check_id),
+                show_alert("Nothing", "No sources"),
+                end_if(check_id),
+            ]
+        )
+
+
+def test_loops_multiply_and_branches_take_worst_case():
+    """Test loop iteration counts, worst-case branches and per-phase totals"""
+    actions = sample_actions()
+    model = CostModel(iterations={"sources": 4})
+
+    fetch, report = phases(actions, model)
+    assert fetch.name == "1. Fetch"
+    assert fetch.cost.calls["llm"] == 4
+    assert fetch.cost.looped["llm"] == 4
+    assert fetch.cost.actions == 2 + 4 * 2, "loop markers plus 4 bodies"
+    assert report.cost.calls["llm"] == 1, "If takes its more expensive branch"
+    assert report.cost.looped["llm"] == 0
+
+    total = estimate(actions, model)
+    assert total.calls["llm"] == 5
+    assert abs(total.seconds - (fetch.cost.seconds + report.cost.seconds)) < 1e-9
+    assert estimate(actions, CostModel()).calls["llm"] == 11, "default is 10 items"
+    print("✓ Loops multiply and branches take the worst case")
+
+
+def test_budgets():
+    """Test that budgets pass, fail per phase, and fail the build"""
+    actions = sample_actions()
+    assert check_budget(actions, Budget(total=100.0, iterations={"sources": 2}))
+    try:
+        check_budget(actions, Budget(total=100.0, phases={"1. Fetch": 5.0}))
+    except BudgetExceeded as e:
+        assert "1. Fetch" in str(e)
+    else:
+        raise AssertionError("Expected the fetch phase to be over budget")
+
+    target = TARGETS["main"]._replace(budget=Budget(total=1.0))
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            build_target(target, tmp, tmp)
+        except BudgetExceeded:
+            pass
+        else:
+            raise AssertionError("Expected the build to fail")
+        assert not os.path.exists(os.path.join(tmp, target.output))
+
+    # The weekly digest fetches each source in a loop: more sources than its
+    # budget allows for fail the build
+    target = TARGETS["execute"]
+    sources = dict(target.budget.iterations, sources=20)
+    with tempfile.TemporaryDirectory() as tmp:
+        assert build_target(target, tmp, tmp) == "built"
+        over = target._replace(budget=target.budget._replace(iterations=sources))
+        try:
+            build_target(over, tmp, tmp, force=True)
+        except BudgetExceeded as e:
+            assert "Fetch Event Sources" in str(e)
+        else:
+            raise AssertionError("Expected 20 sources to be over budget")
+    print("✓ Budgets are enforced")
+
+
+if __name__ == "__main__":
+    print("Running cost estimator tests...\n")
+
+    test_loops_multiply_and_branches_take_worst_case()
+    test_budgets()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the shortcut decompiler
+"""
+
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from decompiler import decompile, lift, load_shortcut
+from shortcut_builder import OutputRef, TokenString, VariableRef, to_plist, token_string
+
+SHORTCUTS_DIR = os.path.join(os.path.dirname(__file__), "..", "shortcuts")
+
+
+def test_round_trip():
+    """Test that lifting and lowering gives back every shortcut unchanged"""
+    from build_main import build_main_shortcut
+
+    shortcuts = [to_plist(build_main_shortcut())]
+    for path in sorted(glob.glob(os.path.join(SHORTCUTS_DIR, "*.shortcut"))):
+        if not path.endswith("-signed.shortcut"):
+            shortcuts.append(load_shortcut(path))
+    assert len(shortcuts) > 1
+
+    for shortcut in shortcuts:
+        decompiled = decompile(shortcut)
+        assert decompiled.to_plist() == shortcut
+
+        namespace = {}
+        exec(decompiled.to_python("build"), namespace)
+        assert to_plist(namespace["build"]()) == shortcut, "generated code differs"
+    print("✓ Shortcuts round-trip")
+
+
+def test_lifting_and_indexes():
+    """Test IR nodes for plain references and the lookup indexes"""
+    from build_main import build_main_shortcut
+
+    decompiled = decompile(to_plist(build_main_shortcut(review="batch")))
+    loop = decompiled.find("is.workflow.actions.repeat.each")
+    assert len(loop) == 12, "busy times, index the events, three chosen actions"
+    assert (
+        decompiled.group(decompiled.actions[loop[0]].params["GroupingIdentifier"])
+        == loop[:2]
+    )
+
+    # The event's fields are read straight from Repeat Item
+    index = decompiled.find("is.workflow.actions.setvalueforkey")[0]
+    assert index in decompiled.readers("Repeat Item")
+    summary = decompiled.actions[index].params["WFDictionaryKey"]
+    assert not isinstance(summary, TokenString), "aggrandized, so left as plist"
+    assert isinstance(lift(to_plist(token_string("", "x"))), TokenString)
+    assert lift(to_plist(token_string("", "x.y"))) == to_plist(token_string("", "x.y"))
+
+    source = decompiled.actions[loop[4]].params["WFInput"]
+    assert isinstance(source, OutputRef)
+    assert decompiled.output(source.uuid).identifier.endswith("detect.dictionary")
+    assert decompiled.output("missing") is None
+    assert decompiled.writers("events") == []
+
+    # References with extras (e.g. aggrandizements) stay plain plist values
+    aggrandized = {
+        "Value": {
+            "Type": "Variable",
+            "VariableName": "Repeat Item",
+            "Aggrandizements": [{"Type": "WFDictionaryValueVariableAggrandizement"}],
+        },
+        "WFSerializationType": "WFTextTokenAttachment",
+    }
+    assert lift(aggrandized) == aggrandized
+    plain = dict(aggrandized, Value={"Type": "Variable", "VariableName": "x"})
+    assert isinstance(lift(plain), VariableRef)
+    print("✓ Lifting and indexes")
+
+
+if __name__ == "__main__":
+    print("Running decompiler tests...\n")
+
+    test_round_trip()
+    test_lifting_and_indexes()
+
+    print("\n✅ All tests passed!")
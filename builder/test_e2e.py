@@ -29,29 +29,15 @@ from shortcut_builder import (
     ask_chatgpt,
     ask_chatgpt_with_variable,
 )
+from signing import CLISigner, sign_file
 
 SHORTCUTS_CLI = "/usr/bin/shortcuts"
 
 
 def sign_shortcut(input_path: str, output_path: str) -> bool:
-    """Sign a shortcut file. Returns True if successful."""
-    result = subprocess.run(
-        [
-            SHORTCUTS_CLI,
-            "sign",
-            "--mode",
-            "people-who-know-me",
-            "--input",
-            input_path,
-            "--output",
-            output_path,
-        ],
-        capture_output=True,
-        text=True,
-    )
-    return os.path.exists(output_path) and os.path.getsize(
-        output_path
-    ) > os.path.getsize(input_path)
+    """Sign a shortcut file (cached by content). Returns True if successful."""
+    result = sign_file(input_path, output_path, CLISigner(cli=SHORTCUTS_CLI))
+    return result.status != "failed"
 
 
 def import_shortcut(signed_path: str, name: str, timeout: int = 5) -> bool:
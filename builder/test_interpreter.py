@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Tests for the offline shortcut interpreter
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from interpreter import Interpreter, ShortcutError, Stubs, UnsupportedAction, run
+from shortcut_builder import (
+    calendar_is,
+    content_filter,
+    dictionary,
+    end_if,
+    find_calendar_events,
+    get_dictionary_value,
+    if_equals,
+    list_action,
+    otherwise,
+    repeat_each_end,
+    repeat_each_start,
+    set_variable,
+    show_result_with_variable,
+    starts_within,
+    text,
+    text_with_variable,
+    to_plist,
+    uuid_scope,
+    variable_ref,
+)
+
+EVENTS = [
+    {
+        "title": "Storytime",
+        "date": "2025-01-04",
+        "time": "10:00 AM",
+        "location": "Main Library",
+        "description": "Picture books for ages 3-6",
+        "url": "https://library.example/storytime",
+    },
+    {
+        "title": "Farmers Market",
+        "date": "2025-01-05",
+        "time": "9:00 AM",
+        "location": "Town Square",
+        "description": "Local produce",
+        "url": "https://market.example",
+    },
+]
+
+CALENDAR = [
+    {
+        "title": "Dentist",
+        "start": datetime(2025, 1, 3, 9, 0),
+        "end": datetime(2025, 1, 3, 10, 0),
+        "calendar": "Family",
+        "notes": "Bring the insurance card",
+    },
+    {
+        "title": "Standup",
+        "start": datetime(2025, 1, 2, 9, 0),
+        "end": datetime(2025, 1, 2, 9, 15),
+        "calendar": "Work",
+    },
+    {
+        "title": "Ski Trip",
+        "start": datetime(2025, 2, 10, 8, 0),
+        "end": datetime(2025, 2, 14, 18, 0),
+        "calendar": "Family",
+    },
+]
+
+
+def test_main_shortcut_end_to_end():
+    """Test running the real main shortcut with stubbed files, model and menus"""
+    from build_main import CONFIG_PATH, build_main_shortcut
+
+    config = {
+        "location": "Springfield",
+        "sources": [],
+        "calendars_to_check": ["Family"],
+    }
+    stubs = Stubs(
+        files={CONFIG_PATH: json.dumps(config)},
+        calendar=CALENDAR,
+        llm=json.dumps(EVENTS),
+        menu=["📅 Add to Calendar", "⏰ Remind Me"],
+    )
+    result = Interpreter(stubs).run(build_main_shortcut())
+
+    assert len(stubs.prompts) == 1
+    assert '"location": "Springfield"' in stubs.prompts[0], "config is embedded"
+    busy = "Jan 3, 2025 at 9:00 AM – Jan 3, 2025 at 10:00 AM: Dentist"
+    assert f'["{busy}"]' in stubs.prompts[0], "busy times are embedded"
+    for left_out in ["Standup", "Ski Trip", "insurance"]:
+        assert left_out not in stubs.prompts[0], "other calendars, days and fields"
+    assert [prompt for prompt, _ in stubs.menus] == ["Storytime", "Farmers Market"]
+    assert stubs.events == [
+        {
+            "title": "Storytime",
+            "start": "2025-01-04",
+            "location": "Main Library",
+            "notes": "Picture books for ages 3-6",
+        }
+    ]
+    assert stubs.reminders == [
+        {"title": "Farmers Market", "notes": "https://market.example"}
+    ]
+    assert stubs.alerts == [("All Done!", "Finished reviewing events.")]
+    assert result.steps > len(build_main_shortcut()["WFWorkflowActions"])
+    assert "is.workflow.actions.getvalueforkey" not in str(
+        build_main_shortcut()["WFWorkflowActions"]
+    ), "event fields are read through aggrandizements"
+
+    # Setup's config has no calendars_to_check: every calendar is busy
+    setup_config = {"version": 1, "location": "Springfield"}
+    stubs = Stubs(
+        files={CONFIG_PATH: json.dumps(setup_config)},
+        calendar=CALENDAR,
+        llm="[]",
+    )
+    Interpreter(stubs).run(build_main_shortcut())
+    assert "BUSY TIMES (avoid conflicts)\n[]" not in stubs.prompts[0]
+    standup = "Jan 2, 2025 at 9:00 AM – Jan 2, 2025 at 9:15 AM: Standup"
+    assert f'["{standup}", "{busy}"]' in stubs.prompts[0], "sorted, both calendars"
+    assert "Ski Trip" not in stubs.prompts[0]
+
+    # Batch review (opt-in): one list for every event, then one action
+    offered = []
+
+    def choose(prompt: str, items: list) -> list:
+        offered.append(items)
+        return items[1:]
+
+    def batch(action: str) -> Stubs:
+        stubs = Stubs(
+            files={CONFIG_PATH: json.dumps(config)},
+            llm=json.dumps(EVENTS + EVENTS[1:]),
+            answers=choose,
+            menu=[action],
+        )
+        Interpreter(stubs).run(build_main_shortcut(review="batch"))
+        assert stubs.alerts == [("All Done!", "Finished reviewing events.")]
+        return stubs
+
+    stubs = batch("📅 Add to Calendar")
+    assert offered[0] == [
+        "1. Storytime · 2025-01-04",
+        "2. Farmers Market · 2025-01-05",
+        "3. Farmers Market · 2025-01-05",
+    ], "events with the same title and date are offered apart"
+    assert [prompt for prompt, _ in stubs.menus] == ["What should happen to them?"]
+    market = {
+        "title": "Farmers Market",
+        "start": "2025-01-05",
+        "location": "Town Square",
+        "notes": "Local produce",
+    }
+    assert stubs.events == [market, market]
+    assert stubs.reminders == [] and stubs.shared == []
+
+    stubs = batch("⏰ Remind Me")
+    assert stubs.events == []
+    assert (
+        stubs.reminders
+        == [{"title": "Farmers Market", "notes": "https://market.example"}] * 2
+    )
+
+    stubs = batch("💬 Share")
+    assert stubs.shared == [["Farmers Market · 2025-01-05"] * 2], "one combined share"
+    assert stubs.events == [] and stubs.reminders == []
+
+    try:
+        run(build_main_shortcut(), Stubs())
+    except ShortcutError as e:
+        assert CONFIG_PATH in str(e)
+    else:
+        raise AssertionError("Expected the missing config to stop the shortcut")
+    print("✓ Main shortcut runs end to end")
+
+
+def test_control_flow_and_token_strings():
+    """Test If/Otherwise, nested loop variables and UTF-16 token offsets"""
+    with uuid_scope("interpreter"):
+        letters, _ = list_action(["a", "b"])
+        data, data_uuid = dictionary({"name": "Ada", "count": 2})
+        lookup, _ = get_dictionary_value("name", data_uuid)
+        outer, outer_id = repeat_each_start("letters")
+        inner, inner_id = repeat_each_start("letters")
+        check, check_id = if_equals("Repeat Item", "b")
+        actions = to_plist(
+            [
+                data,
+                lookup,
+                set_variable("name"),
+                show_result_with_variable("👋 ", "name", "!"),
+                letters,
+                set_variable("letters"),
+                outer,
+                inner,
+                check,
+                text_with_variable("", "Repeat Index", "=b")[0],
+                otherwise(check_id),
+                text_with_variable("", "Repeat Item", "")[0],
+                end_if(check_id),
+                repeat_each_end(inner_id),
+                repeat_each_end(outer_id),
+            ]
+        )
+    stubs = Stubs()
+    result = run(actions, stubs)
+
+    assert stubs.results == ["👋 Ada!"], "placeholder after a surrogate pair"
+    assert result.variables["name"] == "Ada"
+    assert result.output == [["a", "2=b"], ["a", "2=b"]], "a loop outputs a list"
+    assert result.variables["Repeat Item"] is None, "restored after the loop"
+    print("✓ Control flow and token strings")
+
+
+def test_aggrandized_references():
+    """Test dictionary keys and coercions on references"""
+    with uuid_scope("interpreter"):
+        actions = to_plist(
+            [
+                text('{"n": "3", "event": {"title": "Storytime"}}')[0],
+                set_variable("data"),
+                text_with_variable("", "data.event.title", "!")[0],
+                set_variable("title"),
+                show_result_with_variable("", "data.missing"),
+                list_action(['{"title": "a"}', '{"title": "b"}'])[0],
+                set_variable("events"),
+                text_with_variable("", "events.title")[0],
+            ]
+        )
+    stubs = Stubs()
+    result = run(actions, stubs)
+    assert result.variables["title"] == "Storytime!", "JSON text, then a key path"
+    assert stubs.results == [""], "missing keys have no value"
+    assert result.output == '["a", "b"]', "a list gives each item's value"
+
+    interp = Interpreter()
+    interp.run([])
+    interp.variables.update(data={"n": "3"}, json="[1, 2]")
+    assert interp.resolve(to_plist(variable_ref("data.n", as_type="Number"))) == 3
+    assert interp.resolve(to_plist(variable_ref("json", as_type="Dictionary"))) == [
+        1,
+        2,
+    ]
+    print("✓ Aggrandized references")
+
+
+def test_find_calendar_events():
+    """Test Find Calendar Events filters, sorting, limits and event properties"""
+
+    def titles(*args, **kwargs) -> list:
+        with uuid_scope("interpreter"):
+            find, _ = find_calendar_events(*args, **kwargs)
+            line, _ = text_with_variable("", "events:Title")
+        stubs = Stubs(calendar=CALENDAR)
+        return run(to_plist([find, set_variable("events"), line]), stubs).output
+
+    family = calendar_is("Family")
+    assert titles([family]) == '["Dentist", "Ski Trip"]'
+    assert titles([family, starts_within(2, "weeks")]) == '["Dentist"]'
+    assert titles([family, starts_within(2)], match_all=False) == (
+        '["Dentist", "Standup", "Ski Trip"]'
+    )
+    assert titles([], sort_by="Start Date") == '["Standup", "Dentist", "Ski Trip"]'
+    assert titles([], sort_by="Title", order="Z to A", limit=1) == '["Standup"]'
+    assert titles([content_filter("Title", "contains", String="Trip")]) == (
+        '["Ski Trip"]'
+    )
+    yesterday = content_filter("Start Date", "is in the last", Number=1, Unit=16)
+    assert titles([yesterday]) == "[]"
+
+    try:
+        titles([content_filter("Start Date", "is in the next", Number=1, Unit=8)])
+        raise AssertionError("months accepted")
+    except UnsupportedAction:
+        pass
+    print("✓ Find calendar events")
+
+
+if __name__ == "__main__":
+    print("Running interpreter tests...\n")
+
+    test_main_shortcut_end_to_end()
+    test_control_flow_and_token_strings()
+    test_aggrandized_references()
+    test_find_calendar_events()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for build manifests
+"""
+
+import json
+import os
+import plistlib
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+from manifest import build_manifest, main, manifest_path
+from shortcut_builder import instrument, phase, save_shortcut
+
+
+def test_build_manifest():
+    """Test action counts, prompt sizes and variables of a real shortcut"""
+    from build_execute import build_execute_shortcut
+
+    with instrument() as stats:
+        with phase("build"):
+            shortcut = build_execute_shortcut()
+    manifest = build_manifest(shortcut, stats=stats, source="build_execute")
+
+    actions = shortcut["WFWorkflowActions"]
+    assert manifest["actions"] == len(actions)
+    assert sum(manifest["action_counts"].values()) == len(actions)
+    assert manifest["variables"] == [
+        "all_events_raw",
+        "cache_entries",
+        "calendar_events",
+        "calendars_to_check",
+        "digest",
+        "found_events",
+        "kids",
+        "location",
+        "my_calendar_events",
+        "source_events",
+        "sources",
+        "ticket_reminders",
+    ]
+    assert {p["identifier"] for p in manifest["prompts"]} == {
+        "com.openai.chat.AskIntent",
+        "is.workflow.actions.askllm",
+    }
+    assert all(p["bytes"] > 0 for p in manifest["prompts"])
+    assert manifest["prompt_bytes"] == sum(p["bytes"] for p in manifest["prompts"])
+    assert set(manifest["phases"]) >= {"build"}
+    json.dumps(manifest)  # plain JSON types only
+
+    assert build_manifest({})["actions"] == 0
+    print("✓ Manifest of a built shortcut")
+
+
+def test_cli_writes_manifest():
+    """Test that --write puts Foo.manifest.json next to Foo.shortcut"""
+    from build_main import build_main_shortcut
+
+    assert manifest_path("out/Foo.shortcut") == "out/Foo.manifest.json"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "Main.shortcut")
+        save_shortcut(build_main_shortcut(), path)
+        assert main([path, "--write"]) == 0
+        with open(os.path.join(tmp, "Main.manifest.json")) as f:
+            manifest = json.load(f)
+        with open(path, "rb") as f:
+            assert manifest == build_manifest(plistlib.load(f), os.path.getsize(path))
+        assert manifest["plist_bytes"] == os.path.getsize(path)
+    print("✓ CLI writes manifests")
+
+
+if __name__ == "__main__":
+    print("Running manifest tests...\n")
+
+    test_build_manifest()
+    test_cli_writes_manifest()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Tests for the peephole optimizer
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from controlflow import iter_refs, params, scope_paths, within
+from optimizer import optimize, optimize_shortcut
+from shortcut_builder import (
+    action_output_ref,
+    ask_apple_ai,
+    create_shortcut,
+    generate_hash,
+    get_dictionary_value,
+    get_dictionary_value_from_variable,
+    get_variable,
+    import_question,
+    list_action,
+    repeat_each_end,
+    repeat_each_start,
+    set_variable,
+    set_variable_from_action,
+    show_result_with_variable,
+    text,
+    text_with_variable,
+    uuid_scope,
+    variable_ref,
+)
+from validator import validate_shortcut_structure
+
+
+def dangling_refs(actions: list[dict]) -> list[str]:
+    """ActionOutput refs that don't point at an earlier action in scope"""
+    paths = scope_paths(actions)
+    defined = {}
+    errors = []
+    for i, action in enumerate(actions):
+        for ref in iter_refs(params(action)):
+            if ref["Type"] != "ActionOutput":
+                continue
+            source = defined.get(ref["OutputUUID"])
+            if source is None or not within(paths[i], paths[source]):
+                errors.append(f"Action {i}: dangling ref {ref['OutputUUID']}")
+        if "UUID" in params(action):
+            defined[params(action)["UUID"]] = i
+    return errors
+
+
+def test_optimized_shortcuts_stay_valid():
+    """Test that the real shortcuts lose their get/set chains and still validate"""
+    from build_execute import build_execute_shortcut
+    from build_main import build_main_shortcut
+
+    for build in (build_main_shortcut, build_execute_shortcut):
+        shortcut = build()
+        actions = shortcut["WFWorkflowActions"]
+        _, report = optimize_shortcut(shortcut)
+        assert report.removed == 0, "Build output should already be optimized"
+        assert not any(
+            a["WFWorkflowActionIdentifier"] == "is.workflow.actions.getvariable"
+            for a in actions
+        ), f"{build.__name__} still loads variables"
+        assert validate_shortcut_structure(shortcut) == []
+        assert dangling_refs(actions) == []
+
+    # Every variable in the main shortcut is a plain copy of an action output,
+    # except what is built in loops: the busy times, and for batch review the
+    # event index and the summaries
+    for review, expected in [
+        ("menu", {"busy_events"}),
+        ("batch", {"busy_events", "events_by_summary", "chosen_summaries"}),
+    ]:
+        assert {
+            params(a)["WFVariableName"]
+            for a in build_main_shortcut(review=review)["WFWorkflowActions"]
+            if a["WFWorkflowActionIdentifier"] == "is.workflow.actions.setvariable"
+        } == expected, review
+    print("✓ Optimized shortcuts stay valid")
+
+
+def test_copy_propagation_and_load_forwarding():
+    """Test set/get chains collapse into direct ActionOutput references"""
+    with uuid_scope("optimizer"):
+        source, source_uuid = text('{"a": 1}')
+        load, _ = get_variable("config")
+        lookup, lookup_uuid = get_dictionary_value("a")
+        actions = [
+            source,
+            set_variable("config"),
+            load,
+            lookup,
+            set_variable_from_action("a", lookup_uuid, "Dictionary Value"),
+            show_result_with_variable("a = ", "a"),
+        ]
+    optimized, report = optimize(actions)
+
+    assert [a["WFWorkflowActionIdentifier"].rsplit(".", 1)[1] for a in optimized] == [
+        "gettext",
+        "getvalueforkey",
+        "showresult",
+    ]
+    assert report.removed == 3
+    lookup_input = optimized[1]["WFWorkflowActionParameters"]["WFInput"]["Value"]
+    assert lookup_input["OutputUUID"] == source_uuid
+    shown = optimized[2]["WFWorkflowActionParameters"]["Text"]["Value"]
+    assert shown["attachmentsByRange"]["{4, 1}"]["OutputUUID"] == lookup_uuid
+    print("✓ Copies propagate and loads forward")
+
+
+def test_loop_carried_variables_are_kept():
+    """Test that a variable read before its write in a loop is not propagated"""
+    with uuid_scope("optimizer"):
+        loop, loop_id = repeat_each_start("items")
+        actions = [
+            loop,
+            show_result_with_variable("Previous: ", "last"),
+            text_with_variable("", "Repeat Item")[0],
+            set_variable("last"),
+            repeat_each_end(loop_id),
+        ]
+    optimized, report = optimize(actions)
+    assert report.removed == 0
+    assert report.hoisted == 0, "Nothing here is loop-invariant"
+    assert report.warnings == ("Action 0: variable 'items' is read but never written",)
+    assert len(optimized) == len(actions)
+    print("✓ Loop-carried variables are kept")
+
+
+def test_loop_invariants_are_hoisted():
+    """Test that constant work leaves the loop and dead variables disappear"""
+
+    def build(items: list) -> list:
+        with uuid_scope("optimizer"):
+            listed, items_uuid = list_action(items)
+            loop, loop_id = repeat_each_start()
+            loop.params["WFInput"] = action_output_ref(items_uuid, "List")
+            ask_ai, _ = ask_apple_ai("Suggest a weekend activity")
+            return [
+                listed,
+                text("[]")[0],
+                set_variable("collected"),
+                loop,
+                text("Weekend")[0],
+                set_variable("title"),
+                ask_ai,
+                set_variable("answer"),
+                show_result_with_variable("", "title"),
+                show_result_with_variable("", "Repeat Item"),
+                repeat_each_end(loop_id),
+            ]
+
+    def shape(actions: list) -> list:
+        return [a["WFWorkflowActionIdentifier"].rsplit(".", 1)[1] for a in actions]
+
+    # Model calls stay in the loop unless asked for
+    optimized, report = optimize(build(["a", "b"]))
+    assert shape(optimized) == [
+        "list",
+        "gettext",
+        "each",
+        "askllm",
+        "showresult",
+        "showresult",
+        "each",
+    ]
+    assert report.hoisted == 1, "the title text"
+    assert report.removed == 4, "Three variables and the unused text should go"
+    assert dangling_refs(optimized) == []
+
+    optimized, report = optimize(build(["a", "b"]), hoist_models=True)
+    assert shape(optimized)[:4] == ["list", "gettext", "askllm", "each"]
+    assert report.hoisted == 2
+
+    # ... and never from a loop that may run zero times: an empty list, or a
+    # variable's items
+    over_variable = build(["a", "b"])
+    over_variable[3].params["WFInput"] = variable_ref("collected")
+    for actions in [build([]), over_variable]:
+        optimized, report = optimize(actions, hoist_models=True)
+        assert shape(optimized).index("askllm") > shape(optimized).index("each")
+    print("✓ Loop invariants are hoisted")
+
+
+def test_repeated_loads_are_merged():
+    """Test common subexpressions and import question indices"""
+    with uuid_scope("optimizer"):
+        first, first_uuid = get_dictionary_value_from_variable("key", "Repeat Item")
+        second, second_uuid = get_dictionary_value_from_variable("key", "Repeat Item")
+        actions = [
+            text("{}")[0],
+            set_variable("unused"),
+            text("Ask me")[0],
+            first,
+            set_variable_from_action("one", first_uuid, "Dictionary Value"),
+            show_result_with_variable("", "one"),
+            second,
+            set_variable_from_action("two", second_uuid, "Dictionary Value"),
+            show_result_with_variable("", "two"),
+        ]
+        shortcut = create_shortcut(
+            "CSE",
+            actions,
+            import_questions=[import_question("WFTextActionText", 2)],
+            optimize=True,
+        )
+
+    optimized = shortcut["WFWorkflowActions"]
+    lookups = [p["UUID"] for p in map(params, optimized) if "WFDictionaryKey" in p]
+    assert lookups == [first_uuid], "Second lookup should reuse the first"
+    assert dangling_refs(optimized) == []
+    question = shortcut["WFWorkflowImportQuestions"][0]
+    assert params(optimized[question["ActionIndex"]])["WFTextActionText"] == "Ask me"
+
+    # Actions with the same parameters but different implicit inputs are kept
+    actions = []
+    for key in ["a", "b"]:
+        actions += [text(key)[0], generate_hash("SHA256")[0], set_variable(key)]
+        actions.append(show_result_with_variable("", key))
+    optimized, _ = optimize(actions)
+    hashes = [a for a in optimized if a["WFWorkflowActionIdentifier"].endswith("hash")]
+    assert len(hashes) == 2, "one per text"
+    assert dangling_refs(optimized) == []
+    print("✓ Repeated loads are merged")
+
+
+if __name__ == "__main__":
+    print("Running optimizer tests...\n")
+
+    test_optimized_shortcuts_stay_valid()
+    test_copy_propagation_and_load_forwarding()
+    test_loop_carried_variables_are_kept()
+    test_loop_invariants_are_hoisted()
+    test_repeated_loads_are_merged()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental build driver
+"""
+
+import json
+import os
+import plistlib
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+import pencil_build
+from pencil_build import (
+    COLD_START_BUDGET,
+    ROOT_DIR,
+    TARGETS,
+    build_many,
+    build_target,
+    fingerprint,
+    get_target,
+    load_configs,
+    local_dependencies,
+    main,
+)
+from validator import validate_shortcut_structure
+
+
+def test_dependencies_include_builder():
+    """Test that a target's fingerprint covers shortcut_builder.py"""
+    deps = local_dependencies("build_main")
+    assert {"build_main", "shortcut_builder", "bplist_writer"} <= set(deps), deps
+    assert "pencil_build" not in deps
+    print("✓ Dependencies found")
+
+
+def test_unchanged_targets_are_skipped():
+    """Test build -> skip -> restore-from-cache -> rebuild on input change"""
+    target = TARGETS["test"]
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = os.path.join(tmp, "out")
+        cache_dir = os.path.join(tmp, "cache")
+        output = os.path.join(out_dir, target.output)
+
+        assert build_target(target, out_dir, cache_dir) == "built"
+        with open(output, "rb") as f:
+            built = f.read()
+        assert build_target(target, out_dir, cache_dir) == "skipped"
+
+        os.unlink(output)
+        assert build_target(target, out_dir, cache_dir) == "restored"
+        with open(output, "rb") as f:
+            assert f.read() == built, "Restored artifact differs from build"
+
+        # Any extra input changes the fingerprint
+        extra = os.path.join(tmp, "prompt.txt")
+        with open(extra, "w") as f:
+            f.write("v1")
+        changed = target._replace(inputs=(extra,))
+        assert fingerprint(changed) != fingerprint(target)
+        mtime = os.stat(output).st_mtime_ns
+        assert build_target(changed, out_dir, cache_dir) == "unchanged"
+        assert os.stat(output).st_mtime_ns == mtime, "equal output is not rewritten"
+
+        # A different shortcut from the same target is written
+        different = TARGETS["capture"]._replace(output=target.output)
+        assert build_target(different, out_dir, cache_dir) == "built"
+
+    print("✓ Unchanged targets are skipped")
+
+
+def test_force_rebuilds():
+    """Test that --force rebuilds even with a warm cache"""
+    target = TARGETS["test"]
+    with tempfile.TemporaryDirectory() as tmp:
+        assert build_target(target, tmp, tmp) == "built"
+        assert build_target(target, tmp, tmp, force=True) == "built"
+        assert pencil_build.main(["test", "--out-dir", tmp, "--cache-dir", tmp]) == 0
+    print("✓ Force rebuilds")
+
+
+def test_manifest_next_to_output():
+    """Test built and restored outputs get a manifest with phases and counts"""
+    target = TARGETS["main"]
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = os.path.join(tmp, "out")
+        cache_dir = os.path.join(tmp, "cache")
+        manifest_path = os.path.join(out_dir, "Pencil-Me-In.manifest.json")
+
+        assert build_target(target, out_dir, cache_dir) == "built"
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        assert manifest["source"] == "build_main.build_main_shortcut"
+        assert manifest["plist_bytes"] == os.path.getsize(
+            os.path.join(out_dir, target.output)
+        )
+        assert sum(manifest["action_counts"].values()) == manifest["actions"]
+        assert {"build", "build/optimize", "serialize"} <= set(manifest["phases"])
+        assert manifest["counters"]["actions_removed_by_optimizer"] >= 0
+        assert manifest["prompts"][0]["bytes"] == manifest["prompt_bytes"] > 1000
+
+        # A missing manifest is restored from the cache, like the output
+        os.unlink(manifest_path)
+        assert build_target(target, out_dir, cache_dir) == "unchanged"
+        with open(manifest_path) as f:
+            assert json.load(f) == manifest
+
+        # No-op builds check the budget against the manifest's estimate, and
+        # only read the shortcut for other loop sizes
+        assert manifest["estimate"]["iterations"] == target.budget.iterations
+        artifact = os.path.join(cache_dir, f"{fingerprint(target)}.shortcut")
+        with open(artifact, "wb") as f:
+            f.write(b"not a plist")
+        assert build_target(target, out_dir, cache_dir) == "skipped"
+        resized = target.budget._replace(iterations={"events": 5})
+        try:
+            build_target(target._replace(budget=resized), out_dir, cache_dir)
+            raise AssertionError("stale estimate used")
+        except plistlib.InvalidFileException:
+            pass
+    print("✓ Manifest next to output")
+
+
+def test_bake_config():
+    """Test that --bake-config bakes the file in and rebuilds when it changes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = os.path.join(tmp, "out")
+        config = os.path.join(tmp, "config.json")
+        with open(config, "w") as f:
+            json.dump({"location": "Springfield", "kids": []}, f)
+        target = get_target("execute", config)
+
+        assert fingerprint(target) != fingerprint(TARGETS["execute"])
+        assert build_target(target, out_dir, tmp) == "built"
+        with open(os.path.join(out_dir, target.output), "rb") as f:
+            assert b"Springfield" in f.read()
+        assert build_target(target, out_dir, tmp) == "skipped"
+        with open(config, "w") as f:
+            json.dump({"location": "Shelbyville", "kids": []}, f)
+        assert build_target(target, out_dir, tmp) == "built"
+
+        try:
+            main(["main", "--bake-config", config, "--out-dir", out_dir])
+            raise AssertionError("--bake-config accepted for main")
+        except SystemExit as e:
+            assert e.code == 2
+    print("✓ Bake config")
+
+
+def test_no_op_build_starts_fast():
+    """Test a no-op build process skips the builder imports and stays in budget"""
+    with tempfile.TemporaryDirectory() as tmp:
+        args = ["test", "--out-dir", tmp, "--cache-dir", os.path.join(tmp, "cache")]
+        assert main(args) == 0
+
+        cmd = [sys.executable, pencil_build.__file__, *args]
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *cmd[1:]],
+            capture_output=True,
+            text=True,
+        )
+        assert "skipped" in result.stdout, result.stdout + result.stderr
+        imported = {
+            line.rsplit("|", 1)[-1].strip()
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:")
+        }
+        assert "cost" in imported, "import times not reported"
+        lazy = {"shortcut_builder", "canonical", "optimizer", "build_test"}
+        assert not lazy & imported, f"no-op build imported {lazy & imported}"
+
+        seconds = []
+        for _ in range(3):
+            start = time.perf_counter()
+            subprocess.run(cmd, capture_output=True, check=True)
+            seconds.append(time.perf_counter() - start)
+        assert min(seconds) < COLD_START_BUDGET, f"cold start took {min(seconds):.2f} s"
+    print(f"✓ No-op build starts in {min(seconds) * 1000:.0f} ms")
+
+
+def test_build_many_families():
+    """Test per-household builds across processes, with invalid configs reported"""
+    with open(os.path.join(ROOT_DIR, "config", "sample-config.json")) as f:
+        sample = json.load(f)
+    towns = ["Libertyville, IL", "Evanston, IL", "Oak Park, IL"]
+    with tempfile.TemporaryDirectory() as tmp:
+        configs_path = os.path.join(tmp, "families.jsonl")
+        with open(configs_path, "w") as f:
+            for town in towns:
+                f.write(json.dumps(dict(sample, location=town)) + "\n")
+            f.write(json.dumps({"location": "Nowhere"}) + "\n")
+        configs = load_configs(configs_path)
+        assert [name for name, _ in configs][:2] == ["families-1", "families-2"]
+
+        out_dir = os.path.join(tmp, "out")
+        result = build_many(configs, out_dir, jobs=2, chunksize=1)
+        assert sorted(result.built) == ["families-1", "families-2", "families-3"]
+        assert "missing 'version'" in result.failed["families-4"]
+        assert result.rate > 0
+        assert sorted(os.listdir(out_dir)) == [
+            f"families-{n}.{ext}"
+            for n in (1, 2, 3)
+            for ext in ("manifest.json", "shortcut")
+        ], "no temporary files left behind"
+
+        for town, name in zip(towns, sorted(result.built)):
+            with open(result.built[name], "rb") as f:
+                shortcut = plistlib.load(f)
+            assert validate_shortcut_structure(shortcut) == []
+            prompts = [
+                a["WFWorkflowActionParameters"]["WFLLMPrompt"]["Value"]["string"]
+                for a in shortcut["WFWorkflowActions"]
+                if "WFLLMPrompt" in a["WFWorkflowActionParameters"]
+            ]
+            assert f"Location: {town}" in prompts[0]
+    print("✓ Per-family builds")
+
+
+if __name__ == "__main__":
+    print("Running build driver tests...\n")
+
+    test_dependencies_include_builder()
+    test_unchanged_targets_are_skipped()
+    test_force_rebuilds()
+    test_manifest_next_to_output()
+    test_bake_config()
+    test_no_op_build_starts_fast()
+    test_build_many_families()
+
+    print("\n✅ All tests passed!")
@@ -10,7 +10,6 @@ These tests validate:
 """
 
 import plistlib
-import subprocess
 import sys
 import os
 
@@ -31,103 +30,20 @@ from shortcut_builder import (
     show_alert,
     show_result,
     show_result_with_variable,
+    ask_apple_ai_with_variables,
+    compile_segments,
+    compile_template,
+    count,
+    instrument,
+    phase,
+    uuid_scope,
+    to_plist,
+    variable_ref,
+    action_output_ref,
 )
+from validator import validate_shortcut_structure
 
-
-def validate_shortcut_structure(data: dict) -> list[str]:
-    """Validate a shortcut dict has correct structure. Returns list of errors."""
-    errors = []
-
-    # Check required top-level keys
-    required_keys = ["WFWorkflowActions", "WFWorkflowIcon"]
-    for key in required_keys:
-        if key not in data:
-            errors.append(f"Missing required key: {key}")
-
-    actions = data.get("WFWorkflowActions", [])
-    if not actions:
-        errors.append("No actions in shortcut")
-        return errors
-
-    menu_groups = {}
-    if_groups = {}
-
-    for i, action in enumerate(actions):
-        action_id = action.get("WFWorkflowActionIdentifier", "MISSING")
-        params = action.get("WFWorkflowActionParameters", {})
-
-        if action_id == "MISSING":
-            errors.append(f"Action {i}: Missing WFWorkflowActionIdentifier")
-            continue
-
-        # Validate conditional actions
-        if action_id == "is.workflow.actions.conditional":
-            group_id = params.get("GroupingIdentifier")
-            mode = params.get("WFControlFlowMode")
-
-            if group_id is None:
-                errors.append(f"Action {i}: Conditional missing GroupingIdentifier")
-            if mode is None:
-                errors.append(f"Action {i}: Conditional missing WFControlFlowMode")
-
-            if mode == 0:  # start
-                if "WFInput" not in params:
-                    errors.append(f"Action {i}: If-start missing WFInput")
-                else:
-                    wf_input = params["WFInput"]
-                    # Must have Type field
-                    if "Type" not in wf_input:
-                        errors.append(f"Action {i}: WFInput missing Type field")
-                    # If Type=Variable, must have Variable field
-                    if (
-                        wf_input.get("Type") == "Variable"
-                        and "Variable" not in wf_input
-                    ):
-                        errors.append(
-                            f"Action {i}: WFInput Type=Variable but missing Variable field"
-                        )
-
-                if "WFCondition" not in params:
-                    errors.append(f"Action {i}: If-start missing WFCondition")
-
-                if group_id:
-                    if_groups[group_id] = {"start": i, "end": None}
-            elif mode == 2:  # end
-                if group_id and group_id in if_groups:
-                    if_groups[group_id]["end"] = i
-
-        # Validate menu actions
-        if action_id == "is.workflow.actions.choosefrommenu":
-            group_id = params.get("GroupingIdentifier")
-            mode = params.get("WFControlFlowMode")
-
-            if group_id is None:
-                errors.append(f"Action {i}: Menu missing GroupingIdentifier")
-
-            if mode == 0:  # start
-                if "WFMenuItems" not in params:
-                    errors.append(f"Action {i}: Menu start missing WFMenuItems")
-                if group_id:
-                    menu_groups[group_id] = {"start": i, "items": [], "end": None}
-            elif mode == 1:  # item
-                if "WFMenuItemTitle" not in params:
-                    errors.append(f"Action {i}: Menu item missing WFMenuItemTitle")
-                if group_id and group_id in menu_groups:
-                    menu_groups[group_id]["items"].append(i)
-            elif mode == 2:  # end
-                if group_id and group_id in menu_groups:
-                    menu_groups[group_id]["end"] = i
-
-    # Check all control flow is closed
-    for group_id, menu in menu_groups.items():
-        if menu["end"] is None:
-            errors.append(f"Menu not closed (started at action {menu['start']})")
-
-    for group_id, if_block in if_groups.items():
-        if if_block["end"] is None:
-            errors.append(f"If not closed (started at action {if_block['start']})")
-
-    return errors
+SHORTCUTS_DIR = os.path.join(os.path.dirname(__file__), "..", "shortcuts")
 
 
 def test_if_has_value_structure():
@@ -226,6 +142,137 @@ def test_show_result_with_variable_structure():
     print("✓ show_result_with_variable structure is correct")
 
 
+def test_token_string_utf16_offsets():
+    """Test that range keys count UTF-16 code units (emoji take two)"""
+    action, _ = text_with_variable("📅 Today: ", "events", "")
+    value = action["WFWorkflowActionParameters"]["WFTextActionText"]["Value"]
+
+    # "📅" is one code point but two UTF-16 code units
+    assert list(value["attachmentsByRange"]) == ["{10, 1}"], (
+        f"Wrong range key: {list(value['attachmentsByRange'])}"
+    )
+    assert value["string"] == "📅 Today: ￼"
+
+    print("✓ token string offsets are UTF-16")
+
+
+def test_ask_apple_ai_with_variables_template():
+    """Test multi-variable prompts keep JSON braces and place every variable"""
+    template = 'Config: {config}\nBusy: {busy}\nFormat: {"title": "x"}\n{config}'
+    action, _ = ask_apple_ai_with_variables(template, ["config", "busy"])
+    value = action["WFWorkflowActionParameters"]["WFLLMPrompt"]["Value"]
+
+    assert value["string"] == 'Config: ￼\nBusy: ￼\nFormat: {"title": "x"}\n￼'
+    assert value["attachmentsByRange"] == {
+        "{8, 1}": {"Type": "Variable", "VariableName": "config"},
+        "{16, 1}": {"Type": "Variable", "VariableName": "busy"},
+        "{41, 1}": {"Type": "Variable", "VariableName": "config"},
+    }, f"Wrong attachments: {value['attachmentsByRange']}"
+
+    # The compiled template is cached, but each action gets its own dicts
+    assert compile_template(template, ("config", "busy")) is compile_template(
+        template, ("config", "busy")
+    )
+    action2, _ = ask_apple_ai_with_variables(template, ["config", "busy"])
+    assert (
+        action2["WFWorkflowActionParameters"]["WFLLMPrompt"]
+        is not (action["WFWorkflowActionParameters"]["WFLLMPrompt"])
+    )
+
+    print("✓ ask_apple_ai_with_variables template is correct")
+
+
+def test_action_ir_lowers_to_plist():
+    """Test that IR actions read like dicts and lower to plain plist values"""
+    action, _ = text_with_variable("Hi ", "name")
+    assert action["WFWorkflowActionIdentifier"] == "is.workflow.actions.gettext"
+    assert dict(action) == to_plist(action)
+
+    # Constant substructures are shared between actions until lowering
+    set_a, set_b = set_variable("a", "x"), set_variable("b", "x")
+    assert set_a.params["WFInput"] is set_b.params["WFInput"]
+
+    shortcut = to_plist(create_shortcut("IR", [action, set_a]))
+    data = plistlib.loads(plistlib.dumps(shortcut, fmt=plistlib.FMT_BINARY))
+    assert data["WFWorkflowActions"][1]["WFWorkflowActionParameters"]["WFInput"] == {
+        "Value": {"VariableName": "x", "Type": "Variable"},
+        "WFSerializationType": "WFTextTokenAttachment",
+    }
+
+    # Reads are lowered afresh, so writes to them fail instead of being lost
+    params = action["WFWorkflowActionParameters"]
+    token = params["WFTextActionText"]
+    for write in [
+        lambda: params.update(UUID="x"),
+        lambda: token["Value"].pop("string"),
+        lambda: action.params["WFTextActionText"]["Value"].clear(),
+    ]:
+        try:
+            write()
+            raise AssertionError("write to a lowered IR value accepted")
+        except TypeError:
+            pass
+    assert dict(action) == to_plist(action), "nothing changed"
+    lowered = to_plist(action)
+    lowered["WFWorkflowActionParameters"]["UUID"] = "x"
+    assert lowered["WFWorkflowActionParameters"]["UUID"] == "x"
+
+    print("✓ Action IR lowers to plist")
+
+
+def test_aggrandized_references():
+    """Test "variable.key" references and coercions lower to aggrandizements"""
+    as_dictionary = {
+        "CoercionItemClass": "WFDictionaryContentItem",
+        "Type": "WFCoercionVariableAggrandizement",
+    }
+    title = {
+        "DictionaryKey": "title",
+        "Type": "WFDictionaryValueVariableAggrandizement",
+    }
+
+    action, _ = text_with_variable("Event: ", "Repeat Item.title")
+    value = action["WFWorkflowActionParameters"]["WFTextActionText"]["Value"]
+    assert value["attachmentsByRange"]["{7, 1}"] == {
+        "Type": "Variable",
+        "VariableName": "Repeat Item",
+        "Aggrandizements": [as_dictionary, title],
+    }
+
+    ref = to_plist(variable_ref("count", as_type="Number"))["Value"]
+    assert ref["Aggrandizements"] == [
+        {
+            "CoercionItemClass": "WFNumberContentItem",
+            "Type": "WFCoercionVariableAggrandizement",
+        }
+    ]
+    assert "Aggrandizements" not in to_plist(variable_ref("count"))["Value"]
+
+    ref = to_plist(action_output_ref("UUID", "Dictionary", key="title"))["Value"]
+    assert ref["Aggrandizements"] == [as_dictionary, title]
+    assert ref["OutputUUID"] == "UUID" and ref["OutputName"] == "Dictionary"
+
+    # Each lowering gets its own dicts
+    first, second = (to_plist(variable_ref("Repeat Item.title")) for _ in "ab")
+    assert first == second
+    assert (
+        first["Value"]["Aggrandizements"][0]
+        is not (second["Value"]["Aggrandizements"][0])
+    )
+
+    # "variable:Property" reads a content item's property
+    ref = to_plist(variable_ref("Repeat Item:Start Date"))["Value"]
+    assert ref == {
+        "Type": "Variable",
+        "VariableName": "Repeat Item",
+        "Aggrandizements": [
+            {"PropertyName": "Start Date", "Type": "WFPropertyVariableAggrandizement"}
+        ],
+    }
+
+    print("✓ Aggrandized references")
+
+
 def test_menu_structure():
     """Test that menu generates correct structure"""
     actions = []
@@ -274,12 +321,57 @@ def test_nested_control_flow():
     print("✓ Nested control flow is correct")
 
 
+def test_builds_are_reproducible():
+    """Test that building the same shortcut twice gives byte-identical plists"""
+    from build_main import build_main_shortcut
+
+    first = plistlib.dumps(to_plist(build_main_shortcut()), fmt=plistlib.FMT_BINARY)
+    second = plistlib.dumps(to_plist(build_main_shortcut()), fmt=plistlib.FMT_BINARY)
+    assert first == second, "Identical inputs produced different plists"
+
+    # Outside a scope UUIDs stay random; inside, they restart from the seed
+    with uuid_scope("Test"):
+        a, a_uuid = text("a")
+    with uuid_scope("Test"):
+        b, b_uuid = text("a")
+    assert a_uuid == b_uuid
+    assert text("a")[1] != text("a")[1]
+
+    print("✓ Builds are reproducible")
+
+
+def test_build_instrumentation():
+    """Test phase timings nest and add up, and counters only count when on"""
+    count("ignored")  # no-op outside instrument()
+    with phase("ignored"):
+        pass
+
+    # The template caches are process-wide: start cold, whatever ran before
+    compile_template.cache_clear()
+    compile_segments.cache_clear()
+    with instrument() as stats:
+        for _ in range(2):
+            with phase("build"), phase("tokens"):
+                ask_apple_ai_with_variables("Instrumented {a} and {b}", ["a", "b"])
+        count("custom", 3)
+    assert set(stats.phases) == {"build", "build/tokens"}
+    assert stats.phases["build"] >= stats.phases["build/tokens"] > 0
+    assert stats.counters["custom"] == 3
+    assert stats.counters["templates_compiled"] == 1, "second build hit the cache"
+    assert stats.open == []
+
+    with instrument() as outer:
+        with instrument() as inner:
+            count("x")
+        count("y")
+    assert inner.counters == {"x": 1} and outer.counters == {"y": 1}
+    print("✓ Build instrumentation")
+
+
 def test_generated_shortcuts():
     """Test the actual generated shortcut files"""
-    shortcuts_dir = "/Users/athal/code/pencil-me-in/shortcuts"
-
     for name in ["Pencil-Me-In-Setup.shortcut", "Pencil-Me-In.shortcut"]:
-        path = os.path.join(shortcuts_dir, name)
+        path = os.path.join(SHORTCUTS_DIR, name)
         if not os.path.exists(path):
             print(f"⚠ {name} not found, skipping")
             continue
@@ -302,47 +394,37 @@ def test_shortcut_can_be_signed():
     """Test that shortcuts can be signed (validates Apple's parser accepts them)"""
     import tempfile
 
-    shortcuts_dir = "/Users/athal/code/pencil-me-in/shortcuts"
-    # Use full path to Apple's shortcuts CLI to avoid conflict with python shortcuts package
-    shortcuts_cli = "/usr/bin/shortcuts"
-
-    for name in ["Pencil-Me-In-Setup.shortcut", "Pencil-Me-In.shortcut"]:
-        path = os.path.join(shortcuts_dir, name)
-        if not os.path.exists(path):
-            continue
-
-        with tempfile.NamedTemporaryFile(suffix=".shortcut", delete=False) as tmp:
-            tmp_path = tmp.name
-
-        try:
-            result = subprocess.run(
-                [
-                    shortcuts_cli,
-                    "sign",
-                    "--mode",
-                    "people-who-know-me",
-                    "--input",
-                    path,
-                    "--output",
-                    tmp_path,
-                ],
-                capture_output=True,
-                text=True,
-            )
-            # The ERROR messages about attribute strings are warnings, not failures
-            # Check if output file was created and is larger than input (has signature)
-            if os.path.exists(tmp_path) and os.path.getsize(tmp_path) > os.path.getsize(
-                path
-            ):
-                print(f"✓ {name} can be signed")
-            else:
-                print(f"✗ {name} signing failed")
-                print(f"  stdout: {result.stdout}")
-                print(f"  stderr: {result.stderr}")
-                raise AssertionError(f"{name} signing failed")
-        finally:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+    from aea import read_signed
+    from signing import CLISigner, sign_many
+
+    signer = CLISigner(cli="/usr/bin/shortcuts")
+    if not os.path.exists(signer.cli):
+        print("⚠ shortcuts CLI not found (signing needs macOS), skipping")
+        return
+    paths = [
+        os.path.join(SHORTCUTS_DIR, name)
+        for name in ["Pencil-Me-In-Setup.shortcut", "Pencil-Me-In.shortcut"]
+        if os.path.exists(os.path.join(SHORTCUTS_DIR, name))
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pairs = [(path, os.path.join(tmp, os.path.basename(path))) for path in paths]
+        # Signed files are cached by content, so only changed shortcuts go
+        # through Apple's CLI (full path avoids the python shortcuts package)
+        for result in sign_many(pairs, signer):
+            name = os.path.basename(result.input)
+            assert result.status != "failed", f"{name} signing failed: {result.error}"
+            with open(result.input, "rb") as f:
+                unsigned = plistlib.load(f)
+            signed = read_signed(result.output)
+            assert signed.certificates, "signed file has no certificate chain"
+            assert [
+                a["WFWorkflowActionIdentifier"]
+                for a in signed.workflow["WFWorkflowActions"]
+            ] == [
+                a["WFWorkflowActionIdentifier"] for a in unsigned["WFWorkflowActions"]
+            ], "signed workflow differs"
+            print(f"✓ {name} can be signed ({result.status})")
 
 
 if __name__ == "__main__":
@@ -351,8 +433,14 @@ if __name__ == "__main__":
     test_if_has_value_structure()
     test_text_with_variable_structure()
     test_show_result_with_variable_structure()
+    test_token_string_utf16_offsets()
+    test_ask_apple_ai_with_variables_template()
+    test_action_ir_lowers_to_plist()
+    test_aggrandized_references()
     test_menu_structure()
     test_nested_control_flow()
+    test_builds_are_reproducible()
+    test_build_instrumentation()
     test_generated_shortcuts()
     test_shortcut_can_be_signed()
 
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the signing layer and its cache
+"""
+
+import contextlib
+import io
+import os
+import plistlib
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from aea import read_signed
+from canonical import shortcut_hash
+from shortcut_builder import create_shortcut, text, to_plist
+from signing import CLISigner, LocalSigner, SigningError, main, sign_file, sign_many
+from test_canonical import main_shortcut
+
+
+class CountingSigner(LocalSigner):
+    """LocalSigner that records calls and how many ran at once"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.calls = []
+        self.running = 0
+        self.most_running = 0
+        self.delay = delay
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def sign(self, input_path: str, output_path: str):
+        with self.lock:
+            self.calls.append(os.path.basename(input_path))
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise SigningError("signer is down")
+            super().sign(input_path, output_path)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def write_shortcuts(directory: str, shortcuts: dict[str, dict]) -> list[str]:
+    paths = []
+    for name, shortcut in shortcuts.items():
+        path = os.path.join(directory, f"{name}.shortcut")
+        with open(path, "wb") as f:
+            plistlib.dump(shortcut, f, fmt=plistlib.FMT_BINARY)
+        paths.append(path)
+    return paths
+
+
+def numbered(n: int) -> dict:
+    return to_plist(create_shortcut(f"Number {n}", [text(str(n))[0]]))
+
+
+def test_cache_reuses_shortcuts_equal_up_to_uuids():
+    """Test that only new content is signed, once, and outputs are readable"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, "cache")
+        paths = write_shortcuts(
+            tmp,
+            {
+                "main": main_shortcut(),
+                "main-again": main_shortcut(fresh_uuids=True),
+                "one": numbered(1),
+            },
+        )
+        pairs = [
+            (path, path.replace(".shortcut", "-signed.shortcut")) for path in paths
+        ]
+        signer = CountingSigner()
+
+        results = sign_many(pairs, signer, cache, jobs=2)
+        assert [r.status for r in results] == ["signed", "cached", "signed"]
+        assert sorted(signer.calls) == ["main.shortcut", "one.shortcut"]
+        for path, output in pairs:
+            with open(path, "rb") as f:
+                unsigned = plistlib.load(f)
+            assert shortcut_hash(read_signed(output).workflow) == shortcut_hash(
+                unsigned
+            )
+
+        # Everything is cached now, including for a different output path
+        again = sign_file(
+            paths[1], os.path.join(tmp, "elsewhere.shortcut"), signer, cache
+        )
+        assert again.status == "cached"
+        assert [r.status for r in sign_many(pairs, signer, cache)] == ["cached"] * 3
+        assert len(signer.calls) == 2
+
+        # Another signer backend (or mode) has its own entries
+        other = sign_file(paths[2], None, CLISigner(cli="/nonexistent"), cache)
+        assert other.status == "failed" and "not found" in other.error
+    print("✓ Cache reuses shortcuts equal up to UUIDs")
+
+
+def test_misses_run_on_a_bounded_pool():
+    """Test concurrency stays within jobs, and failures aren't cached"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, "cache")
+        paths = write_shortcuts(tmp, {f"n{n}": numbered(n) for n in range(6)})
+        pairs = [(path, f"{path}.signed") for path in paths]
+
+        down = CountingSigner(fail=True)
+        results = sign_many(pairs[:2], down, cache, jobs=2)
+        assert [r.status for r in results] == ["failed", "failed"]
+        assert results[0].error == "signer is down"
+        assert not os.path.exists(pairs[0][1])
+
+        signer = CountingSigner(delay=0.05)
+        results = sign_many(pairs, signer, cache, jobs=2)
+        assert [r.status for r in results] == ["signed"] * 6
+        assert signer.most_running == 2
+    print("✓ Misses run on a bounded pool")
+
+
+def test_cli():
+    """Test the CLI signs next to the input and reports cache hits"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, "cache")
+        (path,) = write_shortcuts(tmp, {"AI-Test": numbered(7)})
+        args = [path, "--signer", "local", "--cache-dir", cache]
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            assert main(args) == 0
+            assert main(args) == 0
+        signed = os.path.join(tmp, "AI-Test-signed.shortcut")
+        assert shortcut_hash(read_signed(signed).workflow) == shortcut_hash(numbered(7))
+        assert "1 signed (1 from cache)" in out.getvalue()
+    print("✓ CLI")
+
+
+if __name__ == "__main__":
+    print("Running signing tests...\n")
+
+    test_cache_reuses_shortcuts_equal_up_to_uuids()
+    test_misses_run_on_a_bounded_pool()
+    test_cli()
+
+    print("\n✅ All tests passed!")
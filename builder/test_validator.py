@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for the structural validator
+"""
+
+import contextlib
+import io
+import json
+import os
+import plistlib
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+from shortcut_builder import (
+    create_shortcut,
+    end_if,
+    get_dictionary_value,
+    if_has_value,
+    import_question,
+    menu_end,
+    menu_item,
+    menu_start,
+    otherwise,
+    repeat_each_end,
+    repeat_each_start,
+    show_result,
+    text,
+    to_plist,
+    uuid_scope,
+)
+from validator import main, validate_shortcut_structure
+
+
+def test_nesting_orphans_and_unclosed_blocks():
+    """Test out-of-order ends, orphan markers and unclosed repeats"""
+    with uuid_scope("validator"):
+        menu, menu_id = menu_start(["A"])
+        check, check_id = if_has_value("x")
+        loop, loop_id = repeat_each_start("items")
+        crossed = [
+            menu,
+            menu_item("A", menu_id),
+            check,
+            menu_end(menu_id),  # closes the menu while the If is open
+            end_if(check_id),
+        ]
+        orphans = [otherwise("nowhere"), menu_item("A", "nowhere"), loop]
+
+    errors = validate_shortcut_structure(create_shortcut("Crossed", crossed))
+    assert errors == [
+        "Action 3: End Menu while If (started at action 2) is still open",
+        f"Action 4: Orphan End If (no open If {check_id})",
+    ], errors
+
+    errors = validate_shortcut_structure(create_shortcut("Orphans", orphans))
+    assert errors == [
+        "Action 0: Orphan Otherwise (no open If nowhere)",
+        "Action 1: Orphan Menu item (no open Menu nowhere)",
+        "Repeat not closed (started at action 2)",
+    ], errors
+    assert loop_id not in " ".join(errors)
+
+    with uuid_scope("validator"):
+        loop, loop_id = repeat_each_start("items")
+        nested = [loop, show_result("x"), repeat_each_end(loop_id)]
+    assert validate_shortcut_structure(create_shortcut("Loop", nested)) == []
+    print("✓ Nesting, orphans and unclosed blocks are reported")
+
+
+def test_references_and_import_questions():
+    """Test dangling ActionOutput refs, duplicate UUIDs and question indices"""
+    with uuid_scope("validator"):
+        source, source_uuid = text("{}")
+        lookup, _ = get_dictionary_value("a", source_uuid)
+        dangling, _ = get_dictionary_value("b", "MISSING")
+        actions = to_plist([lookup, source, dangling, source])
+    shortcut = create_shortcut(
+        "Refs",
+        actions,
+        import_questions=[
+            import_question("WFTextActionText", 1),
+            import_question("WFTextActionText", 0),
+            import_question("WFTextActionText", 9),
+        ],
+    )
+    errors = validate_shortcut_structure(shortcut)
+    assert errors == [
+        f"Action 3: Duplicate UUID {source_uuid} (also action 1)",
+        "Action 0: References output of later action 1",
+        "Action 2: References unknown output MISSING",
+        "Import question 1: Action 0 has no parameter WFTextActionText",
+        "Import question 2: ActionIndex 9 out of range",
+    ], errors
+    print("✓ References and import questions are checked")
+
+
+def test_cli_reports_json():
+    """Test the CLI validates a directory in parallel and prints JSON"""
+    from build_main import build_main_shortcut
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "nested"))
+        good = to_plist(build_main_shortcut())
+        for n in range(3):
+            with open(os.path.join(tmp, f"good-{n}.shortcut"), "wb") as f:
+                plistlib.dump(good, f, fmt=plistlib.FMT_BINARY)
+        # Drop the last block's end
+        actions = good["WFWorkflowActions"]
+        end = max(
+            i
+            for i, a in enumerate(actions)
+            if a["WFWorkflowActionParameters"].get("WFControlFlowMode") == 2
+        )
+        bad = dict(good, WFWorkflowActions=actions[:end] + actions[end + 1 :])
+        with open(os.path.join(tmp, "nested", "bad.shortcut"), "wb") as f:
+            plistlib.dump(bad, f, fmt=plistlib.FMT_BINARY)
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = main([tmp, "--json", "--jobs", "2"])
+
+    report = json.loads(out.getvalue())
+    assert status == 1
+    assert report["checked"] == 4
+    assert report["invalid"] == 1
+    (bad_result,) = [r for r in report["results"] if not r["valid"]]
+    assert bad_result["path"].endswith(os.path.join("nested", "bad.shortcut"))
+    assert any("not closed" in e for e in bad_result["errors"])
+    print("✓ CLI reports JSON")
+
+
+if __name__ == "__main__":
+    print("Running validator tests...\n")
+
+    test_nesting_orphans_and_unclosed_blocks()
+    test_references_and_import_questions()
+    test_cli_reports_json()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Structural validator for shortcuts
+
+One pass over WFWorkflowActions with a stack of open blocks checks:
+
+- every If, Menu and Repeat is opened, split and closed in nesting order,
+  with no orphan Otherwise/menu items and nothing left open
+- the parameters each control flow marker needs are present
+- every ActionOutput reference points at an earlier action's UUID, and
+  UUIDs are unique
+- every import question's ActionIndex points at an action that has the
+  question's ParameterKey
+
+Signed (AEA1) files are checked through the workflow inside them (aea.py).
+
+Usage:
+    python builder/validator.py shortcuts/Pencil-Me-In.shortcut
+    python builder/validator.py shortcuts/ --json > report.json
+    python builder/validator.py corpus/ --jobs 8
+"""
+
+import argparse
+import json
+import os
+import plistlib
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from controlflow import (
+    CONDITIONAL,
+    END,
+    MENU,
+    MIDDLE,
+    REPEAT_COUNT,
+    REPEAT_EACH,
+    START,
+    identifier,
+    iter_refs,
+    lowered,
+    params,
+)
+
+BLOCK_NAMES = {
+    CONDITIONAL: "If",
+    MENU: "Menu",
+    REPEAT_EACH: "Repeat",
+    REPEAT_COUNT: "Repeat",
+}
+MIDDLE_NAMES = {CONDITIONAL: "Otherwise", MENU: "Menu item"}
+
+
+def validate_shortcut_structure(data: dict) -> list[str]:
+    """Validate a shortcut dict has correct structure. Returns list of errors."""
+    errors = []
+
+    # Check required top-level keys
+    for key in ("WFWorkflowActions", "WFWorkflowIcon"):
+        if key not in data:
+            errors.append(f"Missing required key: {key}")
+
+    actions = lowered(data.get("WFWorkflowActions", []))
+    if not actions:
+        errors.append("No actions in shortcut")
+        return errors
+
+    stack = []  # open blocks: [group_id, action identifier, start index, middles]
+    open_groups = {}  # group_id -> depth in stack
+    defined = {}  # UUID -> action index
+    refs = []  # (action index, referenced UUID)
+    keys = []  # parameter keys per action, for import questions
+
+    for i, action in enumerate(actions):
+        action_id = identifier(action)
+        p = params(action)
+        keys.append(p.keys())
+
+        if not action_id:
+            errors.append(f"Action {i}: Missing WFWorkflowActionIdentifier")
+            continue
+
+        action_uuid = p.get("UUID")
+        if action_uuid is not None:
+            if action_uuid in defined:
+                errors.append(
+                    f"Action {i}: Duplicate UUID {action_uuid} "
+                    f"(also action {defined[action_uuid]})"
+                )
+            else:
+                defined[action_uuid] = i
+        for ref in iter_refs(p):
+            if ref["Type"] == "ActionOutput":
+                refs.append((i, ref.get("OutputUUID")))
+
+        if action_id in BLOCK_NAMES:
+            _check_block(i, action_id, p, stack, open_groups, errors)
+
+    # Check all control flow is closed
+    for _, action_id, start, _ in stack:
+        errors.append(
+            f"{BLOCK_NAMES[action_id]} not closed (started at action {start})"
+        )
+
+    for i, ref_uuid in refs:
+        source = defined.get(ref_uuid)
+        if source is None:
+            errors.append(f"Action {i}: References unknown output {ref_uuid}")
+        elif source >= i:
+            errors.append(f"Action {i}: References output of later action {source}")
+
+    for n, question in enumerate(data.get("WFWorkflowImportQuestions", [])):
+        index = question.get("ActionIndex")
+        if not isinstance(index, int) or not 0 <= index < len(actions):
+            errors.append(f"Import question {n}: ActionIndex {index} out of range")
+        elif question.get("ParameterKey") not in keys[index]:
+            errors.append(
+                f"Import question {n}: Action {index} has no parameter "
+                f"{question.get('ParameterKey')}"
+            )
+
+    return errors
+
+
+def _check_block(
+    i: int, action_id: str, p: dict, stack: list, open_groups: dict, errors: list
+):
+    """Check one control flow marker against the stack of open blocks"""
+    name = BLOCK_NAMES[action_id]
+    group_id = p.get("GroupingIdentifier")
+    mode = p.get("WFControlFlowMode")
+
+    if group_id is None:
+        errors.append(f"Action {i}: {name} missing GroupingIdentifier")
+    if mode is None:
+        errors.append(f"Action {i}: {name} missing WFControlFlowMode")
+    if group_id is None or mode is None:
+        return
+
+    if mode == START:
+        _check_start(i, action_id, p, errors)
+        if group_id in open_groups:
+            errors.append(f"Action {i}: {name} reuses open group {group_id}")
+            return
+        open_groups[group_id] = len(stack)
+        stack.append([group_id, action_id, i, 0])
+        return
+
+    label = MIDDLE_NAMES.get(action_id, name) if mode == MIDDLE else f"End {name}"
+    if mode not in (MIDDLE, END) or (mode == MIDDLE and action_id not in MIDDLE_NAMES):
+        errors.append(f"Action {i}: {label} has invalid WFControlFlowMode {mode}")
+        return
+    depth = open_groups.get(group_id)
+    if depth is None:
+        errors.append(f"Action {i}: Orphan {label} (no open {name} {group_id})")
+        return
+    if stack[depth][1] != action_id:
+        opened = BLOCK_NAMES[stack[depth][1]]
+        errors.append(f"Action {i}: {label} for a group opened by {opened}")
+        return
+    if depth != len(stack) - 1:
+        inner = stack[-1]
+        errors.append(
+            f"Action {i}: {label} while {BLOCK_NAMES[inner[1]]} "
+            f"(started at action {inner[2]}) is still open"
+        )
+        # Recover by closing the inner blocks, so one mistake is reported once
+        for block in stack[depth + 1 :]:
+            del open_groups[block[0]]
+        del stack[depth + 1 :]
+
+    if mode == MIDDLE:
+        stack[-1][3] += 1
+        if action_id == CONDITIONAL and stack[-1][3] > 1:
+            errors.append(f"Action {i}: Second Otherwise in the same If")
+        if action_id == MENU and "WFMenuItemTitle" not in p:
+            errors.append(f"Action {i}: Menu item missing WFMenuItemTitle")
+    else:
+        del open_groups[group_id]
+        stack.pop()
+
+
+def _check_start(i: int, action_id: str, p: dict, errors: list):
+    if action_id == CONDITIONAL:
+        if "WFInput" not in p:
+            errors.append(f"Action {i}: If-start missing WFInput")
+        else:
+            wf_input = p["WFInput"]
+            # Must have Type field
+            if "Type" not in wf_input:
+                errors.append(f"Action {i}: WFInput missing Type field")
+            # If Type=Variable, must have Variable field
+            if wf_input.get("Type") == "Variable" and "Variable" not in wf_input:
+                errors.append(
+                    f"Action {i}: WFInput Type=Variable but missing Variable field"
+                )
+        if "WFCondition" not in p:
+            errors.append(f"Action {i}: If-start missing WFCondition")
+    elif action_id == MENU:
+        if "WFMenuItems" not in p:
+            errors.append(f"Action {i}: Menu start missing WFMenuItems")
+    elif action_id == REPEAT_COUNT:
+        if "WFRepeatCount" not in p:
+            errors.append(f"Action {i}: Repeat missing WFRepeatCount")
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+
+def validate_file(path: str) -> tuple[str, list[str]]:
+    """Validate one .shortcut file. Returns (path, errors)."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(4)
+            f.seek(0)
+            if header == b"AEA1":
+                from aea import read_signed
+
+                data = read_signed(f.read()).workflow
+            else:
+                data = plistlib.load(f)
+    except (OSError, plistlib.InvalidFileException, ValueError) as e:
+        return path, [f"Unreadable: {e}"]
+    if not isinstance(data, dict):
+        return path, ["Not a shortcut: top level is not a dictionary"]
+    return path, validate_shortcut_structure(data)
+
+
+def find_shortcuts(paths: list[str]) -> list[str]:
+    """Expand directories into the .shortcut files below them"""
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            found.extend(
+                os.path.join(root, name)
+                for name in sorted(files)
+                if name.endswith(".shortcut")
+            )
+    return found
+
+
+def validate_files(paths: list[str], jobs: int = None) -> dict[str, list[str]]:
+    """Validate files across `jobs` processes. Returns {path: errors}."""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) < 2:
+        return dict(map(validate_file, paths))
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return dict(pool.map(validate_file, paths, chunksize=chunksize))
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Validate shortcut structure")
+    parser.add_argument("paths", nargs="+", help=".shortcut files or directories")
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="Worker processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print a JSON report to stdout"
+    )
+    args = parser.parse_args(argv)
+
+    results = validate_files(find_shortcuts(args.paths), args.jobs)
+    invalid = {path: errors for path, errors in results.items() if errors}
+
+    if args.json:
+        report = {
+            "checked": len(results),
+            "invalid": len(invalid),
+            "results": [
+                {"path": path, "valid": not errors, "errors": errors}
+                for path, errors in results.items()
+            ],
+        }
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        for path, errors in invalid.items():
+            print(f"✗ {path}")
+            for error in errors:
+                print(f"  - {error}")
+        print(f"{len(results) - len(invalid)} of {len(results)} shortcuts valid")
+    return 1 if invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())